@@ -22,6 +22,16 @@ if config.config_file_name is not None:
 from app.models import Base
 target_metadata = Base.metadata
 
+# indexes that need an extension (pgvector HNSW, pg_trgm) are defined in migrations
+# only, not on the models; don't let autogenerate propose dropping them
+MIGRATION_ONLY_INDEXES = {"ix_places_embedding_hnsw"}
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    if type_ == "index" and reflected and compare_to is None:
+        return not (name in MIGRATION_ONLY_INDEXES or name.endswith("_name_trgm"))
+    return True
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -44,6 +54,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -85,7 +96,8 @@ def run_migrations_online() -> None:
     with connectable.connect() as connection:
         context.configure(
             connection=connection,
-            target_metadata=target_metadata
+            target_metadata=target_metadata,
+            include_object=include_object,
         )
 
         with context.begin_transaction():
@@ -0,0 +1,29 @@
+"""places lat/lng index for radius search
+
+Revision ID: a1c3e5f70001
+Revises:
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a1c3e5f70001'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # B-tree on (lat, lng) serves the bounding-box prefilter in nearby_places_sql
+    op.create_index("ix_places_lat_lng", "places", ["lat", "lng"], unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_places_lat_lng", table_name="places", if_exists=True)
@@ -0,0 +1,35 @@
+"""pg_trgm GIN indexes on catalog name columns
+
+Revision ID: a7c9e1f40007
+Revises: f6b8d0e30006
+Create Date: 2026-10-17 20:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c9e1f40007'
+down_revision: Union[str, Sequence[str], None] = 'f6b8d0e30006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ("places", "cities", "states", "countries", "restaurants")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    # gin_trgm_ops serves ILIKE '%kw%', ILIKE 'name' (the duplicate checks), = and the
+    # fuzzy %> (word_similarity) operator used by apply_searching(mode="fuzzy")
+    for table in TABLES:
+        op.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_name_trgm ON {table} USING gin (name gin_trgm_ops)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TABLES:
+        op.drop_index(f"ix_{table}_name_trgm", table_name=table, if_exists=True)
@@ -0,0 +1,49 @@
+"""itinerary jobs table for async submit/poll
+
+Revision ID: b2d4f6a80002
+Revises: a1c3e5f70001
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b2d4f6a80002'
+down_revision: Union[str, Sequence[str], None] = 'a1c3e5f70001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # app startup's create_all may already have created the table
+    op.create_table(
+        "itinerary_jobs",
+        sa.Column("id", sa.String(length=36), primary_key=True),
+        sa.Column("itinerary_request_id", sa.Integer(),
+                  sa.ForeignKey("itinerary_requests.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("status", sa.String(length=16), nullable=False, server_default="queued"),
+        sa.Column("stage", sa.String(length=32), nullable=True),
+        sa.Column("progress_json", postgresql.JSONB(), nullable=False, server_default="{}"),
+        sa.Column("result_json", postgresql.JSONB(), nullable=True),
+        sa.Column("error", sa.String(length=1000), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.text("CURRENT_TIMESTAMP")),
+        sa.Column("started_at", sa.DateTime(), nullable=True),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+        if_not_exists=True,
+    )
+    op.create_index("ix_itinerary_jobs_itinerary_request_id", "itinerary_jobs", ["itinerary_request_id"],
+                    if_not_exists=True)
+    op.create_index("ix_itinerary_jobs_status", "itinerary_jobs", ["status"], if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_itinerary_jobs_status", table_name="itinerary_jobs", if_exists=True)
+    op.drop_index("ix_itinerary_jobs_itinerary_request_id", table_name="itinerary_jobs", if_exists=True)
+    op.drop_table("itinerary_jobs", if_exists=True)
@@ -0,0 +1,30 @@
+"""heartbeat on embedding backfill runs
+
+Revision ID: b8d0f2a50008
+Revises: a7c9e1f40007
+Create Date: 2026-10-17 22:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8d0f2a50008'
+down_revision: Union[str, Sequence[str], None] = 'a7c9e1f40007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # app startup's create_all may already have created the column
+    op.add_column("embedding_backfill_runs", sa.Column("heartbeat_at", sa.DateTime(), nullable=True),
+                  if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("embedding_backfill_runs", "heartbeat_at")
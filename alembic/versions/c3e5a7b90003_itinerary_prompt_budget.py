@@ -0,0 +1,31 @@
+"""record the prompt token budget per itinerary request
+
+Revision ID: c3e5a7b90003
+Revises: b2d4f6a80002
+Create Date: 2026-10-17 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e5a7b90003'
+down_revision: Union[str, Sequence[str], None] = 'b2d4f6a80002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # app startup's create_all may already have created the column
+    op.add_column("itinerary_requests", sa.Column("prompt_budget_json", postgresql.JSONB(), nullable=True),
+                  if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column("itinerary_requests", "prompt_budget_json")
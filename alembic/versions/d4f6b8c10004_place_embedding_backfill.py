@@ -0,0 +1,50 @@
+"""place embedding hash and embedding backfill runs
+
+Revision ID: d4f6b8c10004
+Revises: c3e5a7b90003
+Create Date: 2026-10-17 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd4f6b8c10004'
+down_revision: Union[str, Sequence[str], None] = 'c3e5a7b90003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # app startup's create_all may already have created the table (and, on a new database, the column)
+    op.add_column("places", sa.Column("embedding_hash", sa.String(length=64), nullable=True), if_not_exists=True)
+    op.create_table(
+        "embedding_backfill_runs",
+        sa.Column("id", sa.String(length=36), primary_key=True),
+        sa.Column("mode", sa.String(length=16), nullable=False, server_default="stale"),
+        sa.Column("status", sa.String(length=16), nullable=False, server_default="queued"),
+        sa.Column("last_place_id", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("scanned", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("embedded", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("skipped", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("total", sa.Integer(), nullable=True),
+        sa.Column("rows_per_s", sa.Float(), nullable=True),
+        sa.Column("elapsed_s", sa.Float(), nullable=True),
+        sa.Column("error", sa.String(length=1000), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False, server_default=sa.text("CURRENT_TIMESTAMP")),
+        sa.Column("started_at", sa.DateTime(), nullable=True),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+        if_not_exists=True,
+    )
+    op.create_index("ix_embedding_backfill_runs_status", "embedding_backfill_runs", ["status"], if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_embedding_backfill_runs_status", table_name="embedding_backfill_runs", if_exists=True)
+    op.drop_table("embedding_backfill_runs", if_exists=True)
+    op.drop_column("places", "embedding_hash")
@@ -0,0 +1,33 @@
+"""HNSW index on places.embedding for semantic search
+
+Revision ID: e5a7c9d20005
+Revises: d4f6b8c10004
+Create Date: 2026-10-17 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5a7c9d20005'
+down_revision: Union[str, Sequence[str], None] = 'd4f6b8c10004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS vector")
+    # cosine distance (<=>), matching app/utils/semantic_search.py; HNSW needs pgvector >= 0.5
+    op.execute(
+        "CREATE INDEX IF NOT EXISTS ix_places_embedding_hnsw ON places "
+        "USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64)"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_places_embedding_hnsw", table_name="places", if_exists=True)
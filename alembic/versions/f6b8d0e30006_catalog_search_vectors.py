@@ -0,0 +1,52 @@
+"""full-text search_vector columns and GIN indexes on catalog tables
+
+Revision ID: f6b8d0e30006
+Revises: e5a7c9d20005
+Create Date: 2026-10-17 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f6b8d0e30006'
+down_revision: Union[str, Sequence[str], None] = 'e5a7c9d20005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+NAME_ONLY = "to_tsvector('simple', coalesce(name, ''))"
+SEARCH_VECTORS = {
+    "places": (
+        "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(city, '') || ' ' || coalesce(state, '') || ' ' || coalesce(type, '')), 'B') || "
+        "setweight(to_tsvector('simple', coalesce(description, '')), 'C')"
+    ),
+    "restaurants": (
+        "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(city, '') || ' ' || coalesce(food_type, '')), 'B') || "
+        "setweight(to_tsvector('simple', coalesce(description, '')), 'C')"
+    ),
+    "cities": NAME_ONLY,
+    "states": NAME_ONLY,
+    "countries": NAME_ONLY,
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # stored generated columns: Postgres keeps them current on every insert/update, no trigger needed.
+    # Adding one rewrites the table once.
+    for table, expr in SEARCH_VECTORS.items():
+        op.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+                   f"GENERATED ALWAYS AS ({expr}) STORED")
+        op.execute(f"CREATE INDEX IF NOT EXISTS ix_{table}_search_vector ON {table} USING gin (search_vector)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in SEARCH_VECTORS:
+        op.drop_index(f"ix_{table}_search_vector", table_name=table, if_exists=True)
+        op.drop_column(table, "search_vector")
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, JSON
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy import Column, Computed, Index, Integer, String, ForeignKey, JSON
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from app.database import BaseModel
 from sqlalchemy.orm import relationship
 
@@ -9,9 +9,14 @@ JSONVariant = JSON().with_variant(JSONB(), "postgresql")  # portable JSON
 
 class City(BaseModel):
     __tablename__ = "cities"
+    __table_args__ = (
+        Index("ix_cities_search_vector", "search_vector", postgresql_using="gin"),
+    )
     id = Column(Integer, primary_key=True, autoincrement=True)
     city_id = Column(String(64), unique=True, index=True, nullable=False)
     name = Column(String(255), nullable=False, index=True)
+    # full-text search (app/utils/searching.py)
+    search_vector = Column(TSVECTOR, Computed("to_tsvector('simple', coalesce(name, ''))", persisted=True))
     state_id = Column(String(64), ForeignKey('states.state_id'), nullable=True, index=True)
     country_id = Column(String(64), ForeignKey('countries.country_id'), nullable=True, index=True)
 
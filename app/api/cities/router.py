@@ -13,7 +13,7 @@ import json, math, httpx, subprocess
 from app.api.cities.schema import CityCreate, CityRead, CityUpdate, CityDelete
 import os
 from app.utils.helper import CommonResponse
-from app.utils.searching import apply_searching
+from app.utils.searching import SEARCH_MODE_PATTERN, apply_searching
 from app.utils.sorting import apply_sorting
 from app.utils.pagination import get_pagination_metadata
 from sqlalchemy.exc import SQLAlchemyError
@@ -40,6 +40,7 @@ def create_city(city_req: CityCreate, db: Session = Depends(get_db)):
 
 
     # --- Duplicate check ---
+    # (name ILIKE is served by the ix_cities_name_trgm trigram index)
     existing_city = (
         db.query(City)
         .filter(
@@ -86,6 +87,8 @@ def get_all_cities(
     sort_by: Optional[str] = Query(None),
     sort_order: Optional[str] = Query("desc"),
     search: Optional[str] = Query(None),
+    search_mode: str = Query("auto", pattern=SEARCH_MODE_PATTERN,
+                             description="auto | ranked | fuzzy (typo-tolerant) | ilike"),
     db: Session = Depends(get_db)
     ):
 
@@ -98,7 +101,7 @@ def get_all_cities(
         base_query = base_query.filter(City.state_id == state_id)
 
     # Apply search
-    base_query = apply_searching(base_query, City, ["name"], search)
+    base_query = apply_searching(base_query, City, ["name"], search, mode=search_mode, rank=not sort_by)
 
     total_count = base_query.count()
 
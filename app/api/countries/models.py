@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, JSON, ForeignKey
-from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy import Column, Computed, Index, Integer, String, JSON, ForeignKey
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from app.database import BaseModel
 
 
@@ -9,6 +9,11 @@ JSONVariant = JSON().with_variant(JSONB(), "postgresql")  # portable JSON
 
 class Country(BaseModel):
     __tablename__ = "countries"
+    __table_args__ = (
+        Index("ix_countries_search_vector", "search_vector", postgresql_using="gin"),
+    )
     id = Column(Integer, primary_key=True, autoincrement=True)
     country_id = Column(String(64), unique=True, index=True, nullable=False)
     name = Column(String(255), nullable=False, index=True)
+    # full-text search (app/utils/searching.py)
+    search_vector = Column(TSVECTOR, Computed("to_tsvector('simple', coalesce(name, ''))", persisted=True))
@@ -0,0 +1,193 @@
+# app/api/itineraries/jobs.py
+"""
+Background itinerary jobs: submit returns immediately, a bounded pool runs
+the planning pipeline, and clients poll GET /itinerary/jobs/{id}.
+
+Each job gets an ItineraryRequest row up front. The pipeline attaches its
+candidates/results to that same request, so request_id is known at submit
+time and means the same thing as in the synchronous endpoint. Job status
+lives in the itinerary_jobs table, so any API worker can answer a poll.
+Status writes use their own short sessions, independent of the pipeline's,
+and run in worker threads in submission order, off the event loop.
+Jobs call the model at batch priority, so interactive requests go first.
+
+Jobs live in the process that accepted them, so a restart loses the queued
+and running ones. At startup, fail_stale marks jobs that have been queued or
+running for longer than ITINERARY_JOB_STALE_S as failed, so their pollers
+get an answer. The age cut-off keeps it from failing jobs that another
+worker is still running.
+
+Config (env):
+    ITINERARY_JOB_WORKERS       jobs running at once (default 2)
+    ITINERARY_JOB_QUEUE_MAX     queued + running before submit returns 503 (default 100)
+    ITINERARY_JOB_STALE_S       age after which an unfinished job is presumed lost (default 3600)
+"""
+import asyncio
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.api.itineraries.models import ItineraryJob, ItineraryRequest
+from app.api.itineraries.pipeline import PIPELINE_VERSION, STAGES, run_itinerary_pipeline
+from app.database.db import SessionLocal
+from app.utils.llm_scheduler import PRIORITY_BATCH, use_priority
+
+ITINERARY_JOB_WORKERS = int(os.getenv("ITINERARY_JOB_WORKERS", "2"))
+ITINERARY_JOB_QUEUE_MAX = int(os.getenv("ITINERARY_JOB_QUEUE_MAX", "100"))
+ITINERARY_JOB_STALE_S = int(os.getenv("ITINERARY_JOB_STALE_S", "3600"))
+
+
+class ItineraryJobRunner:
+    def __init__(self, workers: int = ITINERARY_JOB_WORKERS, queue_max: int = ITINERARY_JOB_QUEUE_MAX):
+        self.workers = workers
+        self.queue_max = queue_max
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._tasks = set()
+        self.pending = 0
+
+    async def submit(self, db: Session, city: str, days: int, suitable_for: Optional[str],
+                     interests: Optional[str] = None) -> ItineraryJob:
+        if self.pending >= self.queue_max:
+            raise HTTPException(status_code=503, detail="Itinerary job queue is full, retry later",
+                                headers={"Retry-After": "5"})
+        self.pending += 1
+        try:
+            job = await asyncio.to_thread(self._create, db, city, days, suitable_for)
+        except BaseException:
+            self.pending -= 1
+            raise
+
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.workers)
+        task = asyncio.create_task(self._run(job.id, job.itinerary_request_id, city, days, suitable_for, interests))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    @staticmethod
+    def _create(db: Session, city: str, days: int, suitable_for: Optional[str]) -> ItineraryJob:
+        audience = (suitable_for or "").strip().lower() or None
+        req = ItineraryRequest(city=city, days=days, suitable_for=audience, version=PIPELINE_VERSION)
+        db.add(req); db.flush()
+        job = ItineraryJob(id=uuid.uuid4().hex, itinerary_request_id=req.id, status="queued",
+                           progress_json={"stages": [], "total_stages": len(STAGES)})
+        db.add(job)
+        db.commit()
+        return job
+
+    @staticmethod
+    def fail_stale(stale_s: int = ITINERARY_JOB_STALE_S) -> int:
+        """Mark jobs queued or running for longer than `stale_s` as failed. Returns how many."""
+        cutoff = datetime.utcnow() - timedelta(seconds=stale_s)
+        db = SessionLocal()
+        try:
+            n = (db.query(ItineraryJob)
+                 .filter(ItineraryJob.status.in_(("queued", "running")),
+                         func.coalesce(ItineraryJob.started_at, ItineraryJob.created_at) < cutoff)
+                 .update({"status": "failed", "stage": "done", "finished_at": datetime.utcnow(),
+                          "error": "Interrupted: the server restarted before the job finished; resubmit it"},
+                         synchronize_session=False))
+            db.commit()
+            return n
+        finally:
+            db.close()
+
+    def _update(self, job_id: str, **fields):
+        db = SessionLocal()
+        try:
+            job = db.get(ItineraryJob, job_id)
+            if job is None:
+                return
+            for k, v in fields.items():
+                setattr(job, k, v)
+            db.commit()
+        finally:
+            db.close()
+
+    async def _update_after(self, previous: Optional[asyncio.Task], job_id: str, **fields):
+        # chained so that writes land in the order they were made
+        if previous is not None:
+            await asyncio.gather(previous, return_exceptions=True)
+        try:
+            await asyncio.to_thread(self._update, job_id, **fields)
+        except Exception as e:
+            logging.warning(f"Could not update itinerary job {job_id}: {e}")
+
+    async def _run(self, job_id: str, request_id: int, city: str, days: int, suitable_for: Optional[str],
+                   interests: Optional[str] = None):
+        try:
+            async with self._sem:
+                started = time.perf_counter()
+                stages = []
+                await asyncio.to_thread(self._update, job_id, status="running", started_at=datetime.utcnow())
+                last_write: Optional[asyncio.Task] = None
+
+                def progress(stage: str):
+                    # called on the event loop by the pipeline: queue the write instead of blocking
+                    nonlocal last_write
+                    stages.append({"stage": stage, "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)})
+                    last_write = asyncio.create_task(self._update_after(
+                        last_write, job_id, stage=stage,
+                        progress_json={"stages": list(stages), "total_stages": len(STAGES)}))
+
+                db = SessionLocal()
+                try:
+                    with use_priority(PRIORITY_BATCH):
+                        result = await run_itinerary_pipeline(db, city, days, suitable_for,
+                                                              progress=progress, request_id=request_id,
+                                                              interests=interests)
+                    status, error = "succeeded", None
+                except HTTPException as e:
+                    await asyncio.to_thread(db.rollback)
+                    result, status, error = None, "failed", str(e.detail)
+                except Exception as e:
+                    logging.exception(f"Itinerary job {job_id} failed")
+                    await asyncio.to_thread(db.rollback)
+                    result, status, error = None, "failed", f"{type(e).__name__}: {e}"[:1000]
+                finally:
+                    await asyncio.to_thread(db.close)
+
+                if last_write is not None:
+                    await last_write  # a late progress write must not overwrite the final status
+                stages.append({"stage": "done", "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)})
+                await asyncio.to_thread(self._update, job_id, status=status, stage="done", result_json=result,
+                                        error=error, finished_at=datetime.utcnow(),
+                                        progress_json={"stages": stages, "total_stages": len(STAGES)})
+        except Exception as e:
+            logging.error(f"Could not record itinerary job {job_id}: {e}")
+        finally:
+            self.pending -= 1
+
+    @staticmethod
+    def describe(job: ItineraryJob) -> Dict[str, Any]:
+        progress = job.progress_json or {}
+        total = progress.get("total_stages", len(STAGES))
+        started = [s for s in progress.get("stages", []) if s["stage"] in STAGES]
+        # a reported stage is the one in progress; everything before it is complete
+        completed = total if job.status == "succeeded" else max(0, len(started) - 1)
+        return {
+            "job_id": job.id,
+            "request_id": job.itinerary_request_id,
+            "status": job.status,
+            "stage": job.stage,
+            "progress": {
+                "completed_stages": completed,
+                "total_stages": total,
+                "stages": progress.get("stages", []),
+            },
+            "result": job.result_json,
+            "error": job.error,
+            "created_at": job.created_at,
+            "started_at": job.started_at,
+            "finished_at": job.finished_at,
+        }
+
+
+job_runner = ItineraryJobRunner()
@@ -15,6 +15,7 @@ class ItineraryRequest(Base):
     days = Column(Integer, nullable=False)
     suitable_for = Column(String(64), nullable=True, index=True)
     version = Column(String(32), nullable=False, default="v1.0.0")
+    prompt_budget_json = Column(JSONVariant, nullable=True)  # token budget chosen for the LLM prompt
     created_at = Column(DateTime, nullable=False, server_default=text("CURRENT_TIMESTAMP"))
     # Optional: user_id, trip_month, transport_mode, etc.
 
@@ -22,6 +23,7 @@ class ItineraryRequest(Base):
     result = relationship("ItineraryResult", uselist=False, back_populates="request", cascade="all, delete-orphan")
     model_ios = relationship("ItineraryModelIO", back_populates="request", cascade="all, delete-orphan")
     feedback = relationship("ItineraryFeedback", back_populates="request", cascade="all, delete-orphan")
+    jobs = relationship("ItineraryJob", back_populates="request", cascade="all, delete-orphan")
 
 class ItineraryCandidate(Base):
     __tablename__ = "itinerary_candidates"
@@ -71,3 +73,18 @@ class ItineraryFeedback(Base):
     created_at = Column(DateTime, nullable=False, server_default=text("CURRENT_TIMESTAMP"))
 
     request = relationship("ItineraryRequest", back_populates="feedback")
+
+class ItineraryJob(Base):
+    __tablename__ = "itinerary_jobs"
+    id = Column(String(36), primary_key=True)  # uuid4 hex, handed to the client
+    itinerary_request_id = Column(Integer, ForeignKey("itinerary_requests.id", ondelete="CASCADE"), nullable=False, index=True)
+    status = Column(String(16), nullable=False, default="queued", index=True)  # queued|running|succeeded|failed
+    stage = Column(String(32), nullable=True)  # current pipeline stage
+    progress_json = Column(JSONVariant, nullable=False, default=dict)  # {"stages": [{"stage", "at"}], ...}
+    result_json = Column(JSONVariant, nullable=True)
+    error = Column(String(1000), nullable=True)
+    created_at = Column(DateTime, nullable=False, server_default=text("CURRENT_TIMESTAMP"))
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+
+    request = relationship("ItineraryRequest", back_populates="jobs")
@@ -0,0 +1,691 @@
+# app/api/itineraries/pipeline.py
+"""
+The generate_itinerary1 planner as a plain coroutine, shared by the HTTP
+endpoint and the background job runner (app/api/itineraries/jobs.py).
+
+Stages, in order, reported through the optional `progress(stage)` callback:
+    locate -> retrieve -> candidates -> llm -> repair -> persist
+A result-cache hit jumps from retrieve straight to persist.
+
+Concurrent identical requests (same normalised city/days/audience and LLM
+priority class) are coalesced: one planning run is shared through app.utils.single_flight, and
+each caller still persists its own ItineraryRequest. Callers that joined
+another's flight report only persist and get auto_parameters.coalesced=True.
+The priority class is part of the flight key because the flight's LLM call
+runs at its leader's priority: an interactive request never waits behind a
+batch job's flight.
+
+With `on_event(event, data)` the pipeline also hands out partial results as
+they exist, for the SSE endpoint:
+    candidates   the shortlist sent to the model, with day_group
+    llm_token    each content chunk (the model is called with stream=true)
+    day          each repaired + routed day
+
+With `interests` (free text, e.g. "quiet lakesides, old stepwells") the
+nearby places are re-ranked by app.utils.hybrid_search and the best matches
+become the candidate pool, topped up with the nearest other places so every
+day can still be filled.
+
+planner="deterministic" skips the model (app.utils.deterministic_planner):
+places are scored, clustered into days and ordered by rules, then go
+through the same repair and routing. It answers in milliseconds, is neither
+cached nor coalesced, and reports llm_status "skipped". Every run records
+auto_parameters.quality (app.utils.itinerary_quality) for comparing planners.
+"""
+import asyncio
+import os
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+
+from app.api.itineraries.models import ItineraryRequest, ItineraryCandidate, ItineraryResult
+from app.api.places.models import Places
+from app.database.db import SessionLocal
+from app.utils.day_clustering import cluster_into_days, day_group_map
+from app.utils.deterministic_planner import plan_days
+from app.utils.hybrid_search import hybrid_rank
+from app.utils.helper import (
+    DAY_BUDGET_MIN, END_OF_DAY_BUFFER_MIN, HOP_BUFFER_MIN, INTERCITY_SPEED_KMH, LLM_MODEL,
+    MAX_AI_CANDIDATES, MAX_ITEMS_PER_DAY, OUT_OF_CITY_ONE_WAY_KM_MAX, TARGET_ITEMS_PER_DAY,
+    URBAN_SPEED_KMH, auto_radius_km, is_itinerary_json, itinerary_from_json, parse_mins, safe_val,
+)
+from app.utils.itinerary_quality import score_itinerary
+from app.utils.llm_client import LLMOverloaded, llm_client
+from app.utils.llm_scheduler import llm_priority
+from app.utils.prompt_budget import finish_budget, plan_candidates, rank_by_tier
+from app.utils.prompt_encoding import candidates_note, decode_place_ids, encode_candidates, encode_schema
+from app.utils.result_cache import ITINERARY_CACHE_ENABLED, candidate_fingerprint, itinerary_cache, itinerary_cache_key
+from app.utils.route_optimizer import optimize_route, route_minutes
+from app.utils.single_flight import ITINERARY_COALESCE_ENABLED, itinerary_flights
+from app.utils.spatial_index import nearby_places
+from app.utils.timing import lap
+from app.utils.travel_matrix import CITY, TravelMatrix
+
+PIPELINE_VERSION = "v2.2.0"
+STAGES = ("locate", "retrieve", "candidates", "llm", "repair", "persist")
+PLANNER_LLM = "llm"
+PLANNER_DETERMINISTIC = "deterministic"
+PLANNERS = (PLANNER_LLM, PLANNER_DETERMINISTIC)
+PROMPT_COLUMNS = ("name", "lat", "lng", "visit_minutes", "rating", "distance_from_city_km", "hop_from_city_min",
+                  "city", "day_group")
+# structured-output schema for the model's answer (3–5 items/day)
+LLM_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "itinerary": {
+            "type": "object",
+            "patternProperties": {
+                "^Day [1-9][0-9]*$": {
+                    "type": "array",
+                    "items": {
+                        "type": "object",
+                        "properties": {
+                            "place_id": {"type": "string"},
+                            "reason": {"type": "string"},
+                            "notes": {"type": "string"}
+                        },
+                        "required": ["place_id"]
+                    }
+                }
+            },
+            "additionalProperties": False
+        }
+    },
+    "required": ["itinerary"]
+}
+
+# interest matches kept from the nearby places (the pool is topped up to 2 x days x MAX_ITEMS_PER_DAY)
+ITINERARY_INTEREST_CANDIDATES = int(os.getenv("ITINERARY_INTEREST_CANDIDATES", "40"))
+
+
+async def run_itinerary_pipeline(
+    db: Session,
+    city: str,
+    days: int,
+    suitable_for: Optional[str] = None,
+    progress: Optional[Callable[[str], None]] = None,
+    request_id: Optional[int] = None,
+    on_event: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+    planner: str = PLANNER_LLM,
+    interests: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Plan, persist and return an itinerary (the generate_itinerary1 response).
+    If `request_id` is given, results are attached to that existing
+    ItineraryRequest instead of creating a new one.
+    """
+    if planner not in PLANNERS:
+        raise HTTPException(status_code=422, detail=f"planner must be one of {', '.join(PLANNERS)}")
+
+    def report(stage: str):
+        if progress is not None:
+            progress(stage)
+
+    def emit(event: str, data: Dict[str, Any]):
+        if on_event is not None:
+            on_event(event, data)
+
+    audience = (suitable_for or "").strip().lower() or None
+    interests = (interests or "").strip() or None
+
+    shared = False
+    if ITINERARY_COALESCE_ENABLED and planner == PLANNER_LLM:
+        async def plan_in_own_session():
+            # the flight can outlive the leader's request, so it must not borrow its session
+            own = SessionLocal()
+            try:
+                return await _plan_itinerary(own, city, days, audience, report, emit, stream_llm=on_event is not None,
+                                             interests=interests)
+            finally:
+                own.close()
+
+        # fingerprint is unknown before retrieval; the result cache inside the flight still checks it
+        # keyed by priority too: the flight's LLM call queues at the leader's priority
+        flight_key = (llm_priority.get(), itinerary_cache_key(PIPELINE_VERSION, city, days, audience, interests, ""))
+        plan, shared = await itinerary_flights.do(flight_key, plan_in_own_session)
+        if shared:
+            lap("coalesced")
+            for key, day_plan in plan["itinerary"].items():
+                emit("day", {"day": key, "items": day_plan})
+    else:
+        plan = await _plan_itinerary(db, city, days, audience, report, emit, stream_llm=on_event is not None,
+                                     planner=planner, interests=interests)
+
+    report("persist")
+    req_id = await asyncio.to_thread(_persist, db, plan, city, days, audience, request_id, shared)
+
+    return {
+        "request_id": req_id,
+        "city": city,
+        "days": days,
+        "suitable_for": audience or "",
+        "itinerary": plan["itinerary"],
+        "auto_parameters": {**plan["auto_parameters"], "coalesced": shared},
+    }
+
+
+def _persist(db: Session, plan: Dict[str, Any], city: str, days: int, audience: Optional[str],
+             request_id: Optional[int], shared: bool) -> int:
+    """Persist request, candidate snapshot and result (blocking; worker thread). Returns the request id."""
+    req = db.get(ItineraryRequest, request_id) if request_id is not None else None
+    if req is None:
+        req = ItineraryRequest(city=city, days=days, suitable_for=audience or None, version=PIPELINE_VERSION)
+        db.add(req); db.flush()
+    req.prompt_budget_json = plan["auto_parameters"].get("prompt_budget")
+
+    cand_rows = [
+        ItineraryCandidate(
+            itinerary_request_id=req.id,
+            place_id=c["place_id"], name=c["name"], lat=c["lat"], lng=c["lng"],
+            avg_visit_mins=int(c["visit_minutes"]), rating=float(c.get("rating") or 0.0),
+            distance_from_city_km=float(c.get("distance_from_city_km") or 0.0),
+            # do not pass hop_from_city_min unless your model has this column
+            city=c.get("city") or None
+        ) for c in plan["candidates"]
+    ]
+    if cand_rows:
+        db.add_all(cand_rows)
+
+    db.add(ItineraryResult(
+        itinerary_request_id=req.id,
+        itinerary_json=plan["itinerary"],
+        auto_params_json={**plan["auto_parameters"], "coalesced": shared},
+    ))
+    db.commit()
+    lap("persist")
+    return req.id
+
+
+async def _plan_itinerary(
+    db: Session,
+    city: str,
+    days: int,
+    audience: Optional[str],
+    report: Callable[[str], None],
+    emit: Callable[[str, Dict[str, Any]], None],
+    stream_llm: bool = False,
+    planner: str = PLANNER_LLM,
+    interests: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Everything up to persistence: {"candidates", "itinerary", "auto_parameters"}.
+    DB access and the CPU-heavy stages run in worker threads; only the model
+    call and the callbacks run on the event loop.
+    """
+    loop = asyncio.get_running_loop()
+
+    def emit_soon(event: str, data: Dict[str, Any]):
+        # for the stages in worker threads: on_event consumers (e.g. the SSE queue) belong to the loop
+        loop.call_soon_threadsafe(emit, event, data)
+
+    # 1) City coordinates
+    report("locate")
+    city_lat, city_lon = await asyncio.to_thread(_locate_city, db, city)
+
+    # 2) Auto radius
+    radius_km = auto_radius_km(days)
+
+    # 3) Candidate fetch (in-memory spatial index)
+    report("retrieve")
+    rows = await asyncio.to_thread(nearby_places, db, city_lat, city_lon, radius_km)
+    if not rows:
+        raise HTTPException(status_code=404, detail="No nearby places found in DB")
+    interest_matches = None
+    if interests:
+        rows, interest_matches = await _focus_on_interests(rows, interests, days)
+    lap("retrieval")
+
+    # Same params + same candidate rows (place_id, updated_at) -> same plan; skip the LLM
+    cache_key = None
+    if ITINERARY_CACHE_ENABLED and planner == PLANNER_LLM:
+        cache_key = itinerary_cache_key(PIPELINE_VERSION, city, days, audience, interests,
+                                        candidate_fingerprint(rows))
+        cached = itinerary_cache.get(cache_key)
+        if cached is not None:
+            for key, plan in cached["itinerary"].items():
+                emit("day", {"day": key, "items": plan})
+            cached["auto_parameters"]["cache_hit"] = True
+            return cached
+
+    # 4) Normalize candidates and compute hop time from city
+    report("candidates")
+    base, matrix, ranked = await asyncio.to_thread(_prepare_candidates, rows, city_lat, city_lon)
+
+    # 5-7) Seed itinerary: from the model, or planned without it
+    if planner == PLANNER_DETERMINISTIC:
+        shortlist, itinerary = await asyncio.to_thread(
+            _deterministic_seed, ranked, days, city_lat, city_lon, audience, emit_soon)
+        prompt_budget, llm_status = None, "skipped"
+    else:
+        shortlist, itinerary, prompt_budget, llm_status = await _llm_seed(
+            city, days, ranked, city_lat, city_lon, report, emit, stream_llm)
+
+    # 8) Validate and repair plan
+    report("repair")
+    validated, route_stats, quality = await asyncio.to_thread(
+        _repair_itinerary, itinerary, base, matrix, days, planner, emit_soon)
+
+    # 9) Result (persisted by the caller)
+    auto_params_obj = {
+        "candidate_radius_km": radius_km,
+        "day_budget_minutes": DAY_BUDGET_MIN,
+        "end_of_day_buffer_min": END_OF_DAY_BUFFER_MIN,
+        "urban_speed_kmh": URBAN_SPEED_KMH,
+        "intercity_speed_kmh": INTERCITY_SPEED_KMH,
+        "per_hop_buffer_min": HOP_BUFFER_MIN,
+        "out_of_city_one_way_km_max": OUT_OF_CITY_ONE_WAY_KM_MAX,
+        "target_items_per_day": TARGET_ITEMS_PER_DAY,
+        "max_items_per_day": MAX_ITEMS_PER_DAY,
+        "planner": planner,
+        "interests": interests,
+        "interest_matches": interest_matches,
+        "prompt_budget": prompt_budget,
+        "llm_status": llm_status,
+        "quality": quality,
+        "route_optimization": {
+            "per_day": route_stats,
+            "minutes_saved": sum(r["minutes_saved"] for r in route_stats.values()),
+        },
+    }
+    lap("repair")
+    # only cache real model output; a fallback plan should get another LLM try next time
+    if cache_key is not None and llm_status == "ok":
+        itinerary_cache.set(cache_key, {"candidates": shortlist, "itinerary": validated,
+                                        "auto_parameters": auto_params_obj})
+    return {"candidates": shortlist, "itinerary": validated,
+            "auto_parameters": {**auto_params_obj, "cache_hit": False}}
+
+
+def _locate_city(db: Session, city: str):
+    city_row = db.query(Places).filter(Places.city.ilike(city)).first()
+    if not city_row or not city_row.lat or not city_row.lng:
+        raise HTTPException(status_code=404, detail=f"No coordinates found for city {city}")
+    return float(city_row.lat), float(city_row.lng)
+
+
+def _prepare_candidates(rows: List[Dict[str, Any]], city_lat: float, city_lon: float):
+    """Normalized candidates, their travel-time matrix and the tiered ranking (CPU; worker thread)."""
+    base: List[Dict[str, Any]] = []
+    for row in rows:
+        p = dict(row)
+        obj = {
+            "place_id": safe_val(p.get("place_id")),
+            "name": safe_val(p.get("name")),
+            "lat": float(safe_val(p.get("lat"))),
+            "lng": float(safe_val(p.get("lng"))),
+            "avg_visit_mins": parse_mins(safe_val(p.get("avg_visit_mins")), default=90),
+            "rating": float(safe_val(p.get("rating"))) if p.get("rating") is not None else 0.0,
+            "tags": safe_val(p.get("tags")),
+            "description": safe_val(p.get("description")),
+            "suitable_for_val": str(p.get("suitable_for") or ""),
+            "distance_from_city_km": float(round(float(safe_val(p.get("distance_km", 0.0))), 2)),
+            "city": safe_val(p.get("city")),
+        }
+        base.append(obj)
+
+    # One travel-time matrix per request (city centre + every candidate)
+    matrix = TravelMatrix(city_lat, city_lon, base)
+    for obj in base:
+        obj["hop_from_city_min"] = matrix.from_city(obj["place_id"])
+
+    ranked = rank_by_tier(base, "distance_from_city_km", visit_key="avg_visit_mins",
+                          far_max_km=OUT_OF_CITY_ONE_WAY_KM_MAX)
+    return base, matrix, ranked
+
+
+def _repair_itinerary(
+    itinerary: Dict[str, List[Dict[str, Any]]],
+    base: List[Dict[str, Any]],
+    matrix: TravelMatrix,
+    days: int,
+    planner: str,
+    emit: Callable[[str, Dict[str, Any]], None],
+):
+    """
+    8) Validate and repair the seed plan (prefer 3-5 items/day; far-only
+    single-item guard) and route each day. Pure CPU: runs in a worker thread.
+    Returns (validated, route_stats, quality).
+    """
+    by_id = {c["place_id"]: c for c in base}
+    default_reason = "Model-selected" if planner == PLANNER_LLM else "Planner-selected"
+
+    def validate_and_repair_day(items: List[Dict[str, Any]],
+                                min_items: int = 3,
+                                max_items: int = MAX_ITEMS_PER_DAY) -> List[Dict[str, Any]]:
+        day_plan = []
+        time_used = 0
+        cur = CITY
+
+        # Greedy accept while fitting time
+        for it in items[:max_items]:
+            pid = it.get("place_id")
+            poi = by_id.get(pid)
+            if not poi:
+                continue
+            hop = matrix.hop(cur, pid)
+            projected = time_used + hop + poi["avg_visit_mins"]
+            back_home = matrix.to_city(pid)
+            if projected + back_home + END_OF_DAY_BUFFER_MIN <= DAY_BUDGET_MIN:
+                day_plan.append({
+                    "place": poi["name"], "place_id": poi["place_id"], "city": poi["city"],
+                    "travel_from_prev_minutes": hop, "visit_minutes": poi["avg_visit_mins"],
+                    "distance_from_city_km": poi["distance_from_city_km"],
+                    "reason": it.get("reason") or default_reason
+                })
+                time_used = projected
+                cur = pid
+
+        # Try to reach min_items if possible
+        if len(day_plan) < min_items:
+            chosen = {dp["place_id"] for dp in day_plan}
+            for it in items:
+                if len(day_plan) >= min_items:
+                    break
+                pid = it.get("place_id")
+                if pid in chosen:
+                    continue
+                poi = by_id.get(pid)
+                if not poi:
+                    continue
+                hop = matrix.hop(cur, pid)
+                projected = time_used + hop + poi["avg_visit_mins"]
+                back_home = matrix.to_city(pid)
+                if projected + back_home + END_OF_DAY_BUFFER_MIN <= DAY_BUDGET_MIN and len(day_plan) < max_items:
+                    day_plan.append({
+                        "place": poi["name"], "place_id": poi["place_id"], "city": poi["city"],
+                        "travel_from_prev_minutes": hop, "visit_minutes": poi["avg_visit_mins"],
+                        "distance_from_city_km": poi["distance_from_city_km"],
+                        "reason": it.get("reason") or default_reason
+                    })
+                    time_used = projected
+                    cur = pid
+
+        return day_plan
+
+    def greedy_fill_nearby(base, used_ids, max_items=3):
+        cand = sorted(
+            [c for c in base if c["place_id"] not in used_ids],
+            key=lambda x: (matrix.km_from_city(x["place_id"]), -x["rating"])
+        )
+        plan, time_used = [], 0
+        cur = CITY
+        for c in cand:
+            if len(plan) >= max_items:
+                break
+            hop = matrix.hop(cur, c["place_id"])
+            projected = time_used + hop + c["avg_visit_mins"]
+            back_home = matrix.to_city(c["place_id"])
+            if projected + back_home + END_OF_DAY_BUFFER_MIN <= DAY_BUDGET_MIN:
+                plan.append({
+                    "place": c["name"], "place_id": c["place_id"], "city": c["city"],
+                    "travel_from_prev_minutes": hop, "visit_minutes": c["avg_visit_mins"],
+                    "distance_from_city_km": c["distance_from_city_km"],
+                    "reason": "Greedy fill (LLM fallback)"
+                })
+                time_used = projected
+                cur = c["place_id"]
+        return plan
+
+    def order_model_items(items: List[Dict[str, Any]], max_items: int = MAX_ITEMS_PER_DAY) -> List[Dict[str, Any]]:
+        # Route the stops repair will consider first, so less of the budget goes to travel
+        seen, known = set(), []
+        for it in items:
+            pid = it.get("place_id")
+            if pid in by_id and pid not in seen:
+                seen.add(pid)
+                known.append(it)
+        head, tail = known[:max_items], known[max_items:]
+        route = optimize_route(matrix, [it["place_id"] for it in head])
+        pos = {pid: i for i, pid in enumerate(route["order"])}
+        return sorted(head, key=lambda it: pos[it["place_id"]]) + tail
+
+    def finalize_day_order(day_plan: List[Dict[str, Any]], model_items: List[Dict[str, Any]]):
+        # Reorder the final stops; savings are measured against the model's order for the same stops
+        stops = [dp["place_id"] for dp in day_plan]
+        model_rank = {it.get("place_id"): i for i, it in enumerate(model_items)}
+        input_order = sorted(stops, key=lambda pid: (model_rank.get(pid, len(model_items)), stops.index(pid)))
+        route = optimize_route(matrix, input_order)
+
+        by_stop = {dp["place_id"]: dp for dp in day_plan}
+        reordered, time_used, cur = [], 0, CITY
+        for pid in route["order"]:
+            dp = dict(by_stop[pid])
+            hop = matrix.hop(cur, pid)
+            time_used += hop + by_id[pid]["avg_visit_mins"]
+            if time_used + matrix.to_city(pid) + END_OF_DAY_BUFFER_MIN > DAY_BUDGET_MIN:
+                reordered = None  # breaks an intermediate check; keep the repaired order
+                break
+            if "travel_from_prev_minutes" in dp:
+                dp["travel_from_prev_minutes"] = hop
+            reordered.append(dp)
+            cur = pid
+        if reordered is None:
+            reordered = day_plan
+
+        final_minutes = route_minutes(matrix, [dp["place_id"] for dp in reordered])
+        return reordered, {
+            "input_minutes": route["input_minutes"],
+            "optimized_minutes": final_minutes,
+            "minutes_saved": route["input_minutes"] - final_minutes,
+            "method": route["method"],
+            "elapsed_ms": route["elapsed_ms"],
+        }
+
+    used_ids = set()
+    validated: Dict[str, List[Dict[str, Any]]] = {}
+    route_stats: Dict[str, Dict[str, Any]] = {}
+
+    for d in range(1, days + 1):
+        key = f"Day {d}"
+        model_items = itinerary.get(key, [])
+        model_items = [x for x in model_items if x.get("place_id") not in used_ids]
+        day_plan = validate_and_repair_day(order_model_items(model_items), min_items=3, max_items=MAX_ITEMS_PER_DAY)
+
+        # If single-item but not a true far day-trip, try to add more nearby feasible items
+        if len(day_plan) == 1:
+            pid = day_plan[0]["place_id"]
+            poi = by_id.get(pid)
+            total = matrix.round_trip(pid, poi["avg_visit_mins"])
+            is_far = (poi["distance_from_city_km"] >= 60) or (poi["hop_from_city_min"] >= 90)
+            high_util = total >= int(0.7 * DAY_BUDGET_MIN)
+            if not (is_far and high_util):
+                # Try to enrich the day with greedy additions
+                extra = greedy_fill_nearby([c for c in base if c["place_id"] != pid], used_ids, max_items=2)
+                day_plan.extend([e for e in extra if e["place_id"] not in {pid}])
+                # Keep at most MAX_ITEMS_PER_DAY
+                if len(day_plan) > MAX_ITEMS_PER_DAY:
+                    day_plan = day_plan[:MAX_ITEMS_PER_DAY]
+
+        # If still empty, attempt greedy fill; if still empty, consider far-day backstop
+        if not day_plan:
+            day_plan = greedy_fill_nearby(base, used_ids, max_items=3)
+
+        if not day_plan:
+            far_pool = [
+                c for c in base
+                if c["place_id"] not in used_ids and (
+                    c["distance_from_city_km"] >= 60 or c["hop_from_city_min"] >= 90
+                )
+            ]
+            far_pool.sort(key=lambda x: (-x["rating"], x["distance_from_city_km"]))
+            for c in far_pool:
+                total = matrix.round_trip(c["place_id"], c["avg_visit_mins"])
+                if total + END_OF_DAY_BUFFER_MIN <= DAY_BUDGET_MIN and total >= int(0.7 * DAY_BUDGET_MIN):
+                    day_plan = [{
+                        "place": c["name"], "place_id": c["place_id"], "city": c["city"],
+                        "reason": "Full-day out-of-city landmark; travel+visit fits daily budget",
+                        "estimated_minutes": total,
+                        "distance_from_city_km": c["distance_from_city_km"]
+                    }]
+                    break
+
+        day_plan, route_stats[key] = finalize_day_order(day_plan, model_items)
+        validated[key] = day_plan
+        emit("day", {"day": key, "items": day_plan, "route": route_stats[key]})
+        for it in day_plan:
+            used_ids.add(it["place_id"])
+
+    return validated, route_stats, score_itinerary(validated, by_id, matrix)
+
+
+async def _focus_on_interests(rows: List[Dict[str, Any]], interests: str, days: int):
+    """
+    Nearby rows that match `interests` best first (hybrid retrieval restricted
+    to these rows), then the remaining rows in distance order up to
+    2 x days x MAX_ITEMS_PER_DAY. Returns (rows, number of interest matches).
+    """
+    hits = await asyncio.to_thread(hybrid_rank, interests, limit=ITINERARY_INTEREST_CANDIDATES,
+                                   ids=[r["id"] for r in rows])
+    by_id = {r["id"]: r for r in rows}
+    focused = [by_id[h["id"]] for h in hits if h["id"] in by_id]
+    if not focused:
+        return rows, 0
+    picked = {r["id"] for r in focused}
+    need = 2 * days * MAX_ITEMS_PER_DAY
+    focused += [r for r in rows if r["id"] not in picked][:max(0, need - len(focused))]
+    return focused, len(picked)
+
+
+def _shortlist_row(c: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "place_id": c["place_id"], "name": c["name"],
+        "lat": c["lat"], "lng": c["lng"],
+        "visit_minutes": c["avg_visit_mins"], "rating": c["rating"],
+        "distance_from_city_km": c["distance_from_city_km"],
+        "hop_from_city_min": c["hop_from_city_min"],
+        "city": c["city"],
+    }
+
+
+def _deterministic_seed(
+    ranked: List[Dict[str, Any]],
+    days: int,
+    city_lat: float,
+    city_lon: float,
+    audience: Optional[str],
+    emit: Callable[[str, Dict[str, Any]], None],
+):
+    """planner=deterministic: score, cluster and order places without a model call."""
+    selected, itinerary = plan_days(ranked, days, city_lat, city_lon, audience=audience)
+    shortlist = [{**_shortlist_row(c), "day_group": c["day_group"], "score": c["score"]} for c in selected]
+    lap("candidates")
+    emit("candidates", {"count": len(shortlist), "candidates": [
+        {k: c[k] for k in ("place_id", "name", "lat", "lng", "day_group")} for c in shortlist
+    ]})
+    return shortlist, itinerary
+
+
+def _llm_prompt(city: str, days: int, ranked: List[Dict[str, Any]], city_lat: float, city_lon: float):
+    """
+    Budgeted shortlist, day clusters and prompt for planner=llm (CPU; worker thread).
+    Returns (candidates_for_llm, day_groups, prompt, aliases, prompt_budget).
+    """
+    # 5) Candidate list for the LLM: as many of the tiered ranking as the prompt budget allows
+    candidates_for_llm = [{**_shortlist_row(c), "_tier": c["_tier"]} for c in ranked]
+    # day_group is assigned by the clustering below; budget its widest value (days)
+    candidates_for_llm, prompt_budget = plan_candidates(
+        candidates_for_llm, PROMPT_COLUMNS, min_candidates=days * MAX_ITEMS_PER_DAY, max_candidates=MAX_AI_CANDIDATES,
+        placeholders={"day_group": days})
+
+    # Pre-group candidates into compact, balanced day clusters
+    day_groups = cluster_into_days(candidates_for_llm, days, city_lat, city_lon, visit_key="visit_minutes")
+    group_of = day_group_map(day_groups)
+    for c in candidates_for_llm:
+        c["day_group"] = group_of[c["place_id"]]
+    lap("candidates")
+
+    # 6) Prompt (3–5 items/day; far-day guard) for the strict JSON schema
+    candidate_block, aliases = encode_candidates(candidates_for_llm, PROMPT_COLUMNS, indent=None,
+                                                 description_chars=prompt_budget["description_chars"])
+    prompt = f"""
+
+Return STRICT JSON ONLY conforming to this schema (no prose): {encode_schema(LLM_SCHEMA, indent=None)}
+
+Task: Generate a {days}-day itinerary for {city}. Use ONLY the places in Candidates. Arrange days to minimize travel by grouping nearby places.
+
+Daily rules:
+
+Aim for 3–5 places per day. Prefer 3–4 if time is tight.
+
+Daily time budget: {DAY_BUDGET_MIN} minutes (travel + visits). Reserve {END_OF_DAY_BUFFER_MIN} minutes buffer.
+
+Out-of-city day-trip rule (single-item day): If and ONLY if a place is outside the city (distance_from_city_km ≥ 60) AND hop_from_city_min2 + visit_minutes ≥ 0.7{DAY_BUDGET_MIN}, schedule that place alone on that day. Otherwise, do NOT return a single-item day.
+
+Prefer higher rating and reasonable proximity; maintain variety across days.
+
+Candidates are pre-grouped by location: day_group N is a compact cluster sized for one day. Build Day N mainly from day_group N and order its places to minimize travel; only move a place to another day to respect the time budget or the day-trip rule.
+
+Candidates: {candidates_note(aliases)}
+{candidate_block}
+""".strip()
+    finish_budget(prompt_budget, prompt)
+    lap("prompt")
+    return candidates_for_llm, day_groups, prompt, aliases, prompt_budget
+
+
+async def _llm_seed(
+    city: str,
+    days: int,
+    ranked: List[Dict[str, Any]],
+    city_lat: float,
+    city_lon: float,
+    report: Callable[[str], None],
+    emit: Callable[[str, Dict[str, Any]], None],
+    stream_llm: bool,
+):
+    """
+    planner=llm: prompt the model with the budgeted shortlist. Returns
+    (shortlist, itinerary seed, prompt_budget, llm_status); the seed falls
+    back to the day clusters if the model fails or is overloaded.
+    """
+    candidates_for_llm, day_groups, prompt, aliases, prompt_budget = await asyncio.to_thread(
+        _llm_prompt, city, days, ranked, city_lat, city_lon)
+    emit("candidates", {"count": len(candidates_for_llm), "candidates": [
+        {k: c[k] for k in ("place_id", "name", "lat", "lng", "day_group")} for c in candidates_for_llm
+    ]})
+
+    # 7) Call LLM with structured outputs; fallback to plain generate; fallback to clusters
+    llm_status = "ok"
+
+    async def get_llm_itinerary_or_none(prompt: str, schema_hint: dict) -> Optional[dict]:
+        nonlocal llm_status
+        try:
+            if stream_llm:
+                parts = []
+                async for delta in llm_client.chat_stream(prompt, schema=schema_hint, model=LLM_MODEL,
+                                                          validate=is_itinerary_json):
+                    parts.append(delta)
+                    emit("llm_token", {"text": delta})
+                raw = "".join(parts)
+            else:
+                raw = await llm_client.chat(prompt, schema=schema_hint, model=LLM_MODEL, validate=is_itinerary_json)
+            iti = itinerary_from_json(raw)
+            if iti:
+                return iti
+        except LLMOverloaded:
+            llm_status = "overloaded"  # queue too deep: plan from the clusters now rather than wait
+            return None
+        except Exception:
+            pass
+        try:
+            iti = itinerary_from_json(await llm_client.generate(prompt, model=LLM_MODEL, validate=is_itinerary_json))
+            if iti:
+                return iti
+        except LLMOverloaded:
+            llm_status = "overloaded"
+            return None
+        except Exception:
+            pass
+        llm_status = "failed"
+        return None
+
+    report("llm")
+    itinerary = decode_place_ids(await get_llm_itinerary_or_none(prompt, LLM_SCHEMA), aliases)
+
+    # If model failed, seed each day from its geographic cluster so days aren't empty
+    if itinerary is None:
+        # seed as lists of place_id dicts; validation will expand to full items
+        itinerary = {f"Day {i+1}": [{"place_id": c["place_id"]} for c in day_groups[i]] for i in range(days)}
+    lap("llm")
+    return candidates_for_llm, itinerary, prompt_budget, llm_status
@@ -1,20 +1,32 @@
 from fastapi import APIRouter, HTTPException, Depends, status, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta, time
-from app.database.db import get_db
+from app.database.db import get_db, SessionLocal
 from app.api.places.models import Places
-from typing import List, Optional, Dict, Any
+from typing import Optional
 from app.utils.embeddings import get_embedding
 import subprocess
-from sqlalchemy import text, func, Table, MetaData, create_engine
+from sqlalchemy import func, Table, MetaData, create_engine
 import json, math, httpx, subprocess
-from app.api.places.schema import WEEKDAYS, EntryFee, Accessibility, PlaceCreate
+import asyncio, logging
 import os
 from decimal import Decimal
 from sqlalchemy import MetaData, create_engine
-from app.utils.helper import URBAN_SPEED_KMH, INTERCITY_SPEED_KMH, EARTH_KM, MAX_AI_CANDIDATES, MAX_ITEMS_PER_DAY, TARGET_ITEMS_PER_DAY, OUT_OF_CITY_ONE_WAY_KM_MAX, END_OF_DAY_BUFFER_MIN, DAY_BUDGET_MIN, HOP_BUFFER_MIN, OLLAMA_URL, TRAVEL_BUFFER_MIN, DAILY_AVAILABLE_MINS, EARTH_RADIUS_KM, MAX_CANDIDATES, MAX_VISITS_PER_DAY, TARGET_VISITS_PER_DAY, OUTER_BOUNDARY_KM, END_BUFFER_MIN, DAY_MAX_MINUTES, DAY_END_HOUR, DAY_START_HOUR, LLM_MODEL
-from app.api.itineraries.models import ItineraryRequest, ItineraryCandidate, ItineraryResult, ItineraryModelIO
-from app.utils.helper import persist_itinerary, adjust_start_time_for_opening, is_within_open_hours, parse_time, round_trip_minutes, hop_time_minutes, hop_time_from_city_minutes, travel_minutes_est, AUDIENCE_TERMS, text_blob, auto_radius_km, parse_mins, ai_fill_with_llama, safe_val, haversine_km, query_llama, query_llama_local, query_llama_structured, query_llama_subprocess
+from app.utils.helper import URBAN_SPEED_KMH, INTERCITY_SPEED_KMH, MAX_AI_CANDIDATES, MAX_ITEMS_PER_DAY, TARGET_ITEMS_PER_DAY, OUT_OF_CITY_ONE_WAY_KM_MAX, END_OF_DAY_BUFFER_MIN, DAY_BUDGET_MIN, HOP_BUFFER_MIN, TRAVEL_BUFFER_MIN, DAILY_AVAILABLE_MINS, MAX_CANDIDATES, MAX_VISITS_PER_DAY, TARGET_VISITS_PER_DAY, OUTER_BOUNDARY_KM, END_BUFFER_MIN, DAY_MAX_MINUTES, DAY_END_HOUR, DAY_START_HOUR, LLM_MODEL
+from app.api.itineraries.models import ItineraryRequest, ItineraryCandidate, ItineraryResult, ItineraryModelIO, ItineraryJob
+from app.utils.spatial_index import nearby_places
+from app.utils.travel_matrix import TravelMatrix
+from app.utils.day_clustering import cluster_into_days, day_group_map
+from app.utils.llm_cache import is_json
+from app.utils.llm_client import LLMOverloaded, llm_client, run_from_thread
+from app.utils.llm_scheduler import llm_scheduler
+from app.utils.prompt_budget import finish_budget, plan_candidates, rank_by_tier
+from app.utils.prompt_encoding import candidates_note, decode_place_ids, encode_candidates, encode_schema
+from app.utils.timing import lap
+from app.api.itineraries.pipeline import PLANNER_LLM, PLANNERS, run_itinerary_pipeline
+from app.api.itineraries.jobs import job_runner
+from app.utils.helper import persist_itinerary, adjust_start_time_for_opening, is_within_open_hours, parse_time, travel_minutes_est, AUDIENCE_TERMS, text_blob, parse_mins, ai_fill_with_llama, safe_val, query_llama_local
 router = APIRouter(prefix="/itinerary", tags=["Itinerary"])
 metadata = MetaData()
 engine = create_engine(os.getenv("DATABASE_URL"), future=True)
@@ -45,38 +57,18 @@ def generate_itinerary(
     # -------------------------
     # 2. Fetch candidate places within radius
     # -------------------------
-    haversine_sql = text("""
-    SELECT *,
-           (6371 * acos(
-                cos(radians(:lat)) * cos(radians(lat)) *
-                cos(radians(lng) - radians(:lon)) +
-                sin(radians(:lat)) * sin(radians(lat))
-           )) AS distance_km
-    FROM places
-    WHERE lat IS NOT NULL AND lng IS NOT NULL
-      AND (6371 * acos(
-                cos(radians(:lat)) * cos(radians(lat)) *
-                cos(radians(lng) - radians(:lon)) +
-                sin(radians(:lat)) * sin(radians(lat))
-           )) <= :radius
-    ORDER BY distance_km ASC
-""")
-
-
-    candidates = db.execute(
-        haversine_sql,
-        {"lat": city_lat, "lon": city_lon, "radius": radius_km}
-    ).fetchall()
+    candidates = nearby_places(db, city_lat, city_lon, radius_km)
 
     if not candidates:
         raise HTTPException(status_code=404, detail="No nearby places found in DB")
+    lap("retrieval")
 
     # -------------------------
     # 3. Apply filters
     # -------------------------
     filtered = []
     for row in candidates:
-        place = dict(row._mapping)
+        place = dict(row)
         if suitable_for and place.get("suitable_for"):
             if suitable_for not in place["suitable_for"]:
                 continue
@@ -99,7 +91,6 @@ def generate_itinerary(
     places_data = [
         {
             "name": safe_val(p["name"]),
-            "category": safe_val(p.get("tags")),
             "tags": safe_val(p.get("tags")),
             "duration": safe_val(p.get("avg_visit_mins")),
             "rating": safe_val(p.get("rating")),
@@ -108,6 +99,14 @@ def generate_itinerary(
         }
         for p in filtered
     ]
+    # Everything within radius_km can be hundreds of places; keep what fits the prompt budget
+    place_columns = ("name", "tags", "duration", "rating", "distance_km", "description")
+    places_data, prompt_budget = plan_candidates(
+        rank_by_tier(places_data, "distance_km", visit_key="duration"), place_columns,
+        min_candidates=days * MAX_ITEMS_PER_DAY, id_key=None)
+    places_block, _ = encode_candidates(places_data, place_columns, id_key=None,
+                                        description_chars=prompt_budget["description_chars"])
+    lap("candidates")
 
     # -------------------------
     # 5. Build AI prompt
@@ -120,7 +119,7 @@ Suitable for: {suitable_for}.
 Trip type: {trip_type or "general"}.
 
 Here are the available places with details:
-{json.dumps(places_data, indent=2)}
+{places_block}
 
 Rules:
 - Provide a JSON response only.
@@ -135,16 +134,27 @@ Rules:
 - Prefer closer places first, but allow longer day trips if worth it.
 - Ensure places fit the given trip type & suitable_for.
 """
+    finish_budget(prompt_budget, prompt)
+    logging.info(f"generate_itinerary prompt budget for {city}: {prompt_budget}")
+    lap("prompt")
 
     # -------------------------
     # 6. Query AI Model
     # -------------------------
-    raw_response = query_llama(prompt)
+    try:
+        raw_response = run_from_thread(llm_client.generate, prompt, model=LLM_MODEL)
+    except LLMOverloaded:
+        # no deterministic planner behind this endpoint: refuse fast instead of queueing
+        raise HTTPException(status_code=503, detail="Itinerary model is busy, retry later",
+                            headers={"Retry-After": "10"})
+    except Exception:
+        raw_response = ""
 
     try:
         itinerary = json.loads(raw_response)
     except:
         itinerary = {"raw_response": raw_response}
+    lap("llm")
 
     # -------------------------
     # 7. Return Response
@@ -155,357 +165,107 @@ Rules:
         "suitable_for": suitable_for,
         "trip_type": trip_type or "general",
         "itinerary": itinerary,
+        "prompt_budget": prompt_budget,
     }
 
 PlacesTable = Table("places", metadata, autoload_with=engine)
 
 @router.post("/generate_itinerary1")
-def generate_itinerary(
+async def generate_itinerary(
     city: str,
     days: int,
     suitable_for: Optional[str] = Query(default=None),
+    planner: str = Query(default=PLANNER_LLM, description=f"one of {', '.join(PLANNERS)}"),
+    interests: Optional[str] = Query(default=None, description="free text; favours matching places"),
     db: Session = Depends(get_db)
 ):
-    audience = (suitable_for or "").strip().lower() or None
-
-    # 1) City coordinates
-    city_row = db.execute(PlacesTable.select().where(PlacesTable.c.city.ilike(city))).fetchone()
-    if not city_row or not city_row.lat or not city_row.lng:
-        raise HTTPException(status_code=404, detail=f"No coordinates found for city {city}")[3]
-    city_lat = float(city_row.lat)
-    city_lon = float(city_row.lng)
-
-    # 2) Auto radius
-    radius_km = auto_radius_km(days)
-
-    # 3) SQL Haversine fetch
-    haversine_sql = text("""
-        SELECT *,
-            (6371 * acos(
-                    cos(radians(:lat)) * cos(radians(lat)) *
-                    cos(radians(lng) - radians(:lon)) +
-                    sin(radians(:lat)) * sin(radians(lat))
-            )) AS distance_km
-        FROM places
-        WHERE lat IS NOT NULL AND lng IS NOT NULL
-        AND (6371 * acos(
-                    cos(radians(:lat)) * cos(radians(lat)) *
-                    cos(radians(lng) - radians(:lon)) +
-                    sin(radians(:lat)) * sin(radians(lat))
-            )) <= :radius
-        ORDER BY distance_km ASC
-    """)
-    rows = db.execute(haversine_sql, {"lat": city_lat, "lon": city_lon, "radius": radius_km}).fetchall()
-    if not rows:
-        raise HTTPException(status_code=404, detail="No nearby places found in DB")[3]
-
-    # 4) Normalize candidates and compute hop time from city
-    base: List[Dict[str, Any]] = []
-    for row in rows:
-        p = dict(row._mapping)
-        obj = {
-            "place_id": safe_val(p.get("place_id")),
-            "name": safe_val(p.get("name")),
-            "lat": float(safe_val(p.get("lat"))),
-            "lng": float(safe_val(p.get("lng"))),
-            "avg_visit_mins": parse_mins(safe_val(p.get("avg_visit_mins")), default=90),
-            "rating": float(safe_val(p.get("rating"))) if p.get("rating") is not None else 0.0,
-            "tags": safe_val(p.get("tags")),
-            "description": safe_val(p.get("description")),
-            "suitable_for_val": str(p.get("suitable_for") or ""),
-            "distance_from_city_km": float(round(float(safe_val(p.get("distance_km", 0.0))), 2)),
-            "city": safe_val(p.get("city")),
-        }
-        obj["hop_from_city_min"] = hop_time_from_city_minutes(obj, city_lat, city_lon)
-        base.append(obj)
-
-    # 5) Build candidate list for LLM (include far under policy cap)
-    near = [x for x in base if x["distance_from_city_km"] <= 30.0]
-    mid  = [x for x in base if 30.0 < x["distance_from_city_km"] <= 80.0]
-    far  = [x for x in base if 80.0 < x["distance_from_city_km"] <= OUT_OF_CITY_ONE_WAY_KM_MAX]
-    near.sort(key=lambda x: (x["distance_from_city_km"], -x["rating"], x["avg_visit_mins"]))
-    mid.sort(key=lambda x: (x["distance_from_city_km"], -x["rating"], x["avg_visit_mins"]))
-    far.sort(key=lambda x: (-x["rating"], x["distance_from_city_km"]))
-    candidates_for_llm = near[:18] + mid[:12] + far[:12]
-    candidates_for_llm = [
-        {
-            "place_id": c["place_id"], "name": c["name"],
-            "lat": c["lat"], "lng": c["lng"],
-            "visit_minutes": c["avg_visit_mins"], "rating": c["rating"],
-            "distance_from_city_km": c["distance_from_city_km"],
-            "hop_from_city_min": c["hop_from_city_min"],
-            "city": c["city"]
-        } for c in candidates_for_llm[:MAX_AI_CANDIDATES]
-    ]
-
-    # 6) Strict JSON schema and prompt (3–5 items/day; far-day guard)
-    schema_hint = {
-        "type": "object",
-        "properties": {
-            "itinerary": {
-                "type": "object",
-                "patternProperties": {
-                    "^Day [1-9][0-9]*$": {
-                        "type": "array",
-                        "items": {
-                            "type": "object",
-                            "properties": {
-                                "place_id": {"type": "string"},
-                                "reason": {"type": "string"},
-                                "notes": {"type": "string"}
-                            },
-                            "required": ["place_id"]
-                        }
-                    }
-                },
-                "additionalProperties": False
-            }
-        },
-        "required": ["itinerary"]
-    }
-    prompt = f"""
+    return await run_itinerary_pipeline(db, city, days, suitable_for, planner=planner, interests=interests)
 
-Return STRICT JSON ONLY conforming to this schema (no prose): {json.dumps(schema_hint)}
 
-Task: Generate a {days}-day itinerary for {city}. Use ONLY the places in Candidates. Arrange days to minimize travel by grouping nearby places.
-
-Daily rules:
-
-Aim for 3–5 places per day. Prefer 3–4 if time is tight.
-
-Daily time budget: {DAY_BUDGET_MIN} minutes (travel + visits). Reserve {END_OF_DAY_BUFFER_MIN} minutes buffer.
-
-Out-of-city day-trip rule (single-item day): If and ONLY if a place is outside the city (distance_from_city_km ≥ 60) AND hop_from_city_min2 + visit_minutes ≥ 0.7{DAY_BUDGET_MIN}, schedule that place alone on that day. Otherwise, do NOT return a single-item day.
+@router.get("/generate_itinerary1/stream")
+async def stream_itinerary(
+    city: str,
+    days: int,
+    suitable_for: Optional[str] = Query(default=None),
+    planner: str = Query(default=PLANNER_LLM, description=f"one of {', '.join(PLANNERS)}"),
+    interests: Optional[str] = Query(default=None, description="free text; favours matching places"),
+):
+    """
+    generate_itinerary1 as Server-Sent Events: `stage`, `candidates`,
+    `llm_token`, `day`, then `result` (the usual response body) or `error`.
+    """
+    queue: asyncio.Queue = asyncio.Queue()
 
-Prefer higher rating and reasonable proximity; maintain variety across days.
+    def on_event(event, data):
+        queue.put_nowait((event, data))
 
-Candidates (JSON array):
-{json.dumps(candidates_for_llm, ensure_ascii=False)}
-""".strip()
-    # 7) Call LLM with structured outputs; fallback to subprocess; fallback to greedy
-    def get_llm_itinerary_or_none(prompt: str, schema_hint: dict) -> Optional[dict]:
+    async def run():
+        # own session: the request-scoped one may be closed before the stream ends
+        db = SessionLocal()
         try:
-            raw = query_llama_structured(schema_hint, prompt, model=LLM_MODEL, base_url=OLLAMA_URL)[2][1]
-            parsed = json.loads(raw)
-            iti = parsed.get("itinerary", {})
-            if isinstance(iti, dict) and iti:
-                return iti
-        except Exception:
-            pass
+            result = await run_itinerary_pipeline(
+                db, city, days, suitable_for,
+                progress=lambda stage: on_event("stage", {"stage": stage}), on_event=on_event, planner=planner,
+                interests=interests)
+            on_event("result", result)
+        except HTTPException as e:
+            on_event("error", {"status_code": e.status_code, "detail": e.detail})
+        except Exception as e:
+            logging.exception("Itinerary stream failed")
+            on_event("error", {"status_code": 500, "detail": str(e)})
+        finally:
+            db.close()
+            queue.put_nowait(None)
+
+    async def events():
+        task = asyncio.create_task(run())
         try:
-            raw = query_llama_subprocess(prompt, model=LLM_MODEL)[5]
-            parsed = json.loads(raw)
-            iti = parsed.get("itinerary", {})
-            if isinstance(iti, dict) and iti:
-                return iti
-        except Exception:
-            pass
-        return None
-
-    itinerary = get_llm_itinerary_or_none(prompt, schema_hint)
-    model_io_records = [{
-        "stage": "llm_generate",
-        "prompt_text": {"text": prompt},
-        "raw_response_text": {"text": json.dumps(itinerary) if itinerary is not None else "LLM failed or returned empty"}
-    }]
-
-    # If model failed, seed a deterministic round-robin skeleton so days aren't empty
-    if itinerary is None:
-        ordered = sorted(base, key=lambda x: (x["distance_from_city_km"], -x["rating"], x["avg_visit_mins"]))
-        seeds = [[] for _ in range(days)]
-        for idx, poi in enumerate(ordered):
-            # seed as a list of place_id dicts; validation will expand to full items
-            seeds[idx % days].append({"place_id": poi["place_id"]})
-
-        # Correct: just build the dict, no extra indexing
-        itinerary = {f"Day {i+1}": seeds[i] for i in range(days)}
-
-    # 8) Validate and repair plan; prefer 3–5 items/day; far-only single-item guard
-    by_id = {c["place_id"]: c for c in base}
-
-    def validate_and_repair_day(items: List[Dict[str, Any]],
-                                min_items: int = 3,
-                                max_items: int = MAX_ITEMS_PER_DAY) -> List[Dict[str, Any]]:
-        day_plan = []
-        time_used = 0
-        cur_lat, cur_lon = city_lat, city_lon
-
-        # Greedy accept while fitting time
-        for it in items[:max_items]:
-            pid = it.get("place_id")
-            poi = by_id.get(pid)
-            if not poi:
-                continue
-            hop = hop_time_minutes(cur_lat, cur_lon, poi["lat"], poi["lng"], city_lat, city_lon)
-            projected = time_used + hop + poi["avg_visit_mins"]
-            back_home = hop_time_minutes(poi["lat"], poi["lng"], city_lat, city_lon, city_lat, city_lon)
-            if projected + back_home + END_OF_DAY_BUFFER_MIN <= DAY_BUDGET_MIN:
-                day_plan.append({
-                    "place": poi["name"], "place_id": poi["place_id"], "city": poi["city"],
-                    "travel_from_prev_minutes": hop, "visit_minutes": poi["avg_visit_mins"],
-                    "distance_from_city_km": poi["distance_from_city_km"],
-                    "reason": it.get("reason") or "Model-selected"
-                })
-                time_used = projected
-                cur_lat, cur_lon = poi["lat"], poi["lng"]
-
-        # Try to reach min_items if possible
-        if len(day_plan) < min_items:
-            chosen = {dp["place_id"] for dp in day_plan}
-            for it in items:
-                if len(day_plan) >= min_items:
-                    break
-                pid = it.get("place_id")
-                if pid in chosen:
-                    continue
-                poi = by_id.get(pid)
-                if not poi:
-                    continue
-                hop = hop_time_minutes(cur_lat, cur_lon, poi["lat"], poi["lng"], city_lat, city_lon)
-                projected = time_used + hop + poi["avg_visit_mins"]
-                back_home = hop_time_minutes(poi["lat"], poi["lng"], city_lat, city_lon, city_lat, city_lon)
-                if projected + back_home + END_OF_DAY_BUFFER_MIN <= DAY_BUDGET_MIN and len(day_plan) < max_items:
-                    day_plan.append({
-                        "place": poi["name"], "place_id": poi["place_id"], "city": poi["city"],
-                        "travel_from_prev_minutes": hop, "visit_minutes": poi["avg_visit_mins"],
-                        "distance_from_city_km": poi["distance_from_city_km"],
-                        "reason": it.get("reason") or "Model-selected"
-                    })
-                    time_used = projected
-                    cur_lat, cur_lon = poi["lat"], poi["lng"]
-
-        return day_plan
-
-    def greedy_fill_nearby(city_lat, city_lon, base, used_ids, max_items=3):
-        cand = sorted(
-            [c for c in base if c["place_id"] not in used_ids],
-            key=lambda x: (haversine_km(city_lat, city_lon, x["lat"], x["lng"]), -x["rating"])
-        )
-        plan, time_used = [], 0
-        cur_lat, cur_lon = city_lat, city_lon
-        for c in cand:
-            if len(plan) >= max_items:
-                break
-            hop = hop_time_minutes(cur_lat, cur_lon, c["lat"], c["lng"], city_lat, city_lon)
-            projected = time_used + hop + c["avg_visit_mins"]
-            back_home = hop_time_minutes(c["lat"], c["lng"], city_lat, city_lon, city_lat, city_lon)
-            if projected + back_home + END_OF_DAY_BUFFER_MIN <= DAY_BUDGET_MIN:
-                plan.append({
-                    "place": c["name"], "place_id": c["place_id"], "city": c["city"],
-                    "travel_from_prev_minutes": hop, "visit_minutes": c["avg_visit_mins"],
-                    "distance_from_city_km": c["distance_from_city_km"],
-                    "reason": "Greedy fill (LLM fallback)"
-                })
-                time_used = projected
-                cur_lat, cur_lon = c["lat"], c["lng"]
-        return plan[7]
-
-    used_ids = set()
-    validated: Dict[str, List[Dict[str, Any]]] = {}
-
-    for d in range(1, days + 1):
-        key = f"Day {d}"
-        model_items = itinerary.get(key, [])
-        model_items = [x for x in model_items if x.get("place_id") not in used_ids]
-        day_plan = validate_and_repair_day(model_items, min_items=3, max_items=MAX_ITEMS_PER_DAY)
-
-        # If single-item but not a true far day-trip, try to add more nearby feasible items
-        if len(day_plan) == 1:
-            pid = day_plan["place_id"]
-            poi = by_id.get(pid)
-            total = round_trip_minutes(poi, city_lat, city_lon)
-            is_far = (poi["distance_from_city_km"] >= 60) or (hop_time_from_city_minutes(poi, city_lat, city_lon) >= 90)
-            high_util = total >= int(0.7 * DAY_BUDGET_MIN)
-            if not (is_far and high_util):
-                # Try to enrich the day with greedy additions
-                extra = greedy_fill_nearby(city_lat, city_lon, [c for c in base if c["place_id"] != pid], used_ids, max_items=2)
-                day_plan.extend([e for e in extra if e["place_id"] not in {pid}])
-                # Keep at most MAX_ITEMS_PER_DAY
-                if len(day_plan) > MAX_ITEMS_PER_DAY:
-                    day_plan = day_plan[:MAX_ITEMS_PER_DAY]
-
-        # If still empty, attempt greedy fill; if still empty, consider far-day backstop
-        if not day_plan:
-            day_plan = greedy_fill_nearby(city_lat, city_lon, base, used_ids, max_items=3)
-
-        if not day_plan:
-            far_pool = [
-                c for c in base
-                if c["place_id"] not in used_ids and (
-                    c["distance_from_city_km"] >= 60 or hop_time_from_city_minutes(c, city_lat, city_lon) >= 90
-                )
-            ]
-            far_pool.sort(key=lambda x: (-x["rating"], x["distance_from_city_km"]))
-            for c in far_pool:
-                total = round_trip_minutes(c, city_lat, city_lon)
-                if total + END_OF_DAY_BUFFER_MIN <= DAY_BUDGET_MIN and total >= int(0.7 * DAY_BUDGET_MIN):
-                    day_plan = [{
-                        "place": c["name"], "place_id": c["place_id"], "city": c["city"],
-                        "reason": "Full-day out-of-city landmark; travel+visit fits daily budget",
-                        "estimated_minutes": total,
-                        "distance_from_city_km": c["distance_from_city_km"]
-                    }]
+            while True:
+                item = await queue.get()
+                if item is None:
                     break
+                event, data = item
+                yield f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+        finally:
+            if not task.done():
+                task.cancel()
 
-        validated[key] = day_plan
-        for it in day_plan:
-            used_ids.add(it["place_id"])
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
-    # 9) Persist: request, candidate snapshot (without hop_from_city_min if not in schema), model I/O, result
-    req = ItineraryRequest(city=city, days=days, suitable_for=audience or None, version="v2.2.0")
-    db.add(req); db.flush()
 
-    cand_rows = [
-        ItineraryCandidate(
-            itinerary_request_id=req.id,
-            place_id=c["place_id"], name=c["name"], lat=c["lat"], lng=c["lng"],
-            avg_visit_mins=int(c["visit_minutes"]), rating=float(c.get("rating") or 0.0),
-            distance_from_city_km=float(c.get("distance_from_city_km") or 0.0),
-            # do not pass hop_from_city_min unless your model has this column
-            city=c.get("city") or None
-        ) for c in candidates_for_llm
-    ]
-    if cand_rows:
-        db.add_all(cand_rows)
-
-    # if model_io_records:
-    #     io_rows = [
-    #         ItineraryModelIO(
-    #             itinerary_request_id=req.id,
-    #             stage=rec.get("stage", "llm_generate"),
-    #             prompt_text=rec.get("prompt_text", {"text": ""}),
-    #             raw_response_text=rec.get("raw_response_text", {"text": ""})
-    #         ) for rec in model_io_records
-    #     ]
-    #     db.add_all(io_rows)[8]
-
-    auto_params_obj = {
-        "candidate_radius_km": radius_km,
-        "day_budget_minutes": DAY_BUDGET_MIN,
-        "end_of_day_buffer_min": END_OF_DAY_BUFFER_MIN,
-        "urban_speed_kmh": URBAN_SPEED_KMH,
-        "intercity_speed_kmh": INTERCITY_SPEED_KMH,
-        "per_hop_buffer_min": HOP_BUFFER_MIN,
-        "out_of_city_one_way_km_max": OUT_OF_CITY_ONE_WAY_KM_MAX,
-        "target_items_per_day": TARGET_ITEMS_PER_DAY,
-        "max_items_per_day": MAX_ITEMS_PER_DAY
-    }
-    # db.add(ItineraryResult(
-    #     itinerary_request_id=req.id,
-    #     itinerary_json=validated,
-    #     auto_params_json=auto_params_obj
-    # ))
-    db.commit()
+@router.get("/llm/stats")
+def llm_stats():
+    """LLM scheduler queue depth, wait times and admission counters, plus client counters."""
+    return {"scheduler": llm_scheduler.snapshot(), "client": llm_client.stats}
 
+
+@router.post("/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def submit_itinerary_job(
+    city: str,
+    days: int,
+    suitable_for: Optional[str] = Query(default=None),
+    interests: Optional[str] = Query(default=None, description="free text; favours matching places"),
+    db: Session = Depends(get_db)
+):
+    """Queue a generate_itinerary1 run; poll GET /itinerary/jobs/{job_id} for the result."""
+    job = await job_runner.submit(db, city, days, suitable_for, interests=interests)
     return {
-        "request_id": req.id,
-        "city": city,
-        "days": days,
-        "suitable_for": audience or "",
-        "itinerary": validated,
-        "auto_parameters": auto_params_obj
+        "job_id": job.id,
+        "request_id": job.itinerary_request_id,
+        "status": job.status,
+        "poll_url": f"{router.prefix}/jobs/{job.id}",
     }
 
+
+@router.get("/jobs/{job_id}")
+def get_itinerary_job(job_id: str, db: Session = Depends(get_db)):
+    job = db.get(ItineraryJob, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Itinerary job {job_id} not found")
+    return job_runner.describe(job)
+
+
 @router.post("/generate_itinerary3")
 def generate_itinerary(
     city: str,
@@ -532,36 +292,22 @@ def generate_itinerary(
     radius_km = auto_radius(days)
 
     # 3) Fetch candidate places within radius
-    sql = text("""
-        SELECT *, ({} * acos(
-            cos(radians(:lat)) * cos(radians(lat)) *
-            cos(radians(lng) - radians(:lon)) +
-            sin(radians(:lat)) * sin(radians(lat))
-        )) AS distance_km
-        FROM places
-        WHERE lat IS NOT NULL AND lng IS NOT NULL
-        AND ({} * acos(
-            cos(radians(:lat)) * cos(radians(lat)) *
-            cos(radians(lng) - radians(:lon)) +
-            sin(radians(:lat)) * sin(radians(lat))
-        )) <= :radius
-        ORDER BY distance_km ASC
-    """.format(EARTH_KM, EARTH_KM))
-    rows = db.execute(sql, {"lat": city_lat, "lon": city_lon, "radius": radius_km}).fetchall()
+    rows = nearby_places(db, city_lat, city_lon, radius_km)
 
     if not rows:
         raise HTTPException(404, "No nearby places found")
+    lap("retrieval")
 
     # 4) Normalize and annotate candidates
     base_candidates = []
     for r in rows:
-        p = dict(r._mapping)
+        p = dict(r)
         candidate = {
             "place_id": safe_val(p.get("place_id")),
             "name": safe_val(p.get("name")),
             "lat": float(safe_val(p.get("lat"))),
             "lng": float(safe_val(p.get("lng"))),
-            "avg_visit_mins": parse_mins(safe_val(p.get("avg_visit_mins")), 90),
+            "visit_mins": parse_mins(safe_val(p.get("avg_visit_mins")), 90),
             "rating": float(safe_val(p.get("rating")) or 0),
             "tags": safe_val(p.get("tags")),
             "description": safe_val(p.get("description")),
@@ -569,19 +315,21 @@ def generate_itinerary(
             "distance_km": float(round(p.get("distance_km", 0), 2)),
             "city": safe_val(p.get("city")),
         }
-        candidate["hop_time"] = hop_time_from_city_minutes(candidate, city_lat, city_lon)
         base_candidates.append(candidate)
 
-    # 5) Prepare candidates to send to LLM (merging near+mid+far categories)
-    near = [c for c in base_candidates if c["distance_km"] <= 30]
-    mid = [c for c in base_candidates if 30 < c["distance_km"] <= 80]
-    far = [c for c in base_candidates if 80 < c["distance_km"] <= OUT_OF_CITY_ONE_WAY_KM_MAX]
-    near.sort(key=lambda c: (c["distance_km"], -c["rating"], c["avg_visit_mins"]))
-    mid.sort(key=lambda c: (c["distance_km"], -c["rating"], c["avg_visit_mins"]))
-    far.sort(key=lambda c: (-c["rating"], c["distance_km"]))
-    candidates_for_llm = near[:18] + mid[:12] + far[:12]
-    if len(candidates_for_llm) > MAX_AI_CANDIDATES:
-        candidates_for_llm = candidates_for_llm[:MAX_AI_CANDIDATES]
+    matrix = TravelMatrix(city_lat, city_lon, base_candidates)
+    for candidate in base_candidates:
+        candidate["hop_time"] = matrix.from_city(candidate["place_id"])
+
+    # 5) Prepare candidates to send to LLM (near+mid+far tiers, as many as the prompt budget allows)
+    # the budget measures the same columns the prompt encodes
+    prompt_columns = ("name", "lat", "lng", "visit_mins", "rating", "distance_km", "hop_time", "city", "day_group",
+                      "description")
+    candidates_for_llm, prompt_budget = plan_candidates(
+        rank_by_tier(base_candidates, "distance_km", visit_key="visit_mins", far_max_km=OUT_OF_CITY_ONE_WAY_KM_MAX),
+        prompt_columns,
+        min_candidates=days * MAX_ITEMS_PER_DAY, max_candidates=MAX_AI_CANDIDATES,
+        placeholders={"day_group": days})  # filled in by cluster_into_days below
 
     # Prepare clean dicts for LLM input
     llm_input_candidates = [{
@@ -589,7 +337,7 @@ def generate_itinerary(
         "name": c["name"],
         "lat": c["lat"],
         "lng": c["lng"],
-        "visit_mins": c["avg_visit_mins"],
+        "visit_mins": c["visit_mins"],
         "rating": c["rating"],
         "distance_km": c["distance_km"],
         "hop_time": c["hop_time"],
@@ -597,6 +345,12 @@ def generate_itinerary(
         "description": c["description"]
     } for c in candidates_for_llm]
 
+    day_groups = cluster_into_days(candidates_for_llm, days, city_lat, city_lon, visit_key="visit_mins", hop_key="hop_time")
+    group_of = day_group_map(day_groups)
+    for c in llm_input_candidates:
+        c["day_group"] = group_of[c["place_id"]]
+    lap("candidates")
+
     # 6) Build prompt & schema
     schema = {
         "type": "object",
@@ -624,6 +378,8 @@ def generate_itinerary(
         "additionalProperties": False
     }
 
+    candidate_block, aliases = encode_candidates(llm_input_candidates, prompt_columns,
+                                                 description_chars=prompt_budget["description_chars"])
     prompt = f"""
 You are a professional travel planner assistant.
 
@@ -633,48 +389,51 @@ Generate a detailed {days}-day itinerary starting each day at 10:00 AM. For each
 - planned list of activities,
 - descriptions,
 - fit 3-5 places per day,
-- consider travel and visit durations within 8 hours/day (with buffer).
+- consider travel and visit durations within 8 hours/day (with buffer),
+- build Day N mainly from places with day_group N (a compact cluster of nearby places).
 
-Use ONLY the following places (in JSON). Provide output as STRICT JSON conforming to the attached schema:
+Use ONLY the following places. Provide output as STRICT JSON conforming to the attached schema:
 
-Places:
-{json.dumps(llm_input_candidates, indent=2)}
+Places: {candidates_note(aliases)}
+{candidate_block}
 
 Format:
-{json.dumps(schema, indent=2)}
+{encode_schema(schema)}
 """
+    finish_budget(prompt_budget, prompt)
+    lap("prompt")
 
     # 7) Call LLM (try structured calls with fallback)
-    def call_model(prompt, schema):
+    async def call_model(prompt, schema):
         try:
-            res = query_llama_structured(schema, prompt, model=LLM_MODEL, base_url=OLLAMA_URL)
+            res = await llm_client.chat(prompt, schema=schema, model=LLM_MODEL, validate=is_json)
             return json.loads(res)
+        except LLMOverloaded:
+            return None  # queue too deep: use the deterministic fallback below
         except Exception:
             try:
-                res = query_llama_subprocess(prompt, model=LLM_MODEL)
+                res = await llm_client.generate(prompt, model=LLM_MODEL, validate=is_json)
                 return json.loads(res)
             except Exception:
                 return None
 
-    raw_result = call_model(prompt, schema)
-    itinerary_json = raw_result.get("itinerary") if raw_result else None
+    raw_result = run_from_thread(call_model, prompt, schema)
+    itinerary_json = decode_place_ids(raw_result.get("itinerary"), aliases) if raw_result else None
+    lap("llm")
 
     # Fallback deterministic planner if LLM fails or no result
     if not itinerary_json:
-        # Simple round-robin distribution of candidates with sequential scheduling starting 10:00 AM
+        # One geographic cluster per day, scheduling starting 10:00 AM
         itinerary_json = {}
         start_hour = 10
-        for day in range(1, days + 1):
-            itinerary_json[f"Day {day}"] = []
-
-        for idx, c in enumerate(candidates_for_llm):
-            day = (idx % days) + 1
-            itinerary_json[f"Day {day}"].append({
+        for day, group in enumerate(day_groups, start=1):
+            itinerary_json[f"Day {day}"] = [{
                 "place_id": c["place_id"],
                 "activities": "Visit",
                 "description": c.get("description", ""),
                 "start_time": f"{start_hour + 0:02d}:00 AM"
-            })
+            } for c in group]
+    lap("repair")
 
     # 8) Build human-readable itinerary string
     lines = []
@@ -694,6 +453,7 @@ Format:
             lines.append(f"{start_time}: {place_name}\n")
             lines.append(f"  Activities: {activities}\n")
             lines.append(f"  Description: {descr}\n\n")
+    lap("format")
 
     # 9) Save to file
     folder = "saved_itineraries"
@@ -702,11 +462,12 @@ Format:
     filepath = os.path.join(folder, filename)
     with open(filepath, "w", encoding="utf-8") as f:
         f.write("\n".join(lines))
+    lap("file_write")
 
     # 10) Persist in DB (existing paradigm)
     # Note: you can adjust for your DB schema
 
-    req = ItineraryRequest(city=city, days=days, suitable_for=audience, version="v1")
+    req = ItineraryRequest(city=city, days=days, suitable_for=audience, version="v1", prompt_budget_json=prompt_budget)
     db.add(req)
     db.flush()
 
@@ -742,6 +503,7 @@ Format:
         itinerary_request_id=req.id or 0
     ))
     db.commit()
+    lap("persist")
 
     return {
         "request_id": req.id,
@@ -772,27 +534,15 @@ def generate_itinerary(city: str, days: int, suitable_for: Optional[str] = Query
     radius = radius_for_days(days)
 
     # 3. Retrieve places within radius
-    sql = text(f"""
-        SELECT *, ({EARTH_RADIUS_KM} * acos(
-            cos(radians(:lat)) * cos(radians(lat)) * cos(radians(lng) - radians(:lon))
-            + sin(radians(:lat)) * sin(radians(lat))
-        )) AS distance_km
-        FROM places
-        WHERE lat IS NOT NULL AND lng IS NOT NULL
-          AND ({EARTH_RADIUS_KM} * acos(
-            cos(radians(:lat)) * cos(radians(lat)) * cos(radians(lng) - radians(:lon))
-            + sin(radians(:lat)) * sin(radians(lat))
-          )) <= :radius
-        ORDER BY distance_km ASC
-    """)
-    rows = db.execute(sql, {"lat": city_lat, "lon": city_lon, "radius": radius}).fetchall()
+    rows = nearby_places(db, city_lat, city_lon, radius)
     if not rows:
         raise HTTPException(status_code=404, detail=f"No places found near {city} within {radius} km")
+    lap("retrieval")
 
     # 4. Normalize places
     places = []
     for r in rows:
-        d = dict(r._mapping)
+        d = dict(r)
         place = {
             "place_id": safe_val(d.get("place_id")),
             "name": safe_val(d.get("name")),
@@ -805,17 +555,19 @@ def generate_itinerary(city: str, days: int, suitable_for: Optional[str] = Query
             "city": safe_val(d.get("city")),
             "opening_hours": json.loads(d.get("opening_hours") or "{}")  # assuming JSON stored
         }
-        place["hop_time"] = hop_time_from_city_minutes(place, city_lat, city_lon)
         places.append(place)
 
-    # 5. Categorize and select candidates for LLM
-    near = [p for p in places if p["distance"] <= 30]
-    mid = [p for p in places if 30 < p["distance"] <= 80]
-    far = [p for p in places if 80 < p["distance"] <= OUTER_BOUNDARY_KM]
-    near.sort(key=lambda x: (x["distance"], -x["rating"], x["avg_time"]))
-    mid.sort(key=lambda x: (x["distance"], -x["rating"], x["avg_time"]))
-    far.sort(key=lambda x: (-x["rating"], x["distance"]))
-    candidates = (near[:18] + mid[:12] + far[:12])[:MAX_CANDIDATES]
+    matrix = TravelMatrix(city_lat, city_lon, places)
+    for place in places:
+        place["hop_time"] = matrix.from_city(place["place_id"])
+
+    # 5. Categorize and select candidates for LLM (near/mid/far tiers within the prompt budget)
+    candidates, prompt_budget = plan_candidates(
+        rank_by_tier(places, "distance", visit_key="avg_time", far_max_km=OUTER_BOUNDARY_KM),
+        ("name", "lat", "lng", "avg_time", "rating", "distance", "hop_time", "city", "day_group",
+         "opening_hours", "description"),
+        min_candidates=days * MAX_VISITS_PER_DAY, max_candidates=MAX_CANDIDATES,
+        placeholders={"day_group": days})  # filled in by cluster_into_days below
 
     candidates_for_llm = [{
         "place_id": c["place_id"],
@@ -831,6 +583,12 @@ def generate_itinerary(city: str, days: int, suitable_for: Optional[str] = Query
         "opening_hours": c["opening_hours"],
     } for c in candidates]
 
+    day_groups = cluster_into_days(candidates_for_llm, days, city_lat, city_lon, visit_key="avg_time", hop_key="hop_time")
+    group_of = day_group_map(day_groups)
+    for c in candidates_for_llm:
+        c["day_group"] = group_of[c["place_id"]]
+    lap("candidates")
+
     # 6. Prepare LLM prompt & schema
     schema = {
         "type": "object",
@@ -858,48 +616,57 @@ def generate_itinerary(city: str, days: int, suitable_for: Optional[str] = Query
         "required": ["itinerary"]
     }
 
+    candidate_block, aliases = encode_candidates(candidates_for_llm, (
+        "name", "lat", "lng", "avg_time", "rating", "distance", "hop_time", "city", "day_group",
+        "opening_hours", "description"), description_chars=prompt_budget["description_chars"])
     prompt = f"""
 You are a travel planner creating a {days}-day itinerary for {city}.
 Assign visit start times starting from {DAY_START_HOUR}:00 daily.
 Ensure visits and travel fit into {DAY_MAX_MINUTES}-minute day with breaks and respecting opening hours:
 venues may be closed outside opening_hours field.
+Each place has a day_group: a compact cluster of nearby places sized for one day. Build Day N mainly from day_group N.
 
-Here are candidate places:
-{json.dumps(candidates_for_llm, indent=2)}
+Here are candidate places: {candidates_note(aliases)}
+{candidate_block}
 
 Please respond ONLY with JSON matching this schema:
-{json.dumps(schema, indent=2)}
+{encode_schema(schema)}
 """
+    finish_budget(prompt_budget, prompt)
+    lap("prompt")
 
-    def call_llm(prompt_text, schema):
+    async def call_llm(prompt_text, schema):
         try:
-            resp = query_llama_structured(prompt_text, schema, model=LLM_MODEL, base_url=OLLAMA_URL)
+            resp = await llm_client.chat(prompt_text, schema=schema, model=LLM_MODEL, validate=is_json)
             return json.loads(resp)
+        except LLMOverloaded:
+            return None  # queue too deep: use the deterministic fallback below
         except:
             try:
-                resp = query_llama_structured(prompt_text, model=LLM_MODEL)
+                resp = await llm_client.chat(prompt_text, model=LLM_MODEL, validate=is_json)
                 return json.loads(resp)
             except:
                 return None
 
-    response = call_llm(prompt, schema)
-    itinerary_json = response.get("itinerary") if response else None
+    response = run_from_thread(call_llm, prompt, schema)
+    itinerary_json = decode_place_ids(response.get("itinerary"), aliases) if response else None
+    lap("llm")
 
     if not itinerary_json:
-        # Simple fallback assign visits round-robin with 1-hour slots ignoring opening_hours
+        # Simple fallback: one geographic cluster per day, 1-hour slots ignoring opening_hours
         itinerary_json = {f"Day {i+1}": [] for i in range(days)}
-        for idx, place in enumerate(candidates_for_llm):
-            day = f"Day {(idx % days) + 1}"
-            hour = DAY_START_HOUR + (idx // days)
-            itinerary_json[day].append({
-                "place_id": place["place_id"],
-                "activities": "Visit",
-                "description": place["description"],
-                "start_time": f"{hour}:00"
-            })
+        for i, group in enumerate(day_groups):
+            for slot, place in enumerate(group):
+                itinerary_json[f"Day {i+1}"].append({
+                    "place_id": place["place_id"],
+                    "activities": "Visit",
+                    "description": place["description"],
+                    "start_time": f"{DAY_START_HOUR + slot}:00"
+                })
+    lap("repair")
 
     # 7. Format human-readable itinerary, respecting opening hours and travel times
-    def format_realistic_itinerary(itinerary, city, days, city_lat, city_lon, candidate_map):
+    def format_realistic_itinerary(itinerary, city, days, candidate_map):
         lines = []
         day_start_time = datetime.combine(datetime.today(), time(hour=DAY_START_HOUR))
 
@@ -921,7 +688,7 @@ Please respond ONLY with JSON matching this schema:
 
                 # Calculate travel time from previous place
                 if prev_place:
-                    travel_mins = hop_time_minutes(prev_place["lat"], prev_place["lng"], place["lat"], place["lng"], city_lat, city_lon)
+                    travel_mins = matrix.hop(prev_place["place_id"], place_id)
                 else:
                     travel_mins = 0
                 current_time += timedelta(minutes=travel_mins + HOP_BUFFER_MIN)
@@ -949,7 +716,8 @@ Please respond ONLY with JSON matching this schema:
         return "".join(lines)
 
     candidate_map = {c["place_id"]: c for c in candidates_for_llm}
-    readable_itinerary = format_realistic_itinerary(itinerary_json, city, days, city_lat, city_lon, candidate_map)
+    readable_itinerary = format_realistic_itinerary(itinerary_json, city, days, candidate_map)
+    lap("format")
 
     # 8. Save itinerary to file
     output_dir = "saved_itineraries"
@@ -958,9 +726,10 @@ Please respond ONLY with JSON matching this schema:
     filepath = os.path.join(output_dir, filename)
     with open(filepath, "w", encoding="utf-8") as f:
         f.write(readable_itinerary)
+    lap("file_write")
 
     # 9. Persist to database
-    req = ItineraryRequest(city=city, days=days, suitable_for=audience, version="1.0")
+    req = ItineraryRequest(city=city, days=days, suitable_for=audience, version="1.0", prompt_budget_json=prompt_budget)
     db.add(req)
     db.flush()
 
@@ -998,6 +767,7 @@ Please respond ONLY with JSON matching this schema:
 
     db.add(result_entity)
     db.commit()
+    lap("persist")
 
     return {
         "request_id": req.id,
@@ -1027,31 +797,16 @@ def generate_itinerary_fresh(
     radius = radius_map.get(days, 220)
 
     # 3. Query places with distance & assume JSON string 'opening_hours' in DB column
-    sql = text(f"""
-        SELECT *, ({EARTH_RADIUS_KM} * acos(
-                cos(radians(:lat)) * cos(radians(lat)) *
-                cos(radians(lng) - radians(:lon)) +
-                sin(radians(:lat)) * sin(radians(lat))
-            )) AS distance_km
-        FROM places
-        WHERE lat IS NOT NULL AND lng IS NOT NULL
-        AND ({EARTH_RADIUS_KM} * acos(
-                cos(radians(:lat)) * cos(radians(lat)) *
-                cos(radians(lng) - radians(:lon)) +
-                sin(radians(:lat)) * sin(radians(lat))
-            )) <= :radius
-        ORDER BY distance_km ASC
-    """)
-
-    rows = db.execute(sql, {"lat": city_lat, "lon": city_lon, "radius": radius}).fetchall()
+    rows = nearby_places(db, city_lat, city_lon, radius)
     if not rows:
         raise HTTPException(404, f"No places found within {radius}km of {city}")
+    lap("retrieval")
 
     # 4. Build candidate list with opening hours parsed
     candidates = []
     import json as pyjson
     for r in rows:
-        d = dict(r._mapping)
+        d = dict(r)
         oh_json = d.get("opening_hours") or "{}"
         try:
             opening_hours = pyjson.loads(oh_json)
@@ -1070,12 +825,25 @@ def generate_itinerary_fresh(
             "city": d.get("city"),
             "opening_hours": opening_hours,
         }
-        candidate["hop_time"] = hop_time_minutes(city_lat, city_lon, candidate["lat"], candidate["lng"], city_lat, city_lon)
         candidates.append(candidate)
 
+    matrix = TravelMatrix(city_lat, city_lon, candidates)
+    for candidate in candidates:
+        candidate["hop_time"] = matrix.from_city(candidate["place_id"])
+
     # Sort and limit candidates
-    candidates.sort(key=lambda c: (c["distance"], -c["rating"]))
-    candidates = candidates[:MAX_CANDIDATES]
+    candidates, prompt_budget = plan_candidates(
+        rank_by_tier(candidates, "distance", visit_key="avg_time", far_max_km=OUTER_BOUNDARY_KM),
+        ("name", "lat", "lng", "avg_time", "rating", "distance", "hop_time", "city", "day_group",
+         "opening_hours", "description"),
+        min_candidates=days * MAX_VISITS_PER_DAY, max_candidates=MAX_CANDIDATES,
+        placeholders={"day_group": days})  # filled in by cluster_into_days below
+
+    day_groups = cluster_into_days(candidates, days, city_lat, city_lon, visit_key="avg_time", hop_key="hop_time")
+    group_of = day_group_map(day_groups)
+    for c in candidates:
+        c["day_group"] = group_of[c["place_id"]]
+    lap("candidates")
 
     # 5. Prepare prompt and schema for LLM
     schema = {
@@ -1104,43 +872,52 @@ def generate_itinerary_fresh(
         "required": ["itinerary"],
     }
 
+    candidate_block, aliases = encode_candidates(candidates, (
+        "name", "lat", "lng", "avg_time", "rating", "distance", "hop_time", "city", "day_group",
+        "opening_hours", "description"), description_chars=prompt_budget["description_chars"])
     prompt = f"""
 You are a professional travel planner generating a {days}-day itinerary for {city}. 
 Assign start times, daily begin at {DAY_START_HOUR}AM, fit 3-5 visits/day within approx {int(DAILY_AVAILABLE_MINS/60)} hours. 
 Consider travel time and venue opening hours (given as 'opening_hours' JSON).
+Each place has a day_group (a compact cluster of nearby places sized for one day); build Day N mainly from day_group N.
 Output JSON strictly confirms attached schema.
-Here are candidate places with details:
-{json.dumps(candidates, indent=2)}
+Here are candidate places with details: {candidates_note(aliases)}
+{candidate_block}
 Schema:
-{json.dumps(schema, indent=2)}
+{encode_schema(schema)}
 """
+    finish_budget(prompt_budget, prompt)
+    lap("prompt")
 
-    def call_llm(prompt_text: str, schema: dict):
+    async def call_llm(prompt_text: str, schema: dict):
         try:
-            resp = query_llama_structured(prompt_text, schema, model=LLM_MODEL, base_url=OLLAMA_URL)
+            resp = await llm_client.chat(prompt_text, schema=schema, model=LLM_MODEL, validate=is_json)
             return json.loads(resp)
+        except LLMOverloaded:
+            return None  # queue too deep: use the deterministic fallback below
         except Exception:
             try:
-                resp = query_llama_subprocess(prompt_text, model=LLM_MODEL)
+                resp = await llm_client.generate(prompt_text, model=LLM_MODEL, validate=is_json)
                 return json.loads(resp)
             except Exception:
                 return None
 
-    result = call_llm(prompt, schema)
-    itinerary_json = result.get("itinerary") if result else None
+    result = run_from_thread(call_llm, prompt, schema)
+    itinerary_json = decode_place_ids(result.get("itinerary"), aliases) if result else None
+    lap("llm")
 
-    # Fallback — assign sequentially ignoring advanced constraints
+    # Fallback — one geographic cluster per day, ignoring advanced constraints
     if not itinerary_json:
         itinerary_json = {f"Day {i+1}": [] for i in range(days)}
         hour = DAY_START_HOUR
-        for idx, c in enumerate(candidates):
-            d = f"Day {(idx % days) + 1}"
-            itinerary_json[d].append({
+        for i, group in enumerate(day_groups):
+            itinerary_json[f"Day {i+1}"] = [{
                 "place_id": c["place_id"],
                 "activities": "Visit",
                 "description": c["description"],
                 "start_time": f"{hour}:00",
-            })
+            } for c in group]
+    lap("repair")
 
     # Map candidates by ID
     candid_map = {c["place_id"]: c for c in candidates}
@@ -1161,7 +938,7 @@ Schema:
 
                 # Calculate travel time from prev place
                 if prev_place:
-                    travel_mins = hop_time_minutes(prev_place["lat"], prev_place["lng"], place["lat"], place["lng"], city_lat, city_lon)
+                    travel_mins = matrix.hop(prev_place["place_id"], place["place_id"])
                 else:
                     travel_mins = 0
                 # Include buffer
@@ -1185,6 +962,7 @@ Schema:
         return "".join(lines)
 
     readable_itinerary = format_itinerary(itinerary_json, city, candid_map)
+    lap("format")
 
     # 7. Save to file
     out_dir = "saved_itineraries"
@@ -1193,9 +971,10 @@ Schema:
     filepath = os.path.join(out_dir, filename)
     with open(filepath, "w", encoding="utf-8") as f:
         f.write(readable_itinerary)
+    lap("file_write")
 
     # 8. Persist in DB
-    req = ItineraryRequest(city=city, days=days, suitable_for=audience, version="1.0")
+    req = ItineraryRequest(city=city, days=days, suitable_for=audience, version="1.0", prompt_budget_json=prompt_budget)
     db.add(req)
     db.flush()
 
@@ -1232,6 +1011,7 @@ Schema:
     )
     db.add(result)
     db.commit()
+    lap("persist")
 
     return {
         "request_id": req.id,
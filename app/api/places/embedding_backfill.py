@@ -0,0 +1,319 @@
+# app/api/places/embedding_backfill.py
+"""
+Backfill of places.embedding with real model vectors.
+
+create_place embeds one row inline. Rows inserted any other way, rows created
+while the model was unavailable, and rows whose text has changed since they
+were embedded are left to this job. It walks active places in id order
+(keyset pages, so memory stays flat on any table size), builds each row's
+text with create_embedding_text_from_data, encodes the rows that need it in
+large batches through the shared embedding service, and writes vectors back
+with one executemany UPDATE per batch. New vectors are also applied to the
+RAG FAISS index (app.utils.rag_service) when this worker has it loaded.
+
+A row needs embedding when:
+  mode "missing"  embedding IS NULL
+  mode "stale"    that, or embedding_hash (sha256 of model name + text) no
+                  longer matches the row's current text or the configured
+                  model (default)
+
+Each run has a row in embedding_backfill_runs. Its cursor (last_place_id),
+counters, rows/s and heartbeat are updated after every page, so progress can
+be polled from any worker. A run that failed, or whose heartbeat is older
+than EMBEDDING_BACKFILL_STALE_S (its worker died), can be resumed from its
+cursor; a run another worker is still making progress on is never picked. Re-running "stale" from scratch is also safe: up-to-date rows are
+hashed and skipped, not re-encoded.
+
+Entry points: POST /places/admin/embeddings/backfill (background task) and
+scripts/backfill_embeddings.py (foreground, same run table).
+
+Config (env):
+    EMBEDDING_BACKFILL_PAGE     rows read per page (default 1000)
+    EMBEDDING_BACKFILL_BATCH    texts per encode call (default 256)
+    EMBEDDING_BACKFILL_STALE_S  heartbeat age after which an unfinished run can be resumed (default 300)
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import and_, bindparam, func, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.api.places.models import EmbeddingBackfillRun, Places
+from app.database.db import SessionLocal
+from app.utils.embeddings import EMBEDDING_MODEL, EmbeddingService, embedding_service
+from app.utils.helper import format_best_time_of_day
+from app.utils.rag_service import places_vector_index
+
+EMBEDDING_BACKFILL_PAGE = int(os.getenv("EMBEDDING_BACKFILL_PAGE", "1000"))
+EMBEDDING_BACKFILL_BATCH = int(os.getenv("EMBEDDING_BACKFILL_BATCH", "256"))
+EMBEDDING_BACKFILL_STALE_S = int(os.getenv("EMBEDDING_BACKFILL_STALE_S", "300"))
+MODES = ("missing", "stale")
+
+# columns create_embedding_text_from_data reads
+TEXT_COLUMNS = ("name", "city", "state", "country", "type", "description", "famous_for", "tags",
+                "suitable_for", "best_months", "best_time_of_day_to_visit", "avg_visit_mins", "rating", "notes")
+
+
+def create_embedding_text_from_data(data):
+    """
+    Create comprehensive text for embedding generation using multiple fields
+    """
+    embedding_parts = []
+
+    # Core identity
+    if data.get('name'):
+        embedding_parts.append(f"Place: {data['name']}")
+
+    if data.get('city') and data.get('state') and data.get('country'):
+        embedding_parts.append(f"Location: {data['city']}, {data['state']}, {data['country']}")
+
+    if data.get('type'):
+        embedding_parts.append(f"Type: {data['type']}")
+
+    # Description and context
+    if data.get('description'):
+        embedding_parts.append(f"Description: {data['description']}")
+
+    # What it's famous for
+    if data.get('famous_for'):
+        famous_for_list = data['famous_for'] if isinstance(data['famous_for'], list) else [data['famous_for']]
+        embedding_parts.append(f"Famous for: {', '.join(famous_for_list)}")
+
+    # Tags and characteristics
+    if data.get('tags'):
+        tags_list = data['tags'] if isinstance(data['tags'], list) else [data['tags']]
+        embedding_parts.append(f"Features: {', '.join(tags_list)}")
+
+    # Suitability
+    if data.get('suitable_for'):
+        suitable_list = data['suitable_for'] if isinstance(data['suitable_for'], list) else [data['suitable_for']]
+        embedding_parts.append(f"Suitable for: {', '.join(suitable_list)}")
+
+    # Temporal information
+    if data.get('best_months'):
+        months_list = data['best_months'] if isinstance(data['best_months'], list) else [data['best_months']]
+        embedding_parts.append(f"Best months to visit: {', '.join(months_list)}")
+
+    if 'best_time_of_day_to_visit' in data:
+        formatted_times = format_best_time_of_day(data['best_time_of_day_to_visit'])
+        embedding_parts.append("Best time of day: " + ", ".join(formatted_times))
+
+    # Duration and rating
+    if data.get('avg_visit_mins'):
+        embedding_parts.append(f"Average visit duration: {data['avg_visit_mins']} minutes")
+
+    if data.get('rating'):
+        embedding_parts.append(f"Rating: {data['rating']}/5.0")
+
+    # Additional notes
+    if data.get('notes'):
+        embedding_parts.append(f"Notes: {data['notes']}")
+
+    return " | ".join(embedding_parts) if embedding_parts else None
+
+
+def embedding_hash(text: str, model: str = EMBEDDING_MODEL) -> str:
+    return hashlib.sha256(f"{model}\n{text}".encode("utf-8")).hexdigest()
+
+
+def place_embedding_text(row: Dict[str, Any]) -> Optional[str]:
+    """Embedding text for a stored row (NULL columns are treated as absent)."""
+    return create_embedding_text_from_data({k: v for k, v in row.items() if v is not None})
+
+
+def _pending_count(db: Session, mode: str, after_id: int) -> int:
+    q = select(func.count()).select_from(Places).where(Places.is_active.isnot(False), Places.id > after_id)
+    if mode == "missing":
+        q = q.where(Places.embedding.is_(None))
+    return db.execute(q).scalar() or 0
+
+
+def run_backfill(run_id: str, limit: Optional[int] = None, page_size: int = EMBEDDING_BACKFILL_PAGE,
+                 batch_size: int = EMBEDDING_BACKFILL_BATCH, service: EmbeddingService = embedding_service,
+                 on_progress: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Run (or continue) the backfill recorded in embedding_backfill_runs row `run_id`.
+    Blocking: call it from a thread or a script. Stops after `limit` embedded rows.
+    """
+    db = SessionLocal()
+    try:
+        run = db.get(EmbeddingBackfillRun, run_id)
+        if run is None:
+            raise ValueError(f"Embedding backfill run {run_id} not found")
+        mode, cursor = run.mode, run.last_place_id or 0
+        run.status, run.error = "running", None
+        run.started_at = run.started_at or datetime.utcnow()
+        run.heartbeat_at = datetime.utcnow()
+        run.total = (run.scanned or 0) + _pending_count(db, mode, cursor)
+        db.commit()
+
+        table = Places.__table__
+        columns = [table.c.id, table.c.embedding_hash, table.c.embedding.is_(None).label("missing")] + \
+                  [table.c[c] for c in TEXT_COLUMNS]
+        write = (update(table).where(table.c.id == bindparam("b_id"))
+                 .values(embedding=bindparam("b_embedding"), embedding_hash=bindparam("b_hash")))
+        budget = limit if limit is not None else float("inf")
+        elapsed_before = run.elapsed_s or 0.0
+        started = time.perf_counter()
+
+        while budget > 0:
+            q = select(*columns).where(table.c.is_active.isnot(False), table.c.id > cursor)
+            if mode == "missing":
+                q = q.where(table.c.embedding.is_(None))
+            rows = db.execute(q.order_by(table.c.id).limit(page_size)).mappings().all()
+            if not rows:
+                break
+
+            todo = []
+            for row in rows:
+                if len(todo) >= budget:
+                    break
+                cursor = row["id"]
+                run.scanned += 1
+                text = place_embedding_text(row)
+                if not text:
+                    run.skipped += 1
+                    continue
+                h = embedding_hash(text, service.model_name)
+                if not row["missing"] and row["embedding_hash"] == h:
+                    run.skipped += 1  # up to date
+                    continue
+                todo.append((row["id"], text, h))
+
+            written = []
+            for start in range(0, len(todo), batch_size):
+                chunk = todo[start:start + batch_size]
+                vectors = service.encode([t for _, t, _ in chunk], batch_size=batch_size)
+                db.execute(write, [{"b_id": pk, "b_embedding": vec, "b_hash": h}
+                                   for (pk, _, h), vec in zip(chunk, vectors)])
+                written += [(pk, vec, h) for (pk, _, h), vec in zip(chunk, vectors)]
+            budget -= len(todo)
+
+            run.embedded += len(todo)
+            run.last_place_id = cursor
+            run.elapsed_s = elapsed_before + (time.perf_counter() - started)
+            run.rows_per_s = round(run.embedded / run.elapsed_s, 1) if run.elapsed_s else None
+            run.heartbeat_at = datetime.utcnow()
+            db.commit()  # vectors and cursor together: a resumed run never redoes or skips a page
+            if written:
+                places_vector_index.upsert_many([w[0] for w in written], [w[1] for w in written],
+                                                [w[2] for w in written])
+            if on_progress:
+                on_progress(describe(run))
+
+        run.status = "succeeded"
+        run.finished_at = datetime.utcnow()
+        db.commit()
+        places_vector_index.save_if_dirty()
+        return describe(run)
+    except Exception as e:
+        db.rollback()
+        run = db.get(EmbeddingBackfillRun, run_id)
+        if run is not None:
+            run.status, run.error = "failed", f"{type(e).__name__}: {e}"[:1000]
+            run.finished_at = datetime.utcnow()
+            db.commit()
+        raise
+    finally:
+        db.close()
+
+
+def create_run(db: Session, mode: str = "stale", resume: bool = False) -> EmbeddingBackfillRun:
+    """
+    A new run row, or with `resume` the latest unfinished one: failed, or queued/running
+    with a heartbeat older than EMBEDDING_BACKFILL_STALE_S (interrupted).
+    """
+    if mode not in MODES:
+        raise HTTPException(status_code=422, detail=f"mode must be one of {', '.join(MODES)}")
+    now = datetime.utcnow()
+    if resume:
+        cutoff = now - timedelta(seconds=EMBEDDING_BACKFILL_STALE_S)
+        runs = EmbeddingBackfillRun
+        run = (db.query(runs)
+               .filter(runs.mode == mode,
+                       or_(runs.status == "failed",
+                           and_(runs.status.in_(("queued", "running")),
+                                or_(runs.heartbeat_at.is_(None), runs.heartbeat_at < cutoff))))
+               .order_by(runs.created_at.desc())
+               .with_for_update(skip_locked=True)  # two resumers never take the same run
+               .first())
+        if run is not None:
+            run.status, run.heartbeat_at = "queued", now
+            db.commit()
+            return run
+    run = EmbeddingBackfillRun(id=uuid.uuid4().hex, mode=mode, status="queued", heartbeat_at=now)
+    db.add(run)
+    db.commit()
+    return run
+
+
+def describe(run: EmbeddingBackfillRun) -> Dict[str, Any]:
+    total = run.total or 0
+    return {
+        "run_id": run.id,
+        "mode": run.mode,
+        "status": run.status,
+        "progress": {
+            "scanned": run.scanned,
+            "embedded": run.embedded,
+            "skipped": run.skipped,
+            "total": total,
+            "percent": round(100 * run.scanned / total, 1) if total else 100.0,
+            "last_place_id": run.last_place_id,
+        },
+        "rows_per_s": run.rows_per_s,
+        "elapsed_s": round(run.elapsed_s or 0.0, 1),
+        "error": run.error,
+        "created_at": run.created_at,
+        "started_at": run.started_at,
+        "finished_at": run.finished_at,
+    }
+
+
+class EmbeddingBackfillRunner:
+    """At most one backfill per worker, run in a thread off the event loop."""
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._starting = False  # a start is creating its run row in a thread
+
+    @property
+    def busy(self) -> bool:
+        return self._starting or (self._task is not None and not self._task.done())
+
+    async def start(self, db: Session, mode: str = "stale", resume: bool = False,
+                    limit: Optional[int] = None) -> EmbeddingBackfillRun:
+        if self.busy:
+            raise HTTPException(status_code=409, detail="An embedding backfill is already running")
+        self._starting = True
+        try:
+            # the row lock and commit are blocking DB work: keep them off the event loop
+            run = await asyncio.to_thread(self._create, db, mode, resume)
+            self._task = asyncio.create_task(self._run(run.id, limit))
+        finally:
+            self._starting = False
+        return run
+
+    @staticmethod
+    def _create(db: Session, mode: str, resume: bool) -> EmbeddingBackfillRun:
+        run = create_run(db, mode, resume)
+        db.refresh(run)  # load it here, so reading it on the loop doesn't query
+        return run
+
+    async def _run(self, run_id: str, limit: Optional[int]):
+        try:
+            result = await asyncio.to_thread(run_backfill, run_id, limit)
+            logging.info(f"Embedding backfill {run_id}: {result['progress']['embedded']} rows "
+                         f"at {result['rows_per_s']} rows/s")
+        except Exception as e:
+            logging.error(f"Embedding backfill {run_id} failed: {e}")
+
+
+backfill_runner = EmbeddingBackfillRunner()
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Text, Float, Date, DECIMAL, Numeric, ForeignKey, JSON, text, DateTime
-from sqlalchemy.dialects.postgresql import JSONB, ARRAY
+from sqlalchemy import Column, Computed, Integer, String, Text, Float, Date, DECIMAL, Numeric, ForeignKey, JSON, text, DateTime, Index
+from sqlalchemy.dialects.postgresql import JSONB, ARRAY, TSVECTOR
 from sqlalchemy.orm import declarative_base, relationship
 from pgvector.sqlalchemy import Vector
 from sqlalchemy.ext.mutable import MutableDict, MutableList
@@ -12,6 +12,15 @@ JSONVariant = JSON().with_variant(JSONB(), "postgresql")  # portable JSON
 
 class Places(BaseModel):
     __tablename__ = "places"
+    __table_args__ = (
+        # bounding-box prefilter for radius search (see app/utils/spatial_index.py)
+        Index("ix_places_lat_lng", "lat", "lng"),
+        # full-text search (app/utils/searching.py)
+        Index("ix_places_search_vector", "search_vector", postgresql_using="gin"),
+        # ix_places_embedding_hnsw (pgvector HNSW, migration e5a7c9d20005) and ix_places_name_trgm
+        # (pg_trgm, migration a7c9e1f40007) are created by the migrations only, so create_all
+        # at startup works on a database without those index methods
+    )
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
 
@@ -69,6 +78,33 @@ class Places(BaseModel):
 
     # vector for retrieval (size must match your embedding model, e.g., 384 for MiniLM)
     embedding = Column(Vector(384), nullable=True)
-
-    # optional: full‑text search materialized separately if needed
-    # search_text TSVECTOR can be added via Alembic migration + triggers
\ No newline at end of file
+    # sha256(model + embedding text) at the time `embedding` was written; see app/api/places/embedding_backfill.py
+    embedding_hash = Column(String(64), nullable=True)
+
+    # full-text search: name (A), city/state/type (B), description (C)
+    search_vector = Column(TSVECTOR, Computed(
+        "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(city, '') || ' ' || coalesce(state, '') || ' ' || coalesce(type, '')), 'B') || "
+        "setweight(to_tsvector('simple', coalesce(description, '')), 'C')",
+        persisted=True))
+    # the name's weight in search_vector: list search (apply_searching) matches name lexemes only
+    search_name_weight = "A"
+
+
+class EmbeddingBackfillRun(Base):
+    __tablename__ = "embedding_backfill_runs"
+    id = Column(String(36), primary_key=True)  # uuid4 hex
+    mode = Column(String(16), nullable=False, default="stale")  # missing|stale
+    status = Column(String(16), nullable=False, default="queued", index=True)  # queued|running|succeeded|failed
+    last_place_id = Column(Integer, nullable=False, default=0, server_default="0")  # keyset cursor: resume after this id
+    scanned = Column(Integer, nullable=False, default=0, server_default="0")
+    embedded = Column(Integer, nullable=False, default=0, server_default="0")
+    skipped = Column(Integer, nullable=False, default=0, server_default="0")
+    total = Column(Integer, nullable=True)
+    rows_per_s = Column(Float, nullable=True)
+    elapsed_s = Column(Float, nullable=True)
+    error = Column(String(1000), nullable=True)
+    created_at = Column(DateTime, nullable=False, server_default=text("CURRENT_TIMESTAMP"))
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)  # bumped with every page; a stale one means the worker died
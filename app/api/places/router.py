@@ -5,15 +5,23 @@ from datetime import datetime, timedelta, time, timezone
 from app.database.db import get_db
 from app.api.places.models import Places
 from typing import List, Optional, Dict, Any
-from app.utils.embeddings import get_embedding
+from app.utils.embeddings import EmbeddingUnavailable, embedding_service, get_embedding
+from app.utils.embedding import generate_embedding
+from app.utils.semantic_search import semantic_search
+from app.utils.hybrid_search import hybrid_search
 import subprocess
 from sqlalchemy import text, func, Table, MetaData, create_engine
 import json, math, httpx, subprocess
 from app.api.places.schema import PlaceCreate, PlaceRead, PlaceUpdate, PlaceDelete
 from app.utils.helper import CommonResponse, safe_db_operation, format_best_time_of_day
-from app.utils.searching import apply_searching
+from app.utils.searching import HYBRID_SEARCH_MODE_PATTERN, apply_searching
 from app.utils.sorting import apply_sorting
 from app.utils.pagination import get_pagination_metadata
+from app.utils.spatial_index import places_index
+from app.utils.rag_service import places_vector_index
+from app.api.places.embedding_backfill import (TEXT_COLUMNS, backfill_runner, describe, embedding_hash,
+                                               place_embedding_text)
+from app.api.places.models import EmbeddingBackfillRun
 
 import os
 
@@ -35,87 +43,11 @@ def generate_place_id(db: Session) -> str:
 #     embedding = model.encode(text)  # Convert text to embedding
 #     return embedding
 
-def create_embedding_text_from_data(data):
-    """
-    Create comprehensive text for embedding generation using multiple fields
-    """
-    embedding_parts = []
-    
-    # Core identity
-    if data.get('name'):
-        embedding_parts.append(f"Place: {data['name']}")
-    
-    if data.get('city') and data.get('state') and data.get('country'):
-        embedding_parts.append(f"Location: {data['city']}, {data['state']}, {data['country']}")
-    
-    if data.get('type'):
-        embedding_parts.append(f"Type: {data['type']}")
-    
-    # Description and context
-    if data.get('description'):
-        embedding_parts.append(f"Description: {data['description']}")
-    
-    # What it's famous for
-    if data.get('famous_for'):
-        famous_for_list = data['famous_for'] if isinstance(data['famous_for'], list) else [data['famous_for']]
-        embedding_parts.append(f"Famous for: {', '.join(famous_for_list)}")
-    
-    # Tags and characteristics
-    if data.get('tags'):
-        tags_list = data['tags'] if isinstance(data['tags'], list) else [data['tags']]
-        embedding_parts.append(f"Features: {', '.join(tags_list)}")
-    
-    # Suitability
-    if data.get('suitable_for'):
-        suitable_list = data['suitable_for'] if isinstance(data['suitable_for'], list) else [data['suitable_for']]
-        embedding_parts.append(f"Suitable for: {', '.join(suitable_list)}")
-    
-    # Temporal information
-    if data.get('best_months'):
-        months_list = data['best_months'] if isinstance(data['best_months'], list) else [data['best_months']]
-        embedding_parts.append(f"Best months to visit: {', '.join(months_list)}")
-    
-    if 'best_time_of_day_to_visit' in data:
-        formatted_times = format_best_time_of_day(data['best_time_of_day_to_visit'])
-        embedding_parts.append("Best time of day: " + ", ".join(formatted_times))
-
-    # Duration and rating
-    if data.get('avg_visit_mins'):
-        embedding_parts.append(f"Average visit duration: {data['avg_visit_mins']} minutes")
-    
-    if data.get('rating'):
-        embedding_parts.append(f"Rating: {data['rating']}/5.0")
-    
-    # Additional notes
-    if data.get('notes'):
-        embedding_parts.append(f"Notes: {data['notes']}")
-    
-    return " | ".join(embedding_parts) if embedding_parts else None
-
-def generate_embedding(text: str) -> Optional[List[float]]:
-    """Temporary fallback - returns None for now"""
-    if not text:
-        return None
-    
-    # Simple fallback - creates a dummy 384-dimensional embedding
-    import hashlib
-    import numpy as np
-    
-    try:
-        hash_object = hashlib.sha256(text.encode())
-        hash_bytes = hash_object.digest()
-        np.random.seed(int.from_bytes(hash_bytes[:4], byteorder='big'))
-        embedding = np.random.normal(0, 1, 384)
-        embedding = embedding / np.linalg.norm(embedding)
-        return embedding.tolist()
-    except:
-        return None
-
-
 @router.post("/create")
 @safe_db_operation("CreatePlace") 
 def create_place(place_req: PlaceCreate, db: Session = Depends(get_db)):
     # Check duplicate by name, state_id, country_id - assuming those IDs are provided or resolved elsewhere
+    # (name ILIKE is served by the ix_places_name_trgm trigram index)
     existing_place = (
         db.query(Places)
         .filter(
@@ -147,20 +79,28 @@ def create_place(place_req: PlaceCreate, db: Session = Depends(get_db)):
     if data.get("avg_cost_per_person") and isinstance(data["avg_cost_per_person"], dict):
         data["avg_cost_per_person"] = data["avg_cost_per_person"].get("amount")
 
-    # Create embedding text from place data
-    embedding_text = create_embedding_text_from_data(data)  # implement this helper function as explained previously
+    # Create Places SQLAlchemy model instance
+    place = Places(**data)
+    db.add(place)
+    db.flush()
+    db.refresh(place)
+
+    # Embedding text from the stored row (server defaults, Numeric rating), as the embedding
+    # backfill builds it, so the hashes match and the backfill doesn't re-embed the place
+    embedding_text = place_embedding_text({c: getattr(place, c) for c in TEXT_COLUMNS})
 
     # Generate embeddings if text present
     if embedding_text:
-        embedding = generate_embedding(embedding_text)  # your embedding function returning a list of floats
+        # None if the model is unavailable; the embedding backfill fills it in later
+        embedding = generate_embedding(embedding_text)
         if embedding:
-            data["embedding"] = embedding
-
-    # Create Places SQLAlchemy model instance
-    place = Places(**data)
-    db.add(place)
+            place.embedding = data["embedding"] = embedding
+            place.embedding_hash = data["embedding_hash"] = embedding_hash(embedding_text)
     db.commit()
     db.refresh(place)
+    places_index.upsert(place.id, place.lat, place.lng, place.is_active)
+    if data.get("embedding"):
+        places_vector_index.upsert(place.id, data["embedding"], data.get("embedding_hash"))
 
     return CommonResponse(
         is_success=True,
@@ -179,6 +119,8 @@ def get_all_places(
     sort_by: Optional[str] = Query(None),
     sort_order: Optional[str] = Query("desc"),
     search: Optional[str] = Query(None),
+    search_mode: str = Query("auto", pattern=HYBRID_SEARCH_MODE_PATTERN,
+                             description="auto | ranked | fuzzy (typo-tolerant) | ilike | hybrid (keyword + semantic)"),
     db: Session = Depends(get_db)
     ):
 
@@ -191,7 +133,7 @@ def get_all_places(
         base_query = base_query.filter(Places.state_id == state_id)
 
     # Apply search
-    base_query = apply_searching(base_query, Places, ["name"], search)
+    base_query = apply_searching(base_query, Places, ["name"], search, mode=search_mode, rank=not sort_by)
 
     total_count = base_query.count()
 
@@ -218,6 +160,57 @@ def get_all_places(
         pagination=pagination
     )
 
+@router.get("/semantic_search", response_model=CommonResponse)
+@safe_db_operation("SemanticSearch")
+def semantic_search_places(
+    q: str = Query(..., min_length=1, description="Free-text query, embedded with the shared model"),
+    k: int = Query(10, ge=1, le=100),
+    city: Optional[str] = Query(None),
+    state: Optional[str] = Query(None),
+    type: Optional[str] = Query(None),
+    db: Session = Depends(get_db)
+    ):
+    try:
+        query_vec = embedding_service.embed(q)
+    except EmbeddingUnavailable:
+        return CommonResponse.response_handler(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            message="Embedding model is not available",
+            is_success=False,
+            result=None
+        )
+
+    places = semantic_search(db, query_vec, k=k, city=city, state=state, type=type)
+
+    return CommonResponse.response_handler(
+        status_code=status.HTTP_200_OK,
+        message="Places fetched successfully",
+        is_success=True,
+        result=places
+    )
+
+@router.get("/hybrid_search", response_model=CommonResponse)
+@safe_db_operation("HybridSearch")
+def hybrid_search_places(
+    q: str = Query(..., min_length=1, description="Free text or a place name"),
+    k: int = Query(10, ge=1, le=100),
+    city: Optional[str] = Query(None),
+    state: Optional[str] = Query(None),
+    type: Optional[str] = Query(None),
+    suitable_for: Optional[List[str]] = Query(None, description="Keep places suitable for any of these"),
+    tags: Optional[List[str]] = Query(None, description="Keep places with any of these tags"),
+    db: Session = Depends(get_db)
+    ):
+    # keyword + embedding retrieval fused by rank; degrades to keyword-only without the model
+    places = hybrid_search(db, q, k=k, city=city, state=state, type=type, suitable_for=suitable_for, tags=tags)
+
+    return CommonResponse.response_handler(
+        status_code=status.HTTP_200_OK,
+        message="Places fetched successfully",
+        is_success=True,
+        result=places
+    )
+
 @router.get("/get_place/{place_id}", response_model=CommonResponse[PlaceRead])
 @safe_db_operation("GetPlace")
 def get_place(
@@ -274,6 +267,7 @@ def update_place(update: PlaceUpdate,
     update_data = update.dict(exclude={'id'})
 
     place.update(db, **update_data)
+    places_index.upsert(place.id, place.lat, place.lng, place.is_active)
 
     return CommonResponse.response_handler(
         status_code=status.HTTP_200_OK,
@@ -298,6 +292,11 @@ def delete_place(update: PlaceDelete, db: Session = Depends(get_db)):
         )
 
     place.update(db, is_active=update.is_active)
+    places_index.upsert(place.id, place.lat, place.lng, place.is_active)
+    if place.is_active is False or place.embedding is None:
+        places_vector_index.remove(place.id)
+    else:
+        places_vector_index.upsert(place.id, place.embedding, place.embedding_hash)
 
     if update.is_active:
         message = "Place restored successfully"
@@ -630,3 +629,28 @@ def delete_place(update: PlaceDelete, db: Session = Depends(get_db)):
 #     }
 
 
+
+
+@router.post("/admin/embeddings/backfill", status_code=status.HTTP_202_ACCEPTED)
+async def start_embedding_backfill(
+    mode: str = Query("stale", description="missing: only rows without a vector; stale: also rows whose text or model changed"),
+    resume: bool = Query(False, description="continue the latest unfinished run from its cursor"),
+    limit: Optional[int] = Query(None, ge=1, description="stop after embedding this many rows"),
+    db: Session = Depends(get_db)
+):
+    """Start a background embedding backfill; poll GET /places/admin/embeddings/backfill/{run_id}."""
+    run = await backfill_runner.start(db, mode, resume, limit)
+    return {
+        "run_id": run.id,
+        "mode": run.mode,
+        "status": run.status,
+        "poll_url": f"{router.prefix}/admin/embeddings/backfill/{run.id}",
+    }
+
+
+@router.get("/admin/embeddings/backfill/{run_id}")
+def get_embedding_backfill(run_id: str, db: Session = Depends(get_db)):
+    run = db.get(EmbeddingBackfillRun, run_id)
+    if run is None:
+        raise HTTPException(status_code=404, detail=f"Embedding backfill run {run_id} not found")
+    return describe(run)
@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, Text, Float, Date, DECIMAL, Numeric, ForeignKey, JSON, text, DateTime, Boolean
-from sqlalchemy.dialects.postgresql import JSONB, ARRAY
+from sqlalchemy import Column, Computed, Index, Integer, String, Text, Float, Date, DECIMAL, Numeric, ForeignKey, JSON, text, DateTime, Boolean
+from sqlalchemy.dialects.postgresql import JSONB, ARRAY, TSVECTOR
 from sqlalchemy.orm import declarative_base, relationship
 from pgvector.sqlalchemy import Vector
 from sqlalchemy.ext.mutable import MutableDict, MutableList
@@ -12,6 +12,9 @@ JSONVariant = JSON().with_variant(JSONB(), "postgresql")  # portable JSON
 
 class Restaurants(BaseModel):
     __tablename__ = "restaurants"
+    __table_args__ = (
+        Index("ix_restaurants_search_vector", "search_vector", postgresql_using="gin"),
+    )
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
 
@@ -39,4 +42,13 @@ class Restaurants(BaseModel):
 
     notes = Column(Text, nullable=True)
 
+    # full-text search (app/utils/searching.py): name (A), city/food type (B), description (C)
+    search_vector = Column(TSVECTOR, Computed(
+        "setweight(to_tsvector('simple', coalesce(name, '')), 'A') || "
+        "setweight(to_tsvector('simple', coalesce(city, '') || ' ' || coalesce(food_type, '')), 'B') || "
+        "setweight(to_tsvector('simple', coalesce(description, '')), 'C')",
+        persisted=True))
+    # the name's weight in search_vector: list search (apply_searching) matches name lexemes only
+    search_name_weight = "A"
+
     last_verified = Column(Date, nullable=True)
\ No newline at end of file
@@ -12,7 +12,7 @@ from app.api.restaurants.schema import RestaurantCreate, RestaurantRead, Restaur
 from app.api.restaurants.models import Restaurants
 import os
 from app.utils.helper import CommonResponse
-from app.utils.searching import apply_searching
+from app.utils.searching import SEARCH_MODE_PATTERN, apply_searching
 from app.utils.sorting import apply_sorting
 from app.utils.pagination import get_pagination_metadata
 from sqlalchemy.exc import SQLAlchemyError
@@ -86,6 +86,8 @@ def get_all_restaurants(
     sort_by: Optional[str] = Query(None),
     sort_order: Optional[str] = Query("desc"),
     search: Optional[str] = Query(None),
+    search_mode: str = Query("auto", pattern=SEARCH_MODE_PATTERN,
+                             description="auto | ranked | fuzzy (typo-tolerant) | ilike"),
     db: Session = Depends(get_db)
     ):
 
@@ -103,7 +105,7 @@ def get_all_restaurants(
             if city_id:
                 base_query = base_query.filter(Restaurants.city_id == city_id)
     # Apply search
-    base_query = apply_searching(base_query, Restaurants, ["name"], search)
+    base_query = apply_searching(base_query, Restaurants, ["name"], search, mode=search_mode, rank=not sort_by)
 
     total_count = base_query.count()
 
@@ -11,7 +11,7 @@ import json, math, httpx, subprocess
 from app.api.states.schema import StateCreate, StateRead, StateUpdate, StateDelete
 import os
 from app.utils.helper import CommonResponse
-from app.utils.searching import apply_searching
+from app.utils.searching import SEARCH_MODE_PATTERN, apply_searching
 from app.utils.sorting import apply_sorting
 from app.utils.pagination import get_pagination_metadata
 from sqlalchemy.exc import SQLAlchemyError
@@ -84,6 +84,8 @@ def get_all_states(
     sort_by: Optional[str] = Query(None),
     sort_order: Optional[str] = Query("desc"),
     search: Optional[str] = Query(None),
+    search_mode: str = Query("auto", pattern=SEARCH_MODE_PATTERN,
+                             description="auto | ranked | fuzzy (typo-tolerant) | ilike"),
     db: Session = Depends(get_db)
     ):
 
@@ -96,7 +98,7 @@ def get_all_states(
         base_query = base_query.filter(State.country_id == country_id)
 
     # Apply search
-    base_query = apply_searching(base_query, State, ["name"], search)
+    base_query = apply_searching(base_query, State, ["name"], search, mode=search_mode, rank=not sort_by)
 
     total_count = base_query.count()
 
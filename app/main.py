@@ -4,7 +4,7 @@ import traceback
 
 # from app.utils.helper import CommonResponse
 from fastapi import FastAPI, Request, status
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from starlette.exceptions import HTTPException as StarletteHTTPException
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
@@ -21,9 +21,18 @@ from app.api.countries.router import router as country_router
 from app.api.states.router import router as state_router
 from app.api.cities.router import router as city_router
 from app.api.restaurants.router import router as restaurant_router
+from app.api.itineraries.router import router as itinerary_router
+from app.api.itineraries.jobs import job_runner
 # from app.models import *
 
+from sqlalchemy import text
+
 from app.database.db import Base, engine  # Import Base and engine
+from app.utils.embeddings import EMBEDDING_WARM_ON_STARTUP, embedding_service
+from app.utils.llm_client import llm_client
+from app.utils.rag_service import RAG_INDEX_LOAD_ON_STARTUP, places_vector_index
+from app.utils.llm_scheduler import llm_scheduler
+from app.utils.metrics import TIMING_ENABLED, TimingMiddleware, register_gauge, render_metrics
 from config import Config
 
 # Initialize FastAPI app
@@ -60,22 +69,86 @@ app.include_router(country_router)
 app.include_router(state_router)
 app.include_router(city_router)
 app.include_router(restaurant_router)
+app.include_router(itinerary_router)
 # app.include_router(article_router.router)
 
 # Startup event: Create DB tables
 @app.on_event("startup")
 def startup():
+    # places.embedding is a pgvector column; extension-only indexes are left to the migrations
+    with engine.begin() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
     Base.metadata.create_all(bind=engine)
 
 
-# Middleware for closing DB session — optional depending on how you manage sessions
+@app.on_event("startup")
+def fail_interrupted_jobs():
+    # itinerary jobs run in-process: ones a previous process left unfinished will never complete
+    try:
+        n = job_runner.fail_stale()
+        if n:
+            logging.warning(f"Marked {n} interrupted itinerary job(s) as failed")
+    except Exception as e:
+        logging.warning(f"Itinerary job sweep failed: {e}")
+
+
+# the event loop keeps only weak references to tasks: hold the startup tasks until they finish
+_background_tasks = set()
+
+
+def _spawn(coro):
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+@app.on_event("startup")
+async def warm_llm():
+    # load the model in the background so the first itinerary isn't a cold start
+    if os.getenv("LLM_WARM_ON_STARTUP", "1") == "1":
+        _spawn(llm_client.warm())
+
+
+@app.on_event("startup")
+async def warm_embeddings():
+    # the embedding model loads in a thread; requests that need it before then wait for the load
+    if EMBEDDING_WARM_ON_STARTUP:
+        _spawn(embedding_service.warm())
+
+
+@app.on_event("startup")
+async def load_rag_index():
+    # memory-mapped load + reconcile (or first build) off the event loop
+    if RAG_INDEX_LOAD_ON_STARTUP:
+        async def load():
+            try:
+                await asyncio.to_thread(places_vector_index.load)
+            except Exception as e:
+                logging.warning(f"RAG index not loaded: {e}")
+        _spawn(load())
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await llm_client.aclose()
+    try:
+        places_vector_index.save_if_dirty()
+    except Exception as e:
+        logging.warning(f"RAG index not saved: {e}")
+
+
+# Per-request timings: Server-Timing header + histograms for /metrics
+if TIMING_ENABLED:
+    app.add_middleware(TimingMiddleware)
+
+register_gauge("llm_in_flight", "LLM calls holding a scheduler slot.", lambda: llm_scheduler.in_flight)
+register_gauge("llm_queue_depth", "LLM calls waiting for a scheduler slot.", lambda: llm_scheduler.snapshot()["queue_depth"])
 
-import time
 
-@app.middleware("http")
-async def db_session_middleware(request: Request, call_next):
-    response = await call_next(request)
-    return response
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
 
 
 @app.exception_handler(HTTPException)
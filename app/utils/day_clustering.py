@@ -0,0 +1,115 @@
+# app/utils/day_clustering.py
+"""
+Split an itinerary candidate pool into `days` compact, load-balanced groups.
+
+Each place weighs visit minutes + hop-from-city minutes (the fields the
+endpoints already compute). Seeding is a sweep around the city centre: places
+sorted by bearing are cut into `days` arcs of equal weight. A few rounds of
+capacitated k-means then tighten the groups. Points with the most to lose
+(largest regret between their best and second-best centre) pick first, and no
+group may exceed its share of the total weight by more than BALANCE_SLACK.
+
+Used as the deterministic fallback when the LLM fails, and to tag candidates
+with a `day_group` hint before prompting.
+"""
+import math
+from typing import Dict, List
+
+KM_PER_DEG = 111.32
+BALANCE_SLACK = 0.15
+MAX_ROUNDS = 10
+
+
+def _xy(lat: float, lng: float, lat0: float, lng0: float, cos0: float):
+    return ((lng - lng0) * KM_PER_DEG * cos0, (lat - lat0) * KM_PER_DEG)
+
+
+def cluster_into_days(
+    candidates: List[dict],
+    days: int,
+    city_lat: float,
+    city_lon: float,
+    visit_key: str = "avg_visit_mins",
+    hop_key: str = "hop_from_city_min",
+) -> List[List[dict]]:
+    """
+    Returns `days` lists of candidate dicts (some may be empty if the pool is
+    smaller than `days`). Within a group, places are ordered by rating desc,
+    then hop from the city.
+    """
+    if days <= 0:
+        return []
+    if days == 1 or len(candidates) <= 1:
+        groups = [list(candidates)] + [[] for _ in range(days - 1)]
+        return [_order_group(g, hop_key) for g in groups]
+
+    cos0 = math.cos(math.radians(city_lat))
+    pts = [_xy(float(c["lat"]), float(c["lng"]), city_lat, city_lon, cos0) for c in candidates]
+    weight = [float(c.get(visit_key) or 0) + float(c.get(hop_key) or 0) for c in candidates]
+    weight = [w if w > 0 else 1.0 for w in weight]
+    k = min(days, len(candidates))
+    capacity = sum(weight) / k * (1 + BALANCE_SLACK)
+
+    # --- sweep seeding: equal-weight arcs by bearing from the centre ---
+    by_angle = sorted(range(len(pts)), key=lambda i: math.atan2(pts[i][1], pts[i][0]))
+    assign = [0] * len(pts)
+    share, acc, g = sum(weight) / k, 0.0, 0
+    for i in by_angle:
+        if acc >= share * (g + 1) and g < k - 1:
+            g += 1
+        assign[i] = g
+        acc += weight[i]
+
+    for _ in range(MAX_ROUNDS):
+        centres = _centres(pts, assign, k)
+        new_assign = _capacitated_assign(pts, weight, centres, capacity)
+        if new_assign == assign:
+            break
+        assign = new_assign
+
+    groups: List[List[dict]] = [[] for _ in range(days)]
+    for i, g in enumerate(assign):
+        groups[g].append(candidates[i])
+    # nearest group to the centre first, so Day 1 is the easy in-city day
+    centres = _centres(pts, assign, k)
+    rank = sorted(range(k), key=lambda g: math.hypot(*centres[g]))
+    ordered = [groups[g] for g in rank] + groups[k:]
+    return [_order_group(g, hop_key) for g in ordered]
+
+
+def _centres(pts, assign, k):
+    sx, sy, n = [0.0] * k, [0.0] * k, [0] * k
+    for (x, y), g in zip(pts, assign):
+        sx[g] += x
+        sy[g] += y
+        n[g] += 1
+    return [(sx[g] / n[g], sy[g] / n[g]) if n[g] else (0.0, 0.0) for g in range(k)]
+
+
+def _capacitated_assign(pts, weight, centres, capacity):
+    k = len(centres)
+    dists = [[math.hypot(x - cx, y - cy) for cx, cy in centres] for x, y in pts]
+
+    def regret(i):
+        d = sorted(dists[i])
+        return d[1] - d[0] if k > 1 else 0.0
+
+    load = [0.0] * k
+    assign = [0] * len(pts)
+    for i in sorted(range(len(pts)), key=regret, reverse=True):
+        prefs = sorted(range(k), key=lambda g: dists[i][g])
+        chosen = next((g for g in prefs if load[g] + weight[i] <= capacity), None)
+        if chosen is None:
+            chosen = min(range(k), key=lambda g: load[g])
+        assign[i] = chosen
+        load[chosen] += weight[i]
+    return assign
+
+
+def _order_group(group: List[dict], hop_key: str) -> List[dict]:
+    return sorted(group, key=lambda c: (-float(c.get("rating") or 0), float(c.get(hop_key) or 0)))
+
+
+def day_group_map(groups: List[List[dict]], id_key: str = "place_id") -> Dict[str, int]:
+    """place_id -> 1-based day number, for tagging prompt candidates."""
+    return {c[id_key]: d for d, g in enumerate(groups, start=1) for c in g}
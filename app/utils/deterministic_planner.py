@@ -0,0 +1,87 @@
+# app/utils/deterministic_planner.py
+"""
+LLM-free itinerary planning (planner=deterministic).
+
+The itinerary pipeline normally asks the model which places go on which day
+and only falls back to its repair code (validate_and_repair_day,
+greedy_fill_nearby) when that fails. This module plans without a model call:
+
+  select     score every candidate on rating, audience match and distance
+             from the city; keep the best DETERMINISTIC_POOL_PER_DAY per day
+  partition  cluster_into_days on that selection (compact, load-balanced)
+  order      each day's places by score, best first
+
+The result is a seed itinerary in the shape the model returns,
+{"Day N": [{"place_id", "reason"}]}. The pipeline repairs it against the day
+time budget and orders the stops with optimize_route, as it does for model
+output. The whole plan takes milliseconds.
+
+Config (env):
+    DETERMINISTIC_POOL_PER_DAY      places kept per day before clustering (default 7)
+    DETERMINISTIC_AUDIENCE_WEIGHT   score bonus for a full audience match (default 1.0)
+    DETERMINISTIC_DISTANCE_WEIGHT   score penalty per hour from the city (default 0.5)
+"""
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.utils.day_clustering import cluster_into_days
+from app.utils.helper import AUDIENCE_TERMS, text_blob
+
+DETERMINISTIC_POOL_PER_DAY = int(os.getenv("DETERMINISTIC_POOL_PER_DAY", "7"))
+DETERMINISTIC_AUDIENCE_WEIGHT = float(os.getenv("DETERMINISTIC_AUDIENCE_WEIGHT", "1.0"))
+DETERMINISTIC_DISTANCE_WEIGHT = float(os.getenv("DETERMINISTIC_DISTANCE_WEIGHT", "0.5"))
+
+AUDIENCE_TERM_HITS = 2  # tag/description hits that count as a full match
+
+
+def audience_match(place: Dict[str, Any], audience: Optional[str]) -> float:
+    """0..1: 1 if the place lists the audience in suitable_for, else the share of its audience terms found."""
+    if not audience:
+        return 0.0
+    if audience in str(place.get("suitable_for_val") or "").lower():
+        return 1.0
+    terms = AUDIENCE_TERMS.get(audience)
+    if not terms:
+        return 0.0
+    blob = text_blob(place)
+    hits = sum(1 for t in terms if t in blob)
+    return min(1.0, hits / AUDIENCE_TERM_HITS)
+
+
+def score_place(place: Dict[str, Any], audience: Optional[str] = None,
+                hop_key: str = "hop_from_city_min") -> float:
+    return (float(place.get("rating") or 0.0)
+            + DETERMINISTIC_AUDIENCE_WEIGHT * audience_match(place, audience)
+            - DETERMINISTIC_DISTANCE_WEIGHT * float(place.get(hop_key) or 0) / 60.0)
+
+
+def plan_days(
+    candidates: List[Dict[str, Any]],
+    days: int,
+    city_lat: float,
+    city_lon: float,
+    audience: Optional[str] = None,
+    visit_key: str = "avg_visit_mins",
+    hop_key: str = "hop_from_city_min",
+    pool_per_day: int = DETERMINISTIC_POOL_PER_DAY,
+) -> Tuple[List[Dict[str, Any]], Dict[str, List[Dict[str, Any]]]]:
+    """
+    Returns (selected, seed): the places kept, each with "score" and
+    "day_group", and the per-day seed itinerary for the repair step.
+    """
+    scored = [{**c, "score": round(score_place(c, audience, hop_key), 3)} for c in candidates]
+    scored.sort(key=lambda c: (-c["score"], float(c.get(hop_key) or 0)))
+    selected = scored[:max(1, days * pool_per_day)]
+
+    groups = cluster_into_days(selected, days, city_lat, city_lon, visit_key=visit_key, hop_key=hop_key)
+    seed: Dict[str, List[Dict[str, Any]]] = {}
+    for d, group in enumerate(groups, start=1):
+        group.sort(key=lambda c: -c["score"])
+        for c in group:
+            c["day_group"] = d
+        seed[f"Day {d}"] = [{
+            "place_id": c["place_id"],
+            "reason": f"Rated {c.get('rating') or 0:g}, {c.get(hop_key) or 0} min from the city"
+                      + (", matches audience" if audience and audience_match(c, audience) >= 1.0 else ""),
+        } for c in group]
+    return [c for g in groups for c in g], seed
@@ -1,10 +1,190 @@
 # app/utils/embeddings.py
-from sentence_transformers import SentenceTransformer
+"""
+Shared sentence-embedding service (one model per process).
+
+Every embedding user goes through `embedding_service`: the places, cities,
+itinerary and other routers, app.utils.embedding, app.utils.rag_service and
+scripts/generate_embeddings.py. Before this, up to four copies of the model
+were loaded, most of them at import time. Now importing a router doesn't
+import sentence-transformers. The model loads on first use, or in the
+background at startup through warm().
+
+Single-text calls (embed / embed_async / get_embedding) go through a
+micro-batcher. A worker thread takes whatever is queued, waiting up to
+EMBEDDING_BATCH_WAIT_MS for more, and encodes up to EMBEDDING_BATCH_MAX
+texts in one forward pass. Under concurrent load a single `encode` call
+serves many requests. encode() takes a list the caller has already batched
+(backfills, index builds) and runs it directly.
+
+A failed load (model download down, disk full) is not permanent. Calls fail
+fast with EmbeddingUnavailable for EMBEDDING_LOAD_RETRY_S, then the next one
+tries again. The wait doubles after every consecutive failure, up to
+EMBEDDING_LOAD_RETRY_MAX_S.
+
+Config (env):
+    EMBEDDING_MODEL             sentence-transformers model (default all-MiniLM-L6-v2)
+    EMBEDDING_DIM               vector size expected by the places.embedding column (default 384)
+    EMBEDDING_BATCH_MAX         texts per micro-batch (default 64)
+    EMBEDDING_BATCH_WAIT_MS     how long a micro-batch waits to fill (default 5)
+    EMBEDDING_WARM_ON_STARTUP   1/0, load the model in the background at startup (default 1)
+    EMBEDDING_LOAD_RETRY_S      wait after a failed load before trying again (default 30)
+    EMBEDDING_LOAD_RETRY_MAX_S  cap on that wait as it doubles (default 600)
+"""
+import asyncio
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Optional, Sequence
+
+from app.utils.timing import span
+
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "384"))
+EMBEDDING_BATCH_MAX = int(os.getenv("EMBEDDING_BATCH_MAX", "64"))
+EMBEDDING_BATCH_WAIT_MS = float(os.getenv("EMBEDDING_BATCH_WAIT_MS", "5"))
+EMBEDDING_WARM_ON_STARTUP = os.getenv("EMBEDDING_WARM_ON_STARTUP", "1") == "1"
+EMBEDDING_LOAD_RETRY_S = float(os.getenv("EMBEDDING_LOAD_RETRY_S", "30"))
+EMBEDDING_LOAD_RETRY_MAX_S = float(os.getenv("EMBEDDING_LOAD_RETRY_MAX_S", "600"))
+
+
+class EmbeddingUnavailable(Exception):
+    """The embedding model could not be loaded."""
+
+
+class EmbeddingService:
+    def __init__(self, model_name: str = EMBEDDING_MODEL, batch_max: int = EMBEDDING_BATCH_MAX,
+                 batch_wait_ms: float = EMBEDDING_BATCH_WAIT_MS):
+        self.model_name = model_name
+        self.batch_max = max(1, batch_max)
+        self.batch_wait_s = max(0.0, batch_wait_ms) / 1000
+        self._model = None
+        self._load_error: Optional[Exception] = None
+        self._load_failures = 0
+        self._retry_at = 0.0  # time.monotonic() after which a failed load is tried again
+        self._load_lock = threading.Lock()
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._worker_lock = threading.Lock()
+        self.stats = {"loaded": False, "load_ms": 0.0, "texts": 0, "batches": 0, "max_batch": 0}
+
+    # --- model ---
+
+    def _load(self):
+        if self._model is not None:
+            return self._model
+        with self._load_lock:
+            if self._model is None:
+                if self._load_error is not None and time.monotonic() < self._retry_at:
+                    raise EmbeddingUnavailable(str(self._load_error))
+                t0 = time.perf_counter()
+                try:
+                    from sentence_transformers import SentenceTransformer
+                    self._model = SentenceTransformer(self.model_name)
+                except Exception as e:
+                    self._load_error = e
+                    self._load_failures += 1
+                    wait_s = min(EMBEDDING_LOAD_RETRY_MAX_S, EMBEDDING_LOAD_RETRY_S * 2 ** (self._load_failures - 1))
+                    self._retry_at = time.monotonic() + wait_s
+                    logging.error(f"Failed to load embedding model {self.model_name} "
+                                  f"(attempt {self._load_failures}, retrying in {wait_s:.0f}s): {e}")
+                    raise EmbeddingUnavailable(str(e)) from e
+                self._load_error = None
+                self._load_failures = 0
+                self.stats["loaded"] = True
+                self.stats["load_ms"] = round((time.perf_counter() - t0) * 1000, 1)
+                logging.info(f"Loaded embedding model {self.model_name} in {self.stats['load_ms']} ms")
+        return self._model
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    async def warm(self) -> bool:
+        """Load the model off the event loop so the first request doesn't pay for it."""
+        try:
+            await asyncio.to_thread(self._load)
+            return True
+        except EmbeddingUnavailable:
+            return False
+
+    # --- batch encoding ---
+
+    def encode(self, texts: Sequence[str], batch_size: int = 64) -> List[List[float]]:
+        """Encode an already-batched list of texts; one vector per text, in order."""
+        if not texts:
+            return []
+        model = self._load()
+        vectors = model.encode(list(texts), batch_size=batch_size, convert_to_numpy=True, show_progress_bar=False)
+        self.stats["texts"] += len(texts)
+        self.stats["batches"] += 1
+        self.stats["max_batch"] = max(self.stats["max_batch"], len(texts))
+        return vectors.tolist()
+
+    # --- single texts, micro-batched ---
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._worker_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.batch_wait_s
+            while len(batch) < self.batch_max:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            live = [(text, fut) for text, fut in batch if fut.set_running_or_notify_cancel()]
+            if not live:
+                continue
+            try:
+                vectors = self.encode([text for text, _ in live], batch_size=len(live))
+            except Exception as e:
+                for _, fut in live:
+                    fut.set_exception(e)
+                continue
+            for (_, fut), vec in zip(live, vectors):
+                fut.set_result(vec)
+
+    def submit(self, text: str) -> Future:
+        fut: Future = Future()
+        self._ensure_worker()
+        self._queue.put((text, fut))
+        return fut
+
+    def embed(self, text: str) -> List[float]:
+        """Embed one text, sharing a forward pass with concurrent callers."""
+        with span("embedding"):
+            return self.submit(text).result()
+
+    async def embed_async(self, text: str) -> List[float]:
+        with span("embedding"):
+            return await asyncio.wrap_future(self.submit(text))
+
+    def snapshot(self) -> dict:
+        batches = self.stats["batches"]
+        return {
+            "model": self.model_name,
+            **self.stats,
+            "queued": self._queue.qsize(),
+            "load_failures": self._load_failures,
+            "mean_batch": round(self.stats["texts"] / batches, 2) if batches else 0.0,
+        }
+
+
+embedding_service = EmbeddingService()
 
-# load model once at startup
-embedder = SentenceTransformer("all-MiniLM-L6-v2")
 
 def get_embedding(text: str) -> list[float]:
     if not text:
         return []
-    return embedder.encode(text).tolist()
+    return embedding_service.embed(text)
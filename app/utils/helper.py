@@ -8,7 +8,7 @@ import time
 from jose import jwt
 from passlib.context import CryptContext
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from typing import Union, Type, TypeVar, Optional, Generic
+from typing import Callable, Union, Type, TypeVar, Optional, Generic
 from pydantic import BaseModel, ValidationError
 from fastapi import HTTPException, Request
 from fastapi.responses import JSONResponse
@@ -137,23 +137,39 @@ class CommonResponse(BaseModel, Generic[T]):
     class Config:
         from_attributes = True 
 
-import subprocess, math, json, httpx
+import math, json, httpx
 from decimal import Decimal
 from app.api.itineraries.models import ItineraryRequest, ItineraryCandidate, ItineraryResult, ItineraryModelIO
 from sqlalchemy import MetaData, create_engine
+from app.utils.llm_client import OLLAMA_URL, LLM_MODEL, LLM_TIMEOUT_S, LLM_KEEP_ALIVE, sampling_options
+from app.utils.llm_cache import llm_cache
+from app.utils.llm_scheduler import LLMOverloaded, llm_scheduler
+from app.utils.timing import span
 
-def query_llama(prompt: str, model: str = "llama3.1:8b") -> str:
-    result = subprocess.run(
-        ["ollama", "run", model],
-        input=prompt.encode("utf-8"),
-        capture_output=True
-    )
-    return result.stdout.decode("utf-8").strip()
+def query_llama(prompt: str, model: str = LLM_MODEL, validate: Optional[Callable[[str], bool]] = None) -> str:
+    """
+    Plain completion via Ollama /api/generate on the pooled client. Used to
+    spawn `ollama run` per prompt; keep_alive now keeps one warm model loaded.
+    Cached only if `validate` accepts the text (see llm_cache.set_if_valid).
+    """
+    options = sampling_options()
+    key, cached = llm_cache.lookup("generate", model, prompt, None, options)
+    if cached is not None:
+        return cached
+    payload = {"model": model, "prompt": prompt, "stream": False,
+               "keep_alive": LLM_KEEP_ALIVE, "options": options}
+    with llm_scheduler.slot_sync(), span("llm_call"):
+        r = _sync_http_client().post(f"{OLLAMA_URL}/api/generate", json=payload)
+    r.raise_for_status()
+    text = (r.json().get("response") or "").strip()
+    llm_cache.set_if_valid(key, text, model, validate)
+    return text
 
 # --- Config toggles ---
 URBAN_SPEED_KMH = 25
 INTERCITY_SPEED_KMH = 55
 HOP_BUFFER_MIN = 12
+URBAN_RADIUS_KM = 20  # both ends within this of the centre -> urban speed
 DAY_BUDGET_MIN = 8 * 60
 END_OF_DAY_BUFFER_MIN = 30
 OUT_OF_CITY_ONE_WAY_KM_MAX = 220
@@ -184,8 +200,6 @@ TRAVEL_BUFFER_MIN = 12
 
 
 
-OLLAMA_URL = "http://localhost:11434"
-LLM_MODEL = "llama3.1:8b"
 
 metadata = MetaData()
 engine = create_engine(os.getenv("DATABASE_URL"), future=True)
@@ -378,7 +392,7 @@ def hop_time_minutes(lat1, lon1, lat2, lon2, city_lat, city_lon):
     km = haversine_km(lat1, lon1, lat2, lon2)
     city_to_a = haversine_km(city_lat, city_lon, lat1, lon1)
     city_to_b = haversine_km(city_lat, city_lon, lat2, lon2)
-    near_city = (city_to_a < 20) and (city_to_b < 20)
+    near_city = (city_to_a < URBAN_RADIUS_KM) and (city_to_b < URBAN_RADIUS_KM)
     base = travel_minutes_est(km, urban=near_city)
     return base + HOP_BUFFER_MIN
 
@@ -419,52 +433,73 @@ def query_llama_local(prompt: str, max_tokens: int = 1024, temperature: float =
     # TODO: integrate your local runtime here.
     return '{"itinerary": {}}'
 
-def query_llama_structured(itin_schema: dict, prompt: str, model: str = LLM_MODEL, base_url: str = OLLAMA_URL) -> str:
+def query_llama_structured(itin_schema: dict, prompt: str, model: str = LLM_MODEL, base_url: str = OLLAMA_URL,
+                           validate: Optional[Callable[[str], bool]] = None) -> str:
     """
     Prefer Ollama REST /api/chat with format schema if supported.
-    Returns model content (expected JSON).
+    Returns model content (expected JSON); cached only if `validate` accepts it.
     """
+    options = sampling_options()
+    key, cached = llm_cache.lookup("chat", model, prompt, itin_schema, options)
+    if cached is not None:
+        return cached
     payload = {
         "model": model,
         "messages": [{"role": "user", "content": prompt}],
         "stream": False,
+        "keep_alive": LLM_KEEP_ALIVE,
+        "options": options,
         "format": itin_schema  # structured outputs if available
     }
-    with httpx.Client(timeout=120) as client:
-        r = client.post(f"{base_url}/api/chat", json=payload)
-        r.raise_for_status()
-        data = r.json()
-        return data["message"]["content"].strip()
+    with llm_scheduler.slot_sync(), span("llm_call"):
+        r = _sync_http_client().post(f"{base_url}/api/chat", json=payload)
+    r.raise_for_status()
+    data = r.json()
+    text = data["message"]["content"].strip()
+    llm_cache.set_if_valid(key, text, model, validate)
+    return text
+
+_sync_http = None
+
+def _sync_http_client() -> httpx.Client:
+    """Pooled keep-alive client for the remaining sync callers (endpoints use llm_client)."""
+    global _sync_http
+    if _sync_http is None:
+        _sync_http = httpx.Client(timeout=LLM_TIMEOUT_S)
+    return _sync_http
 
 def query_llama_subprocess(prompt: str, model: str = LLM_MODEL) -> str:
-    p = subprocess.Popen(
-        ["ollama", "run", model],
-        stdin=subprocess.PIPE,
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        text=True,                  # Text mode
-        encoding="utf-8",           # Explicitly set UTF-8 decoding
-        errors="replace"            # Replace undecodable bytes rather than error
-    )
-    out, err = p.communicate(input=prompt)
-    return (out or "").strip()
+    # Name kept for existing callers; no longer spawns `ollama run`.
+    return query_llama(prompt, model=model)
+
+def itinerary_from_json(raw: str) -> Optional[dict]:
+    """The non-empty "itinerary" object of a model reply, or None if there isn't one."""
+    try:
+        iti = json.loads(raw).get("itinerary", {})
+    except (ValueError, AttributeError):
+        return None
+    return iti if isinstance(iti, dict) and iti else None
+
+def is_itinerary_json(raw: str) -> bool:
+    # llm_cache `validate`: only replies with a usable itinerary are cached
+    return itinerary_from_json(raw) is not None
 
 def get_llm_itinerary_or_none(prompt: str, schema_hint: dict) -> Optional[dict]:
     # 1) try REST structured
     try:
-        raw = query_llama_structured(schema_hint, prompt, model=LLM_MODEL, base_url=OLLAMA_URL)
-        parsed = json.loads(raw)
-        iti = parsed.get("itinerary", {})
-        if isinstance(iti, dict) and iti:
+        raw = query_llama_structured(schema_hint, prompt, model=LLM_MODEL, base_url=OLLAMA_URL,
+                                     validate=is_itinerary_json)
+        iti = itinerary_from_json(raw)
+        if iti:
             return iti
+    except LLMOverloaded:
+        return None  # don't queue again for the fallback call
     except Exception:
         pass
-    # 2) try subprocess with same prompt
+    # 2) try plain generate with same prompt
     try:
-        raw = query_llama_subprocess(prompt, model=LLM_MODEL)
-        parsed = json.loads(raw)
-        iti = parsed.get("itinerary", {})
-        if isinstance(iti, dict) and iti:
+        iti = itinerary_from_json(query_llama(prompt, model=LLM_MODEL, validate=is_itinerary_json))
+        if iti:
             return iti
     except Exception:
         pass
@@ -0,0 +1,159 @@
+# app/utils/hybrid_search.py
+"""
+Hybrid place retrieval: lexical and embedding search fused with reciprocal-rank fusion.
+
+Keyword search finds "Sabarmati Ashram" but not "quiet lakeside spots for
+seniors", and embeddings the other way round. hybrid_rank runs up to three
+retrievers at once, each in its own thread and DB session:
+  fts      search_vector @@ any query word (prefix), by ts_rank_cd
+  trigram  name %> query, by word_similarity (only when pg_trgm is installed)
+  vector   the HNSW search from app.utils.semantic_search
+It then merges their ranked lists with RRF: score = sum of
+1 / (HYBRID_RRF_K + rank) over the lists a place appears in. RRF needs no
+calibration between BM25-like ranks and cosine distances, and a place found
+by several retrievers rises to the top.
+
+Structured filters (city, state, type, suitable_for, tags, ids; see
+semantic_search.filter_clauses) are applied inside every retriever, so each
+list is filtered before fusion. If the embedding model is unavailable, or a
+retriever fails, its list is dropped and the others still answer.
+
+Used by GET /places/hybrid_search, get_all_places?search_mode=hybrid and,
+with `interests`, itinerary candidate retrieval.
+
+Config (env):
+    HYBRID_CANDIDATES   rows each retriever contributes (default 50)
+    HYBRID_RRF_K        RRF rank constant (default 60)
+    HYBRID_WORKERS      retriever threads (default 8)
+"""
+import contextvars
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.orm import Session
+
+from app.database.db import SessionLocal
+from app.utils.embeddings import EmbeddingUnavailable, embedding_service
+from app.utils.searching import FTS_CONFIG, FUZZY_THRESHOLD, has_pg_trgm, to_prefix_tsquery
+from app.utils.semantic_search import RESULT_COLUMNS, filter_clauses, semantic_search, structured_filters
+from app.utils.timing import span
+
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "50"))
+HYBRID_RRF_K = int(os.getenv("HYBRID_RRF_K", "60"))
+HYBRID_WORKERS = int(os.getenv("HYBRID_WORKERS", "8"))
+
+RETRIEVERS = ("fts", "trigram", "vector")
+
+_pool = ThreadPoolExecutor(max_workers=HYBRID_WORKERS, thread_name_prefix="hybrid")
+
+
+def _where(filters: dict) -> str:
+    return " AND ".join(["is_active IS NOT FALSE"] + filter_clauses(filters))
+
+
+def _fts_ids(db: Session, query: str, filters: dict, k: int) -> List[int]:
+    tsquery = to_prefix_tsquery(query, any_word=True)
+    if not tsquery:
+        return []
+    sql = text(f"""
+        SELECT id FROM places
+        WHERE {_where(filters)} AND search_vector @@ to_tsquery('{FTS_CONFIG}', :tsq)
+        ORDER BY ts_rank_cd(search_vector, to_tsquery('{FTS_CONFIG}', :tsq)) DESC, id
+        LIMIT :k
+    """).bindparams(bindparam("k"))
+    return [r.id for r in db.execute(sql, {"tsq": tsquery, "k": k, **filters})]
+
+
+def _trigram_ids(db: Session, query: str, filters: dict, k: int) -> List[int]:
+    db.execute(text("SELECT set_config('pg_trgm.word_similarity_threshold', :t, true)"),
+               {"t": str(FUZZY_THRESHOLD)})
+    sql = text(f"""
+        SELECT id FROM places
+        WHERE {_where(filters)} AND name %> :q
+        ORDER BY word_similarity(:q, name) DESC, id
+        LIMIT :k
+    """).bindparams(bindparam("k"))
+    try:
+        return [r.id for r in db.execute(sql, {"q": query, "k": k, **filters})]
+    finally:
+        db.rollback()  # drops the set_config
+
+
+def _vector_ids(db: Session, query: str, filters: dict, k: int) -> List[int]:
+    query_vec = embedding_service.embed(query)
+    return [r["id"] for r in semantic_search(db, query_vec, k=k, **filters)]
+
+
+_RETRIEVER_FNS: Dict[str, Callable[[Session, str, dict, int], List[int]]] = {
+    "fts": _fts_ids,
+    "trigram": _trigram_ids,
+    "vector": _vector_ids,
+}
+
+
+def _in_own_session(fn, *args):
+    db = SessionLocal()
+    try:
+        return fn(db, *args)
+    finally:
+        db.close()
+
+
+def rrf_fuse(ranked: Dict[str, List[int]], rrf_k: int = HYBRID_RRF_K) -> List[Dict[str, Any]]:
+    """{retriever: [id, ...best first]} -> [{"id", "score", "ranks"}], best first."""
+    fused: Dict[int, Dict[str, Any]] = {}
+    for name, ids in ranked.items():
+        for rank, pk in enumerate(ids, start=1):
+            hit = fused.setdefault(pk, {"id": pk, "score": 0.0, "ranks": {}})
+            hit["score"] += 1.0 / (rrf_k + rank)
+            hit["ranks"][name] = rank
+    hits = sorted(fused.values(), key=lambda h: (-h["score"], min(h["ranks"].values()), h["id"]))
+    for h in hits:
+        h["score"] = round(h["score"], 6)
+    return hits
+
+
+def hybrid_rank(query: str, limit: int = 10, city: Optional[str] = None, state: Optional[str] = None,
+                type: Optional[str] = None, suitable_for: Optional[Sequence[str]] = None,
+                tags: Optional[Sequence[str]] = None, ids: Optional[Sequence[int]] = None,
+                candidates: int = HYBRID_CANDIDATES, retrievers: Sequence[str] = RETRIEVERS) -> List[Dict[str, Any]]:
+    """
+    Fused ranking of place ids for `query`: [{"id", "score", "ranks": {retriever: rank}}],
+    best first, at most `limit`. Blocking: from async code, call it in a thread.
+    """
+    filters = structured_filters(city, state, type, suitable_for, tags, ids)
+    with span("hybrid_search"):
+        if "trigram" in retrievers:
+            db = SessionLocal()
+            try:
+                if not has_pg_trgm(db):
+                    retrievers = [r for r in retrievers if r != "trigram"]
+            finally:
+                db.close()
+
+        # each task gets its own copy of the context so spans land in the caller's timings
+        futures = {name: _pool.submit(contextvars.copy_context().run, _in_own_session,
+                                      _RETRIEVER_FNS[name], query, filters, max(candidates, limit))
+                   for name in retrievers}
+        ranked = {}
+        for name, future in futures.items():
+            try:
+                ranked[name] = future.result()
+            except EmbeddingUnavailable as e:
+                logging.warning(f"hybrid_search: vector retriever skipped, {e}")
+            except Exception as e:
+                logging.warning(f"hybrid_search: {name} retriever failed: {e}")
+        return rrf_fuse(ranked)[:limit]
+
+
+def hybrid_search(db: Session, query: str, k: int = 10, **filters) -> List[Dict[str, Any]]:
+    """hybrid_rank plus the place rows (RESULT_COLUMNS + score + ranks), best first."""
+    hits = hybrid_rank(query, limit=k, **filters)
+    if not hits:
+        return []
+    sql = text(f"SELECT {', '.join(RESULT_COLUMNS)} FROM places WHERE id = ANY(:ids)")
+    rows = {r.id: dict(r._mapping) for r in db.execute(sql, {"ids": [h["id"] for h in hits]})}
+    return [{**rows[h["id"]], "score": h["score"], "ranks": h["ranks"]} for h in hits if h["id"] in rows]
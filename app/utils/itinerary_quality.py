@@ -0,0 +1,67 @@
+# app/utils/itinerary_quality.py
+"""
+Quality metrics for a finished itinerary, comparable across planners.
+
+For {"Day N": [{"place_id", ...}]} (the shape every planner persists in
+itinerary_results.itinerary_json) it reports:
+  travel_minutes    city -> stops in the given order -> city, from TravelMatrix
+  items_per_day     mean stops per day (plus the min, and the count of empty days)
+  rating_sum        sum of place ratings over all stops
+  days_over_budget  days whose travel + visits + END_OF_DAY_BUFFER_MIN exceed DAY_BUDGET_MIN
+
+Stops whose place_id is not in `places_by_id` are counted as unknown and left
+out of the other numbers.
+"""
+from typing import Any, Dict, List
+
+from app.utils.helper import DAY_BUDGET_MIN, END_OF_DAY_BUFFER_MIN
+from app.utils.route_optimizer import route_minutes
+from app.utils.travel_matrix import TravelMatrix
+
+
+def _day_number(key: str) -> int:
+    try:
+        return int(str(key).split()[-1])
+    except ValueError:
+        return 0
+
+
+def score_itinerary(
+    itinerary: Dict[str, List[Dict[str, Any]]],
+    places_by_id: Dict[str, Dict[str, Any]],
+    matrix: TravelMatrix,
+    visit_key: str = "avg_visit_mins",
+) -> Dict[str, Any]:
+    per_day, unknown = {}, 0
+    for key in sorted(itinerary or {}, key=_day_number):
+        items = itinerary[key] if isinstance(itinerary[key], list) else []
+        pids = []
+        for it in items:
+            pid = it.get("place_id") if isinstance(it, dict) else None
+            if pid in pids:
+                continue
+            if pid in places_by_id and pid in matrix:
+                pids.append(pid)
+            else:
+                unknown += 1
+        travel = route_minutes(matrix, pids)
+        visit = sum(int(places_by_id[p].get(visit_key) or 0) for p in pids)
+        per_day[key] = {
+            "items": len(pids),
+            "travel_minutes": travel,
+            "visit_minutes": visit,
+            "rating_sum": round(sum(float(places_by_id[p].get("rating") or 0) for p in pids), 2),
+            "over_budget": bool(pids) and travel + visit + END_OF_DAY_BUFFER_MIN > DAY_BUDGET_MIN,
+        }
+
+    n_days = len(per_day) or 1
+    return {
+        "travel_minutes": sum(d["travel_minutes"] for d in per_day.values()),
+        "items_per_day": round(sum(d["items"] for d in per_day.values()) / n_days, 2),
+        "min_items_per_day": min((d["items"] for d in per_day.values()), default=0),
+        "empty_days": sum(1 for d in per_day.values() if not d["items"]),
+        "rating_sum": round(sum(d["rating_sum"] for d in per_day.values()), 2),
+        "days_over_budget": sum(1 for d in per_day.values() if d["over_budget"]),
+        "unknown_places": unknown,
+        "per_day": per_day,
+    }
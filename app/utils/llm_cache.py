@@ -0,0 +1,149 @@
+# app/utils/llm_cache.py
+"""
+Content-addressed cache for raw LLM responses.
+
+Key = sha256 of (endpoint, model, sha256(prompt), sha256(schema), sampling
+options). The same prompt sent to the same model with the same schema and
+temperature gets the stored text back instead of another generation.
+
+Two tiers:
+  * memory: TTLCache (LRU) for the hot set
+  * disk:   one JSON file per key under LLM_CACHE_DIR/<2 hex>/<key>.json,
+            written atomically, so it survives restarts and is shared by workers
+
+Only deterministic calls are cached: temperature 0, or a fixed seed, set by
+the caller or LLM_TEMPERATURE. The model's default samples, and the same
+prompt is then supposed to give different answers, so by default nothing is
+cached. A response is stored only once the caller's `validate` callback
+accepts it (e.g. it parses as the expected JSON), so a malformed reply is
+retried next time instead of being replayed.
+
+Config (env):
+    LLM_CACHE_ENABLED      1/0 (default 1)
+    LLM_CACHE_DIR          default .cache/llm
+    LLM_CACHE_SIZE         memory entries (default 1024)
+    LLM_CACHE_TTL_S        memory and disk expiry (default 7 days)
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Callable, Optional
+
+from app.utils.result_cache import TTLCache
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", os.path.join(".cache", "llm"))
+LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "1024"))
+LLM_CACHE_TTL_S = float(os.getenv("LLM_CACHE_TTL_S", str(7 * 24 * 3600)))
+
+
+def _sha(data) -> str:
+    if not isinstance(data, str):
+        data = json.dumps(data, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def is_deterministic(options: Optional[dict]) -> bool:
+    options = options or {}
+    return options.get("temperature") == 0 or options.get("seed") is not None
+
+
+def is_json(text: str) -> bool:
+    """A `validate` for callers that only need the response to parse as JSON."""
+    try:
+        json.loads(text)
+        return True
+    except ValueError:
+        return False
+
+
+def llm_cache_key(endpoint: str, model: str, prompt: str, schema=None, options: Optional[dict] = None) -> str:
+    return _sha({
+        "endpoint": endpoint,
+        "model": model,
+        "prompt": _sha(prompt),
+        "schema": _sha(schema) if schema is not None else None,
+        "options": options or {},
+    })
+
+
+class LLMResponseCache:
+    def __init__(self, directory: str = LLM_CACHE_DIR, maxsize: int = LLM_CACHE_SIZE,
+                 ttl_s: float = LLM_CACHE_TTL_S, enabled: bool = LLM_CACHE_ENABLED):
+        self.directory = directory
+        self.ttl_s = ttl_s
+        self.enabled = enabled
+        self.memory = TTLCache(maxsize=maxsize, ttl_s=ttl_s)
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "skipped": 0, "rejected": 0, "writes": 0}
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key: str) -> Optional[str]:
+        text = self.memory.get(key)
+        if text is not None:
+            self.stats["memory_hits"] += 1
+            return text
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                entry = json.load(f)
+            if entry["created"] + self.ttl_s >= time.time():
+                self.memory.set(key, entry["response"])
+                self.stats["disk_hits"] += 1
+                return entry["response"]
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logging.warning(f"LLM cache read failed for {key[:12]}: {e}")
+        self.stats["misses"] += 1
+        return None
+
+    def set(self, key: str, text: str, model: str = ""):
+        self.memory.set(key, text)
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"created": time.time(), "model": model, "response": text}, f, ensure_ascii=False)
+            os.replace(tmp, path)
+            self.stats["writes"] += 1
+        except Exception as e:
+            logging.warning(f"LLM cache write failed for {key[:12]}: {e}")
+
+    def set_if_valid(self, key: Optional[str], text: str, model: str = "",
+                     validate: Optional[Callable[[str], bool]] = None):
+        """set() for a looked-up key, but only if the caller's `validate` accepts `text`."""
+        if not key or not text or validate is None:
+            return
+        try:
+            ok = validate(text)
+        except Exception:
+            ok = False
+        if ok:
+            self.set(key, text, model)
+        else:
+            self.stats["rejected"] += 1
+
+    def lookup(self, endpoint: str, model: str, prompt: str, schema=None,
+               options: Optional[dict] = None) -> tuple:
+        """
+        Returns (key, cached_text). key is None when the call must not be cached
+        (cache disabled or sampling is non-deterministic).
+        """
+        if not self.enabled:
+            return None, None
+        if not is_deterministic(options):
+            self.stats["skipped"] += 1
+            return None, None
+        key = llm_cache_key(endpoint, model, prompt, schema, options)
+        return key, self.get(key)
+
+    def clear(self):
+        self.memory.clear()
+
+
+llm_cache = LLMResponseCache()
@@ -0,0 +1,263 @@
+# app/utils/llm_client.py
+"""
+Shared async client for the Ollama REST API.
+
+One pooled httpx.AsyncClient per event loop, with keep-alive connections, so
+itinerary requests stop paying a TCP/HTTP handshake per call and stop holding
+a threadpool worker while the model thinks. Every call takes a slot from
+app.utils.llm_scheduler (bounded concurrency, priority queue, admission
+control); when it refuses, calls raise LLMOverloaded.
+
+Every request carries `keep_alive`, so Ollama keeps the model resident
+between calls instead of unloading it after its 5 minute default; warm()
+preloads it at startup. Responses report load_duration, which we use to
+count cold loads.
+
+Config (env):
+    OLLAMA_URL                  base url (default http://localhost:11434)
+    LLM_MODEL                   default model (default llama3.1:8b)
+    LLM_MAX_CONCURRENCY         concurrent generations (default 2; see llm_scheduler)
+    LLM_MAX_CONNECTIONS         pool size (default 10)
+    LLM_TIMEOUT_S               default per-call read timeout (default 120)
+    LLM_CONNECT_TIMEOUT_S       connect timeout (default 5)
+    LLM_KEEP_ALIVE              how long Ollama keeps the model loaded (default 30m, -1 = forever)
+    LLM_TEMPERATURE             sampling temperature for every call (default unset: the model's
+                                own; 0 makes calls deterministic, and so cacheable)
+
+Deterministic calls (temperature 0 or a fixed seed, from LLM_TEMPERATURE or the
+caller's `options`) are answered from app.utils.llm_cache when possible. A
+response is cached only if the caller passes `validate` and it accepts the text.
+
+Sync endpoints (run in FastAPI's threadpool) call the client through
+run_from_thread, which awaits on the app's event loop and blocks only the
+worker thread.
+
+Point OLLAMA_URL at scripts/fake_ollama.py to run offline.
+"""
+import asyncio
+import functools
+import json
+import logging
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional
+
+import httpx
+from anyio import from_thread
+
+from app.utils.llm_cache import llm_cache
+from app.utils.llm_scheduler import LLM_MAX_CONCURRENCY, LLMOverloaded, LLMScheduler, llm_scheduler
+from app.utils.timing import record_span, span
+
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
+LLM_MODEL = os.getenv("LLM_MODEL", "llama3.1:8b")
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "10"))
+LLM_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "120"))
+LLM_CONNECT_TIMEOUT_S = float(os.getenv("LLM_CONNECT_TIMEOUT_S", "5"))
+LLM_KEEP_ALIVE = os.getenv("LLM_KEEP_ALIVE", "30m")
+LLM_TEMPERATURE: Optional[float] = float(os.environ["LLM_TEMPERATURE"]) if os.getenv("LLM_TEMPERATURE") else None
+COLD_LOAD_MS = 100  # load_duration above this counts as a cold model load
+
+
+def sampling_options(options: Optional[dict] = None) -> dict:
+    """Ollama `options`: the caller's, over LLM_TEMPERATURE if configured (else the model's default)."""
+    defaults = {"temperature": LLM_TEMPERATURE} if LLM_TEMPERATURE is not None else {}
+    return {**defaults, **(options or {})}
+
+
+class LLMTimeout(Exception):
+    """Waited longer than the per-call timeout for a slot or a response."""
+
+
+class OllamaClient:
+    def __init__(self, base_url: str = OLLAMA_URL, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 max_connections: int = LLM_MAX_CONNECTIONS, timeout_s: float = LLM_TIMEOUT_S,
+                 transport: Optional[httpx.AsyncBaseTransport] = None,
+                 scheduler: Optional[LLMScheduler] = None):
+        self.base_url = base_url.rstrip("/")
+        self.max_connections = max_connections
+        self.timeout_s = timeout_s
+        self.scheduler = scheduler or LLMScheduler(max_concurrency=max_concurrency)
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop = None
+        self.stats = {"calls": 0, "errors": 0, "timeouts": 0, "overloaded": 0, "in_flight": 0, "waiting": 0,
+                      "cold_loads": 0, "load_ms": 0.0}
+
+    def _ensure(self):
+        # httpx/asyncio primitives are bound to the loop they were first used on
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                transport=self._transport,
+                timeout=httpx.Timeout(self.timeout_s, connect=LLM_CONNECT_TIMEOUT_S),
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+            )
+            self._loop = loop
+        return self._client
+
+    @asynccontextmanager
+    async def _slot(self, timeout_s: Optional[float] = None):
+        """Hold one scheduler slot; yields (client, httpx timeout for the remaining budget)."""
+        client = self._ensure()
+        timeout_s = timeout_s or self.timeout_s
+        deadline = time.monotonic() + timeout_s
+        self.stats["waiting"] += 1
+        waiting = True
+        queued_at = time.perf_counter()
+        try:
+            async with self.scheduler.slot():
+                record_span("llm_queue", (time.perf_counter() - queued_at) * 1000)
+                self.stats["waiting"] -= 1
+                waiting = False
+                self.stats["calls"] += 1
+                self.stats["in_flight"] += 1
+                try:
+                    remaining = max(0.1, deadline - time.monotonic())
+                    with span("llm_call"):
+                        yield client, httpx.Timeout(remaining, connect=LLM_CONNECT_TIMEOUT_S)
+                except httpx.TimeoutException as e:
+                    self.stats["timeouts"] += 1
+                    raise LLMTimeout(str(e)) from e
+                except Exception:
+                    self.stats["errors"] += 1
+                    raise
+                finally:
+                    self.stats["in_flight"] -= 1
+        except LLMOverloaded:
+            self.stats["overloaded"] += 1
+            raise
+        finally:
+            if waiting:
+                self.stats["waiting"] -= 1
+
+    def _record_load(self, data: Dict[str, Any]):
+        load_ms = (data.get("load_duration") or 0) / 1e6
+        self.stats["load_ms"] += load_ms
+        if load_ms > COLD_LOAD_MS:
+            self.stats["cold_loads"] += 1
+
+    async def post(self, path: str, payload: Dict[str, Any], timeout_s: Optional[float] = None) -> Dict[str, Any]:
+        """POST json to Ollama under the concurrency cap; returns the decoded body."""
+        async with self._slot(timeout_s) as (client, timeout):
+            r = await client.post(path, json=payload, timeout=timeout)
+            r.raise_for_status()
+            data = r.json()
+            self._record_load(data)
+            return data
+
+    async def chat(self, prompt: str, schema: Optional[dict] = None, model: Optional[str] = None,
+                   timeout_s: Optional[float] = None, options: Optional[dict] = None,
+                   validate: Optional[Callable[[str], bool]] = None) -> str:
+        """
+        /api/chat with an optional JSON schema (structured outputs). Returns message content.
+        `validate` decides whether the content may be cached (see llm_cache.set_if_valid).
+        """
+        model = model or LLM_MODEL
+        options = sampling_options(options)
+        key, cached = llm_cache.lookup("chat", model, prompt, schema, options)
+        if cached is not None:
+            return cached
+        payload = {
+            "model": model,
+            "messages": [{"role": "user", "content": prompt}],
+            "stream": False,
+            "keep_alive": LLM_KEEP_ALIVE,
+            "options": options,
+        }
+        if schema is not None:
+            payload["format"] = schema
+        data = await self.post("/api/chat", payload, timeout_s)
+        text = data["message"]["content"].strip()
+        llm_cache.set_if_valid(key, text, model, validate)
+        return text
+
+    async def chat_stream(self, prompt: str, schema: Optional[dict] = None, model: Optional[str] = None,
+                          timeout_s: Optional[float] = None, options: Optional[dict] = None,
+                          validate: Optional[Callable[[str], bool]] = None) -> AsyncIterator[str]:
+        """
+        /api/chat with stream=true; yields content deltas as Ollama produces them.
+        A cached response is yielded as one chunk. The timeout applies to
+        getting a slot and to each read, not to the whole stream. `validate` as in chat().
+        """
+        model = model or LLM_MODEL
+        options = sampling_options(options)
+        key, cached = llm_cache.lookup("chat", model, prompt, schema, options)
+        if cached is not None:
+            yield cached
+            return
+        payload = {
+            "model": model,
+            "messages": [{"role": "user", "content": prompt}],
+            "stream": True,
+            "keep_alive": LLM_KEEP_ALIVE,
+            "options": options,
+        }
+        if schema is not None:
+            payload["format"] = schema
+        parts = []
+        async with self._slot(timeout_s) as (client, timeout):
+            async with client.stream("POST", "/api/chat", json=payload, timeout=timeout) as r:
+                r.raise_for_status()
+                async for line in r.aiter_lines():
+                    if not line.strip():
+                        continue
+                    data = json.loads(line)
+                    if data.get("error"):
+                        raise RuntimeError(f"Ollama stream error: {data['error']}")
+                    delta = (data.get("message") or {}).get("content") or ""
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+                    if data.get("done"):
+                        self._record_load(data)
+                        break
+        llm_cache.set_if_valid(key, "".join(parts).strip(), model, validate)
+
+    async def generate(self, prompt: str, model: Optional[str] = None,
+                       timeout_s: Optional[float] = None, options: Optional[dict] = None,
+                       validate: Optional[Callable[[str], bool]] = None) -> str:
+        """/api/generate, plain completion. Returns the response text."""
+        model = model or LLM_MODEL
+        options = sampling_options(options)
+        key, cached = llm_cache.lookup("generate", model, prompt, None, options)
+        if cached is not None:
+            return cached
+        payload = {"model": model, "prompt": prompt, "stream": False,
+                   "keep_alive": LLM_KEEP_ALIVE, "options": options}
+        data = await self.post("/api/generate", payload, timeout_s)
+        text = (data.get("response") or "").strip()
+        llm_cache.set_if_valid(key, text, model, validate)
+        return text
+
+    async def warm(self, model: Optional[str] = None) -> bool:
+        """Load the model ahead of the first request (empty prompt = load only)."""
+        try:
+            await self.post("/api/generate", {"model": model or LLM_MODEL, "keep_alive": LLM_KEEP_ALIVE})
+            logging.info(f"LLM model {model or LLM_MODEL} warmed")
+            return True
+        except Exception as e:
+            logging.warning(f"LLM warm-up failed: {e}")
+            return False
+
+    async def aclose(self):
+        if self._client is not None:
+            try:
+                await self._client.aclose()
+            except Exception as e:
+                logging.warning(f"LLM client close failed: {e}")
+        self._client, self._loop = None, None
+
+
+llm_client = OllamaClient(scheduler=llm_scheduler)
+
+
+def run_from_thread(fn: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+    """
+    Run an llm_client coroutine function from a sync endpoint, on the app's
+    event loop (where the pooled client and the scheduler live), and wait for it.
+    """
+    return from_thread.run(functools.partial(fn, *args, **kwargs))
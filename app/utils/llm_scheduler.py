@@ -0,0 +1,233 @@
+# app/utils/llm_scheduler.py
+"""
+Admission control and priority scheduling for LLM calls.
+
+The model server runs one or two generations at a time. Sending it more
+only makes every request slower together. Every Ollama call therefore
+goes through one scheduler: the async client (app.utils.llm_client) and
+the sync helpers in app.utils.helper alike.
+
+  * bounded concurrency: at most LLM_MAX_CONCURRENCY calls in flight
+  * priority queue: waiters are served lowest priority value first, FIFO
+    within a priority, so interactive requests overtake batch and
+    precompute work
+  * fast rejection: if LLM_QUEUE_MAX callers are already queued, a new one
+    is refused immediately with LLMOverloaded
+  * queue-time limit: a waiter that isn't admitted within its priority's
+    limit gets LLMOverloaded too
+
+Callers treat LLMOverloaded as "no model this time". The itinerary
+planners fall back to their deterministic day-cluster plan instead of
+queueing behind a burst.
+
+Priority comes from the `llm_priority` context variable (default
+interactive). Background work runs under `use_priority(PRIORITY_BATCH)`.
+asyncio tasks inherit the value they were created with.
+
+The scheduler is thread-safe: async waiters are woken via their loop,
+sync waiters via a threading.Event.
+
+Config (env):
+    LLM_MAX_CONCURRENCY             calls in flight (default 2)
+    LLM_QUEUE_MAX                   queued callers before rejecting (default 16)
+    LLM_QUEUE_TIMEOUT_S             max queue wait, interactive (default 20)
+    LLM_QUEUE_TIMEOUT_BATCH_S       max queue wait, batch (default 300)
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import os
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, Optional
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "2"))
+LLM_QUEUE_MAX = int(os.getenv("LLM_QUEUE_MAX", "16"))
+LLM_QUEUE_TIMEOUT_S = float(os.getenv("LLM_QUEUE_TIMEOUT_S", "20"))
+LLM_QUEUE_TIMEOUT_BATCH_S = float(os.getenv("LLM_QUEUE_TIMEOUT_BATCH_S", "300"))
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BATCH: "batch"}
+
+llm_priority: contextvars.ContextVar = contextvars.ContextVar("llm_priority", default=PRIORITY_INTERACTIVE)
+
+
+@contextmanager
+def use_priority(priority: int):
+    token = llm_priority.set(priority)
+    try:
+        yield
+    finally:
+        llm_priority.reset(token)
+
+
+class LLMOverloaded(Exception):
+    """The LLM queue is too deep, or the wait for a slot ran past its limit."""
+
+
+class _Waiter:
+    __slots__ = ("priority", "granted", "abandoned", "_wake")
+
+    def __init__(self, priority: int, wake):
+        self.priority = priority
+        self.granted = False
+        self.abandoned = False
+        self._wake = wake
+
+
+class LLMScheduler:
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, queue_max: int = LLM_QUEUE_MAX,
+                 queue_timeout_s: Optional[Dict[int, float]] = None):
+        self.max_concurrency = max_concurrency
+        self.queue_max = queue_max
+        self.queue_timeout_s = queue_timeout_s or {
+            PRIORITY_INTERACTIVE: LLM_QUEUE_TIMEOUT_S, PRIORITY_BATCH: LLM_QUEUE_TIMEOUT_BATCH_S}
+        self._lock = threading.Lock()
+        self._heap = []
+        self._seq = itertools.count()
+        self._waiting = 0
+        self.in_flight = 0
+        self._waits_ms = deque(maxlen=1000)
+        self.stats = {"admitted": 0, "rejected": 0, "timed_out": 0, "wait_ms_total": 0.0, "wait_ms_max": 0.0}
+
+    # --- core (call with self._lock held) ---
+
+    def _try_admit(self, waiter: _Waiter) -> bool:
+        """Admit now, enqueue, or raise LLMOverloaded. Returns True if admitted."""
+        if self.in_flight < self.max_concurrency and not self._waiting:
+            self.in_flight += 1
+            waiter.granted = True
+            return True
+        if self._waiting >= self.queue_max:
+            self.stats["rejected"] += 1
+            raise LLMOverloaded(f"LLM queue full ({self._waiting} waiting)")
+        heapq.heappush(self._heap, (waiter.priority, next(self._seq), waiter))
+        self._waiting += 1
+        return False
+
+    def _release_locked(self):
+        while self._heap:
+            _, _, waiter = heapq.heappop(self._heap)
+            if waiter.abandoned:
+                continue
+            self._waiting -= 1
+            waiter.granted = True  # the slot passes straight to the next waiter
+            waiter._wake()
+            return
+        self.in_flight -= 1
+
+    def _abandon_locked(self, waiter: _Waiter) -> bool:
+        """Give up waiting. Returns False if the slot was granted meanwhile (caller then owns it)."""
+        if waiter.granted:
+            return False
+        waiter.abandoned = True
+        self._waiting -= 1
+        return True
+
+    def _timeout_for(self, priority: int, max_wait_s: Optional[float]) -> float:
+        if max_wait_s is not None:
+            return max_wait_s
+        return self.queue_timeout_s.get(priority, max(self.queue_timeout_s.values()))
+
+    def _admitted(self, waited_s: float):
+        waited_ms = waited_s * 1000
+        self.stats["admitted"] += 1
+        self.stats["wait_ms_total"] += waited_ms
+        self.stats["wait_ms_max"] = max(self.stats["wait_ms_max"], waited_ms)
+        self._waits_ms.append(waited_ms)
+
+    def release(self):
+        with self._lock:
+            self._release_locked()
+
+    # --- async ---
+
+    @asynccontextmanager
+    async def slot(self, priority: Optional[int] = None, max_wait_s: Optional[float] = None):
+        """Hold one LLM slot for the block. Raises LLMOverloaded instead of queueing forever."""
+        priority = llm_priority.get() if priority is None else priority
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        waiter = _Waiter(priority, lambda: loop.call_soon_threadsafe(
+            lambda: fut.done() or fut.set_result(None)))
+        started = time.monotonic()
+        with self._lock:
+            admitted = self._try_admit(waiter)
+        if not admitted:
+            timeout = self._timeout_for(priority, max_wait_s)
+            try:
+                await asyncio.wait_for(asyncio.shield(fut), timeout=timeout)
+            except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+                with self._lock:
+                    gave_up = self._abandon_locked(waiter)
+                    if gave_up and isinstance(e, asyncio.TimeoutError):
+                        self.stats["timed_out"] += 1
+                if not gave_up:
+                    self.release()  # granted in the same instant; hand it on
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+                raise LLMOverloaded(f"no LLM slot within {timeout}s") from None
+        with self._lock:
+            self._admitted(time.monotonic() - started)
+        try:
+            yield
+        finally:
+            self.release()
+
+    # --- sync (threadpool callers) ---
+
+    @contextmanager
+    def slot_sync(self, priority: Optional[int] = None, max_wait_s: Optional[float] = None):
+        priority = llm_priority.get() if priority is None else priority
+        event = threading.Event()
+        waiter = _Waiter(priority, event.set)
+        started = time.monotonic()
+        with self._lock:
+            admitted = self._try_admit(waiter)
+        if not admitted:
+            timeout = self._timeout_for(priority, max_wait_s)
+            if not event.wait(timeout):
+                with self._lock:
+                    gave_up = self._abandon_locked(waiter)
+                    if gave_up:
+                        self.stats["timed_out"] += 1
+                if gave_up:
+                    raise LLMOverloaded(f"no LLM slot within {timeout}s")
+        with self._lock:
+            self._admitted(time.monotonic() - started)
+        try:
+            yield
+        finally:
+            self.release()
+
+    # --- metrics ---
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            waits = sorted(self._waits_ms)
+            by_priority: Dict[str, int] = {}
+            for prio, _, w in self._heap:
+                if not w.abandoned:
+                    name = PRIORITY_NAMES.get(prio, str(prio))
+                    by_priority[name] = by_priority.get(name, 0) + 1
+
+            def pct(q):
+                return round(waits[min(len(waits) - 1, int(q * len(waits)))], 1) if waits else 0.0
+
+            return {
+                "max_concurrency": self.max_concurrency,
+                "queue_max": self.queue_max,
+                "in_flight": self.in_flight,
+                "queue_depth": self._waiting,
+                "queue_depth_by_priority": by_priority,
+                **self.stats,
+                "wait_ms_p50": pct(0.5),
+                "wait_ms_p95": pct(0.95),
+            }
+
+
+llm_scheduler = LLMScheduler()
@@ -0,0 +1,157 @@
+# app/utils/metrics.py
+"""
+Request, stage and span latency metrics in the Prometheus text format.
+
+TimingMiddleware opens an app.utils.timing collector for every HTTP request.
+When the request finishes it records:
+  http_request_duration_seconds{route, method, status}   whole request
+  request_stage_duration_seconds{route, stage}           each lap() stage
+  request_span_duration_seconds{route, span}             each span()
+`route` is the matched path template (/itinerary/generate_itinerary1, not
+the concrete URL), or "unmatched", so label cardinality stays bounded.
+
+The response also carries a Server-Timing header with the same numbers for
+that one request (stages, spans, total), which browser dev tools display.
+It is written when the response starts, so a streaming response (SSE)
+reports only the work done before its first byte. The histograms use the
+full duration.
+
+GET /metrics (app/main.py) renders every histogram plus gauges registered
+with register_gauge (LLM queue depth and in-flight calls). No client library
+is needed: histograms are fixed-bucket counters behind one lock.
+
+Config (env):
+    TIMING_ENABLED  1/0 (default 1). With 0 the middleware isn't installed,
+                    so lap()/span() find no collector and cost one
+                    context-variable lookup.
+"""
+import bisect
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, List, Sequence, Tuple
+
+from starlette.datastructures import MutableHeaders
+
+from app.utils.timing import StageTimings, collect_timings
+
+TIMING_ENABLED = os.getenv("TIMING_ENABLED", "1") == "1"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+_TOKEN_RE = re.compile(r"[^A-Za-z0-9_-]")
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str],
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, *labels: str):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {k: (list(v[0]), v[1], v[2]) for k, v in self._series.items()}
+        for labels, (counts, total, n) in sorted(series.items()):
+            base = ",".join(f'{k}="{_escape(v)}"' for k, v in zip(self.label_names, labels))
+            sep = "," if base else ""
+            cumulative = 0
+            for le, c in zip(self.buckets + (float("inf"),), counts):
+                cumulative += c
+                le_s = "+Inf" if le == float("inf") else f"{le:g}"
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{le_s}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{base}}} {total:.6f}")
+            lines.append(f"{self.name}_count{{{base}}} {n}")
+        return lines
+
+
+request_seconds = Histogram("http_request_duration_seconds", "HTTP request latency.",
+                            ("route", "method", "status"))
+stage_seconds = Histogram("request_stage_duration_seconds", "Time per pipeline stage (lap) within a request.",
+                          ("route", "stage"))
+span_seconds = Histogram("request_span_duration_seconds", "Time per named span within a request.",
+                         ("route", "span"))
+HISTOGRAMS = [request_seconds, stage_seconds, span_seconds]
+
+_gauges: List[Tuple[str, str, Callable[[], float]]] = []
+
+
+def register_gauge(name: str, help_text: str, fn: Callable[[], float]):
+    """A gauge read when /metrics is scraped."""
+    _gauges.append((name, help_text, fn))
+
+
+def render_metrics() -> str:
+    lines: List[str] = []
+    for h in HISTOGRAMS:
+        lines += h.render()
+    for name, help_text, fn in _gauges:
+        try:
+            value = float(fn())
+        except Exception:
+            continue
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {value:g}"]
+    return "\n".join(lines) + "\n"
+
+
+def server_timing(timings: StageTimings) -> str:
+    parts = [f"{_TOKEN_RE.sub('_', k)};dur={v:.1f}" for k, v in timings.stages.items()]
+    parts += [f"{_TOKEN_RE.sub('_', k)};dur={v:.1f}" for k, v in timings.spans.items()]
+    parts.append(f"total;dur={timings.total_ms():.1f}")
+    return ", ".join(parts)
+
+
+def _route_template(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class TimingMiddleware:
+    """Pure ASGI, so it doesn't wrap the app in extra tasks or buffer streaming bodies."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+        started = time.perf_counter()
+        with collect_timings() as timings:
+            async def send_with_timing(message):
+                nonlocal status
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    MutableHeaders(scope=message).append("Server-Timing", server_timing(timings))
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_timing)
+            finally:
+                route = _route_template(scope)
+                request_seconds.observe(time.perf_counter() - started, route, scope["method"], str(status))
+                for stage, ms in timings.stages.items():
+                    stage_seconds.observe(ms / 1000, route, stage)
+                for name, ms in timings.spans.items():
+                    span_seconds.observe(ms / 1000, route, name)
@@ -0,0 +1,165 @@
+# app/utils/prompt_budget.py
+"""
+Prompt token budget for the itinerary planners.
+
+Prompt size is bounded by two things:
+  * the model's context window, minus room for the answer
+  * a prefill-time target: prompt tokens x measured ms per prompt token
+
+The smaller of the two is the token limit. The instructions and schema
+take a roughly fixed share (PROMPT_FIXED_TOKENS). The rest goes to
+candidates, ranked by the near/mid/far tiers the planners already use:
+  near  <= 30 km   by distance, then rating, then visit time
+  mid   <= 80 km   same
+  far   <= the out-of-city cap, by rating, then distance
+The tiers are interleaved 3:2:2, the old 18/12/12 split, so any cut-off
+keeps the same mix. plan_candidates takes the longest prefix of that ranking
+that fits. Quantity comes before prose: descriptions are shortened
+(full -> half -> none) before min_candidates would be given up.
+
+The returned budget dict is what the planners record per run, in
+auto_parameters and on ItineraryRequest.prompt_budget_json.
+
+Config (env):
+    LLM_CONTEXT_TOKENS          model context window (default 8192, Ollama's num_ctx)
+    LLM_RESERVED_OUTPUT_TOKENS  kept free for the answer (default 1536)
+    LLM_PREFILL_TARGET_MS       prefill time to aim for (default 3000)
+    LLM_PREFILL_MS_PER_TOKEN    measured prefill speed (default 0.5)
+    PROMPT_FIXED_TOKENS         instructions + schema allowance (default 800)
+"""
+import os
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from app.utils.helper import OUT_OF_CITY_ONE_WAY_KM_MAX
+from app.utils.prompt_encoding import PROMPT_DESCRIPTION_CHARS, encode_candidates, estimate_tokens
+
+LLM_CONTEXT_TOKENS = int(os.getenv("LLM_CONTEXT_TOKENS", "8192"))
+LLM_RESERVED_OUTPUT_TOKENS = int(os.getenv("LLM_RESERVED_OUTPUT_TOKENS", "1536"))
+LLM_PREFILL_TARGET_MS = float(os.getenv("LLM_PREFILL_TARGET_MS", "3000"))
+LLM_PREFILL_MS_PER_TOKEN = float(os.getenv("LLM_PREFILL_MS_PER_TOKEN", "0.5"))
+PROMPT_FIXED_TOKENS = int(os.getenv("PROMPT_FIXED_TOKENS", "800"))
+
+NEAR_KM = 30.0
+MID_KM = 80.0
+TIER_WEIGHTS = (("near", 3), ("mid", 2), ("far", 2))
+
+
+def rank_by_tier(
+    rows: Sequence[Dict[str, Any]],
+    distance_key: str,
+    rating_key: str = "rating",
+    visit_key: Optional[str] = None,
+    far_max_km: float = OUT_OF_CITY_ONE_WAY_KM_MAX,
+) -> List[Dict[str, Any]]:
+    """
+    Rows ranked for inclusion: tiers interleaved 3:2:2, each tier in its
+    usual order. Rows beyond far_max_km are dropped. Each row is tagged with
+    its tier in "_tier".
+    """
+    def visit(r):
+        return (r.get(visit_key) or 0) if visit_key else 0
+
+    tiers = {"near": [], "mid": [], "far": []}
+    for r in rows:
+        km = float(r.get(distance_key) or 0.0)
+        tier = "near" if km <= NEAR_KM else "mid" if km <= MID_KM else "far" if km <= far_max_km else None
+        if tier:
+            tiers[tier].append(r)
+    for name in ("near", "mid"):
+        tiers[name].sort(key=lambda r: (r.get(distance_key) or 0, -(r.get(rating_key) or 0), visit(r)))
+    tiers["far"].sort(key=lambda r: (-(r.get(rating_key) or 0), r.get(distance_key) or 0))
+
+    ranked, pos = [], {name: 0 for name in tiers}
+    while any(pos[name] < len(tiers[name]) for name in tiers):
+        for name, weight in TIER_WEIGHTS:
+            take = tiers[name][pos[name]:pos[name] + weight]
+            pos[name] += len(take)
+            ranked.extend({**r, "_tier": name} for r in take)
+    return ranked
+
+
+def _fits(rows, columns, id_key, chars, limit) -> int:
+    """Longest prefix of rows whose encoded block is within `limit` tokens (binary search)."""
+    lo, hi = 0, len(rows)
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        block, _ = encode_candidates(rows[:mid], columns, id_key=id_key, description_chars=chars)
+        if estimate_tokens(block) <= limit:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def plan_candidates(
+    ranked: Sequence[Dict[str, Any]],
+    columns: Sequence[str],
+    min_candidates: int,
+    max_candidates: Optional[int] = None,
+    id_key: Optional[str] = "place_id",
+    description_chars: int = PROMPT_DESCRIPTION_CHARS,
+    context_tokens: int = LLM_CONTEXT_TOKENS,
+    reserved_output_tokens: int = LLM_RESERVED_OUTPUT_TOKENS,
+    target_prefill_ms: float = LLM_PREFILL_TARGET_MS,
+    prefill_ms_per_token: float = LLM_PREFILL_MS_PER_TOKEN,
+    fixed_tokens: int = PROMPT_FIXED_TOKENS,
+    placeholders: Optional[Dict[str, Any]] = None,
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Choose how many of `ranked` (from rank_by_tier) go into the prompt and
+    how much description text they carry. Returns (rows, budget). The
+    selection is regrouped near, mid, far for the prompt. Encode the rows
+    with description_chars=budget["description_chars"].
+
+    `placeholders` gives a stand-in value for columns that are only filled in
+    after selection (day_group, from cluster_into_days), so the budget counts
+    them; use the widest value the column can take. The returned rows don't carry it.
+    """
+    pool = list(ranked[:max_candidates] if max_candidates else ranked)
+    measured = [{**placeholders, **r} for r in pool] if placeholders else pool
+    context_limit = context_tokens - reserved_output_tokens
+    prefill_limit = int(target_prefill_ms / prefill_ms_per_token) if prefill_ms_per_token > 0 else context_limit
+    token_limit = min(context_limit, prefill_limit)
+    candidate_limit = max(0, token_limit - fixed_tokens)
+    need = min(len(pool), min_candidates)
+
+    ladder = [description_chars, description_chars // 2, 0] if "description" in columns else [description_chars]
+    for chars in dict.fromkeys(ladder):
+        n = _fits(measured, columns, id_key, chars, candidate_limit)
+        if n >= need:
+            break
+    over_budget = n < need
+    n = max(n, need)  # a plan needs places; go over budget rather than under-fill days
+
+    order = {name: i for i, (name, _) in enumerate(TIER_WEIGHTS)}
+    picked = sorted(range(n), key=lambda i: order.get(pool[i].get("_tier"), len(order)))
+    chosen = [pool[i] for i in picked]
+    block, _ = encode_candidates([measured[i] for i in picked], columns, id_key=id_key, description_chars=chars)
+    candidate_tokens = estimate_tokens(block)
+    tiers = {name: 0 for name, _ in TIER_WEIGHTS}
+    for r in chosen:
+        if r.get("_tier") in tiers:
+            tiers[r["_tier"]] += 1
+
+    budget = {
+        "context_tokens": context_tokens,
+        "reserved_output_tokens": reserved_output_tokens,
+        "target_prefill_ms": target_prefill_ms,
+        "prefill_ms_per_token": prefill_ms_per_token,
+        "token_limit": token_limit,
+        "limited_by": "prefill" if prefill_limit < context_limit else "context",
+        "candidates_available": len(ranked),
+        "candidates_included": n,
+        "tiers": tiers,
+        "description_chars": chars if "description" in columns else None,
+        "candidate_tokens": candidate_tokens,
+        "over_budget": over_budget,
+    }
+    return [{k: v for k, v in r.items() if k != "_tier"} for r in chosen], budget
+
+
+def finish_budget(budget: Dict[str, Any], prompt: str) -> Dict[str, Any]:
+    """Record the size of the prompt actually built from the plan."""
+    budget["prompt_tokens"] = estimate_tokens(prompt)
+    budget["est_prefill_ms"] = round(budget["prompt_tokens"] * budget["prefill_ms_per_token"], 1)
+    return budget
@@ -0,0 +1,159 @@
+# app/utils/prompt_encoding.py
+"""
+Token-lean prompt encoding for the itinerary planners.
+
+Most of an itinerary call's latency is prompt prefill, and most of the
+prompt is the candidate list. Pretty-printed JSON repeats every key on
+every row and spends tokens on indentation. Full descriptions often cost
+more than everything else combined. This module packs candidates as a
+pipe-separated table instead:
+
+    id|name|visit_minutes|rating|day_group
+    1|Sabarmati Ashram|90|4.6|1
+    2|Kankaria Lake|120|4.4|2
+
+  * one header line names the columns, so rows carry values only
+  * place_ids are replaced by short numeric aliases (`id`); the model
+    answers with those, and decode_place_ids maps them back
+  * descriptions are cut to PROMPT_DESCRIPTION_CHARS at a word boundary
+  * schemas are dumped without whitespace
+
+estimate_tokens gives a rough llama-style token count (no tokenizer
+dependency) for comparing encodings and logging prompt sizes.
+
+Config (env):
+    PROMPT_COMPACT              1/0 (default 1); 0 restores the JSON encoding
+    PROMPT_DESCRIPTION_CHARS    description cap in compact mode (default 160, 0 = drop)
+"""
+import json
+import math
+import os
+import re
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+PROMPT_COMPACT = os.getenv("PROMPT_COMPACT", "1") == "1"
+PROMPT_DESCRIPTION_CHARS = int(os.getenv("PROMPT_DESCRIPTION_CHARS", "160"))
+
+_TOKEN_RE = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough BPE token count: words cost ~1 token per 4 letters, digit runs
+    ~1 per 3 digits, every punctuation mark 1. Within ~15% of llama3's
+    tokenizer on our prompts, which is enough to compare encodings.
+    """
+    total = 0
+    for piece in _TOKEN_RE.findall(text):
+        if piece[0].isalpha():
+            total += math.ceil(len(piece) / 4)
+        elif piece[0].isdigit():
+            total += math.ceil(len(piece) / 3)
+        else:
+            total += 1
+    return total
+
+
+def compact_json(obj: Any) -> str:
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def truncate_text(text: Optional[str], max_chars: int) -> str:
+    text = " ".join(str(text or "").split())
+    if max_chars <= 0:
+        return ""
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars].rsplit(" ", 1)[0]
+    return cut.rstrip(",.;:") + "…"
+
+
+def _cell(v: Any) -> str:
+    if v is None:
+        return ""
+    if isinstance(v, bool):
+        return "1" if v else "0"
+    if isinstance(v, float):
+        return f"{round(v, 4):g}"
+    if isinstance(v, (dict, list)):
+        return compact_json(v) if v else ""
+    # the table has one row per line and | between cells
+    return " ".join(str(v).split()).replace("|", "/")
+
+
+def encode_table(
+    rows: Iterable[Dict[str, Any]],
+    columns: Sequence[str],
+    id_key: Optional[str] = "place_id",
+    description_chars: int = PROMPT_DESCRIPTION_CHARS,
+) -> Tuple[str, Dict[str, str]]:
+    """
+    Returns (table, aliases). With `id_key`, the first column is `id`: a
+    1-based alias for row[id_key], and aliases maps alias -> original id.
+    """
+    header = (["id"] if id_key else []) + list(columns)
+    lines = ["|".join(header)]
+    aliases: Dict[str, str] = {}
+    for i, row in enumerate(rows, start=1):
+        cells = []
+        if id_key:
+            aliases[str(i)] = row[id_key]
+            cells.append(str(i))
+        for col in columns:
+            v = row.get(col)
+            if col == "description":
+                v = truncate_text(v, description_chars)
+            cells.append(_cell(v))
+        lines.append("|".join(cells))
+    return "\n".join(lines), aliases
+
+
+def encode_candidates(
+    rows: List[Dict[str, Any]],
+    columns: Sequence[str],
+    id_key: Optional[str] = "place_id",
+    compact: bool = PROMPT_COMPACT,
+    description_chars: Optional[int] = None,
+    indent: Optional[int] = 2,
+) -> Tuple[str, Dict[str, str]]:
+    """
+    Candidate block for a prompt plus the alias map for decode_place_ids.
+    compact=False gives the JSON array the prompts used before (id_key
+    and `columns` as keys, no aliases), so callers can switch per request.
+    description_chars defaults to PROMPT_DESCRIPTION_CHARS in compact mode
+    and to untruncated in JSON mode; a prompt budget sets it explicitly.
+    """
+    if compact:
+        chars = PROMPT_DESCRIPTION_CHARS if description_chars is None else description_chars
+        return encode_table(rows, columns, id_key=id_key, description_chars=chars)
+    keys = ([id_key] if id_key else []) + [c for c in columns if c != id_key]
+    items = [{k: r.get(k) for k in keys} for r in rows]
+    if description_chars is not None and "description" in keys:
+        for it in items:
+            it["description"] = truncate_text(it["description"], description_chars)
+    return json.dumps(items, indent=indent, ensure_ascii=False), {}
+
+
+def encode_schema(schema: dict, compact: bool = PROMPT_COMPACT, indent: Optional[int] = 2) -> str:
+    return compact_json(schema) if compact else json.dumps(schema, indent=indent)
+
+
+def candidates_note(aliases: Dict[str, str], key: str = "place_id") -> str:
+    """Prompt line telling the model how to refer to places (empty in JSON mode)."""
+    if not aliases:
+        return ""
+    return f"Candidates are a table: first line is the column names, then one place per line. Use the id column value as {key}."
+
+
+def decode_place_ids(itinerary: Any, aliases: Dict[str, str], key: str = "place_id") -> Any:
+    """Map alias ids in {"Day N": [{key: alias, ...}]} back to real place_ids, in place."""
+    if not aliases or not isinstance(itinerary, dict):
+        return itinerary
+    for items in itinerary.values():
+        if not isinstance(items, list):
+            continue
+        for it in items:
+            if isinstance(it, dict) and it.get(key) is not None:
+                alias = str(it[key]).strip().lstrip("#")
+                it[key] = aliases.get(alias, it[key])
+    return itinerary
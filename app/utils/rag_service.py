@@ -1,47 +1,316 @@
+# app/utils/rag_service.py
+"""
+Persisted FAISS index over place embeddings, for retrieval-augmented prompts.
+
+The index is built from places.embedding, the vectors written by
+create_place and the embedding backfill, so building it encodes nothing.
+It is an IndexIDMap2 over IndexFlatIP on L2-normalised vectors: inner
+product = cosine similarity, and FAISS ids are places.id, so results map
+straight back to rows. search_places() returns structured place records
+(id, place_id, name, city, ..., score), not formatted strings.
+
+On disk (RAG_INDEX_PATH):
+    places.index        faiss.write_index output, loaded memory-mapped at
+                        startup, so workers share the pages
+    places.idmap.npy    (id, embedding_hash) per indexed vector
+    places.meta.json    model, dim, count, saved_at
+Files are written to a temp name and renamed, so readers never see half a
+file.
+
+Keeping it current:
+  - create_place / delete_place and the embedding backfill call upsert /
+    remove while the index is loaded. The first change to a memory-mapped
+    index reads it into memory, since mapped pages are read-only.
+  - load() and every RAG_INDEX_RECONCILE_S, the id map is compared with
+    (id, embedding_hash) in the table. Added, changed and removed places are
+    applied incrementally. So changes made by other workers, or after the
+    last save, are never lost; they are picked up late.
+  - A missing index, or one saved with a different model or dim, is
+    rebuilt from the table.
+scripts/build_rag_index.py builds and saves from the command line.
+
+faiss is imported on first use. Without it the sync hooks are no-ops and
+search_places raises ImportError.
+
+Config (env):
+    RAG_INDEX_PATH              directory for the files above (default Data/faiss under the repo root)
+    RAG_INDEX_MMAP              1/0, memory-map the saved index when loading (default 1)
+    RAG_INDEX_RECONCILE_S       seconds between reconciliations with the table (default 300)
+    RAG_INDEX_LOAD_ON_STARTUP   1/0, load (or build) in the background at startup (default 1)
+"""
 import json
-import faiss
+import logging
+import os
+import threading
+import time
 from pathlib import Path
-from sentence_transformers import SentenceTransformer
-
-DATA_FILE = Path("../../Data/places.json")
-
-# 1. Load model (CPU)
-embedder = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
-
-# 2. Load dataset
-if DATA_FILE.exists():
-    with open(DATA_FILE, "r", encoding="utf-8") as f:
-        data = json.load(f)
-else:
-    data = []
-
-# 3. Convert to plain docs
-documents = []
-for place in data:
-    text = (
-        f"{place['name']} in {place['city']}, {place['state']}. "
-        f"Type: {place['type']}. {place['description']} "
-        f"Best months: {', '.join(place.get('best_months', []))}. "
-        f"Entry fee: {place.get('entry_fee', {})}. "
-        f"Famous for: {', '.join(place.get('famous_for', []))}."
-    )
-    documents.append(text)
-
-# 4. Build embeddings
-if documents:
-    embeddings = embedder.encode(documents, convert_to_numpy=True, show_progress_bar=True)
-    dim = embeddings.shape[1]
-    index = faiss.IndexFlatL2(dim)
-    index.add(embeddings)
-    id_map = {i: doc for i, doc in enumerate(documents)}
-else:
-    index = None
-    id_map = {}
-
-def search_places(query: str, top_k: int = 5):
-    """Search relevant places from FAISS index"""
-    if not index:
-        return []
-    q_vec = embedder.encode([query], convert_to_numpy=True)
-    D, I = index.search(q_vec, top_k)
-    return [id_map[i] for i in I[0]]
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import bindparam, select, text
+from sqlalchemy.orm import Session
+
+from app.api.places.models import Places
+from app.database.db import SessionLocal
+from app.utils.embeddings import EMBEDDING_DIM, EMBEDDING_MODEL, embedding_service
+from app.utils.timing import span
+
+ROOT = Path(__file__).resolve().parents[2]
+RAG_INDEX_PATH = Path(os.getenv("RAG_INDEX_PATH", str(ROOT / "Data" / "faiss")))
+RAG_INDEX_MMAP = os.getenv("RAG_INDEX_MMAP", "1") == "1"
+RAG_INDEX_RECONCILE_S = float(os.getenv("RAG_INDEX_RECONCILE_S", "300"))
+RAG_INDEX_LOAD_ON_STARTUP = os.getenv("RAG_INDEX_LOAD_ON_STARTUP", "1") == "1"
+
+PAGE = 10_000
+IDMAP_DTYPE = np.dtype([("id", "<i8"), ("hash", "S64")])
+RECORD_COLUMNS = ("id", "place_id", "name", "city", "state", "country", "type", "tags", "suitable_for",
+                  "famous_for", "best_months", "entry_fee", "rating", "lat", "lng", "avg_visit_mins", "description")
+_RECORDS_BY_ID_SQL = text(f"SELECT {', '.join(RECORD_COLUMNS)} FROM places WHERE id IN :ids").bindparams(
+    bindparam("ids", expanding=True)
+)
+
+
+def _faiss():
+    import faiss
+    return faiss
+
+
+def _normalized(vectors) -> np.ndarray:
+    m = np.asarray(vectors, dtype="float32").reshape(-1, EMBEDDING_DIM)
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    return m / np.maximum(norms, 1e-12)
+
+
+def _hash_key(h: Optional[str]) -> bytes:
+    return (h or "").encode("ascii")
+
+
+class PlacesVectorIndex:
+    def __init__(self, path: Path = RAG_INDEX_PATH, mmap: bool = RAG_INDEX_MMAP,
+                 reconcile_s: float = RAG_INDEX_RECONCILE_S):
+        self.path = Path(path)
+        self.mmap = mmap
+        self.reconcile_s = reconcile_s
+        self._index = None
+        self._hashes: Dict[int, bytes] = {}  # id -> embedding_hash of the indexed vector
+        self._mmapped = False
+        self._dirty = False
+        self._reconciled_at: Optional[float] = None
+        self._lock = threading.RLock()
+
+    @property
+    def index_file(self) -> Path:
+        return self.path / "places.index"
+
+    @property
+    def idmap_file(self) -> Path:
+        return self.path / "places.idmap.npy"
+
+    @property
+    def meta_file(self) -> Path:
+        return self.path / "places.meta.json"
+
+    @property
+    def loaded(self) -> bool:
+        return self._index is not None
+
+    def __len__(self):
+        return len(self._hashes)
+
+    # ---------- build / persist ----------
+    def _stream(self, db: Session, ids: Optional[Sequence[int]] = None) -> Iterable[Tuple[List[int], np.ndarray, List[bytes]]]:
+        """(ids, normalised vectors, hashes) pages of active places that have a vector."""
+        q = select(Places.id, Places.embedding, Places.embedding_hash).where(
+            Places.is_active.isnot(False), Places.embedding.isnot(None))
+        if ids is not None:
+            for start in range(0, len(ids), PAGE):
+                rows = db.execute(q.where(Places.id.in_(ids[start:start + PAGE]))).all()
+                if rows:
+                    yield [r.id for r in rows], _normalized([r.embedding for r in rows]), [_hash_key(r.embedding_hash) for r in rows]
+            return
+        cursor = 0
+        while True:
+            rows = db.execute(q.where(Places.id > cursor).order_by(Places.id).limit(PAGE)).all()
+            if not rows:
+                return
+            cursor = rows[-1].id
+            yield [r.id for r in rows], _normalized([r.embedding for r in rows]), [_hash_key(r.embedding_hash) for r in rows]
+
+    def build(self, db: Session) -> int:
+        """Full rebuild from the places table, then save."""
+        faiss = _faiss()
+        t0 = time.perf_counter()
+        index = faiss.IndexIDMap2(faiss.IndexFlatIP(EMBEDDING_DIM))
+        hashes: Dict[int, bytes] = {}
+        for ids, vectors, hs in self._stream(db):
+            index.add_with_ids(vectors, np.asarray(ids, dtype="int64"))
+            hashes.update(zip(ids, hs))
+        with self._lock:
+            self._index, self._hashes, self._mmapped = index, hashes, False
+            self._reconciled_at = time.monotonic()
+            self._dirty = True
+        logging.info(f"RAG index built with {len(hashes)} places in {(time.perf_counter() - t0) * 1000:.0f} ms")
+        self.save()
+        return len(hashes)
+
+    def save(self):
+        """Write index, id map and metadata (atomic renames)."""
+        faiss = _faiss()
+        with self._lock:
+            if self._index is None:
+                return
+            self.path.mkdir(parents=True, exist_ok=True)
+            idmap = np.array(list(self._hashes.items()), dtype=IDMAP_DTYPE)
+            faiss.write_index(self._index, str(self.index_file) + ".tmp")
+            with open(str(self.idmap_file) + ".tmp", "wb") as f:
+                np.save(f, idmap)
+            meta = {"model": EMBEDDING_MODEL, "dim": EMBEDDING_DIM, "count": len(idmap),
+                    "saved_at": time.strftime("%Y-%m-%dT%H:%M:%S%z")}
+            with open(str(self.meta_file) + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+            for p in (self.index_file, self.idmap_file, self.meta_file):
+                os.replace(str(p) + ".tmp", p)
+            self._dirty = False
+
+    def _read(self, mmap: bool):
+        faiss = _faiss()
+        if mmap:
+            # flat codes are mmap-able from faiss 1.9 (IO_FLAG_MMAP_IFC); older versions read them into memory
+            flag = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+            try:
+                return faiss.read_index(str(self.index_file), flag), True
+            except Exception as e:
+                logging.info(f"RAG index can't be memory-mapped here ({e}), reading it into memory")
+        return faiss.read_index(str(self.index_file)), False
+
+    def load(self, db: Optional[Session] = None) -> bool:
+        """
+        Load the saved index (memory-mapped) and reconcile it with the table;
+        build it instead when there is none or it was made with another model.
+        """
+        own = db is None
+        db = db or SessionLocal()
+        try:
+            meta = None
+            if self.index_file.exists() and self.idmap_file.exists() and self.meta_file.exists():
+                with open(self.meta_file, encoding="utf-8") as f:
+                    meta = json.load(f)
+            if not meta or meta.get("model") != EMBEDDING_MODEL or meta.get("dim") != EMBEDDING_DIM:
+                if meta:
+                    logging.warning(f"RAG index at {self.path} was built with {meta.get('model')}, rebuilding")
+                self.build(db)
+                return True
+            t0 = time.perf_counter()
+            index, mmapped = self._read(self.mmap)
+            idmap = np.load(self.idmap_file, mmap_mode="r" if self.mmap else None)
+            with self._lock:
+                self._index, self._mmapped = index, mmapped
+                self._hashes = dict(zip(idmap["id"].tolist(), idmap["hash"].tolist()))
+                self._dirty = False
+            logging.info(f"RAG index loaded with {len(self._hashes)} places in {(time.perf_counter() - t0) * 1000:.0f} ms"
+                         f"{' (mmap)' if mmapped else ''}")
+            self.reconcile(db)
+            return True
+        finally:
+            if own:
+                db.close()
+
+    def ensure_loaded(self, db: Session):
+        with self._lock:
+            loaded = self._index is not None
+            due = loaded and (time.monotonic() - (self._reconciled_at or 0)) >= self.reconcile_s
+        if not loaded:
+            self.load(db)
+        elif due:
+            self.reconcile(db)
+
+    # ---------- incremental updates ----------
+    def _writable(self):
+        """Mapped pages are read-only: the first change reads the index into memory."""
+        if self._mmapped:
+            self._index, self._mmapped = self._read(False)
+
+    def _apply(self, ids: Sequence[int], vectors: Optional[np.ndarray], hashes: Sequence[bytes]):
+        with self._lock:
+            if self._index is None:
+                return  # not loaded here; load() reconciles with the table
+            self._writable()
+            known = [pk for pk in ids if pk in self._hashes]
+            if known:
+                self._index.remove_ids(np.asarray(known, dtype="int64"))
+                for pk in known:
+                    self._hashes.pop(pk, None)
+            if vectors is not None and len(ids):
+                self._index.add_with_ids(vectors, np.asarray(ids, dtype="int64"))
+                self._hashes.update(zip(ids, hashes))
+            self._dirty = True
+
+    def upsert(self, pk: int, vector, embedding_hash: Optional[str] = None):
+        self._apply([pk], _normalized(vector), [_hash_key(embedding_hash)])
+
+    def upsert_many(self, ids: Sequence[int], vectors, hashes: Sequence[Optional[str]]):
+        if len(ids):
+            self._apply(list(ids), _normalized(vectors), [_hash_key(h) for h in hashes])
+
+    def remove(self, pk: int):
+        self._apply([pk], None, [])
+
+    def reconcile(self, db: Session) -> Dict[str, int]:
+        """Apply rows added, changed or removed in the table since the index was saved or built."""
+        t0 = time.perf_counter()
+        current = {r.id: _hash_key(r.embedding_hash) for r in db.execute(
+            select(Places.id, Places.embedding_hash).where(Places.is_active.isnot(False), Places.embedding.isnot(None)))}
+        with self._lock:
+            indexed = dict(self._hashes)
+        removed = [pk for pk in indexed if pk not in current]
+        changed = [pk for pk, h in current.items() if indexed.get(pk) != h]
+        if removed:
+            self._apply(removed, None, [])
+        for ids, vectors, hs in self._stream(db, changed):
+            self._apply(ids, vectors, hs)
+        with self._lock:
+            self._reconciled_at = time.monotonic()
+        if removed or changed:
+            logging.info(f"RAG index reconciled: {len(changed)} added/changed, {len(removed)} removed "
+                         f"in {(time.perf_counter() - t0) * 1000:.0f} ms")
+        return {"changed": len(changed), "removed": len(removed)}
+
+    def save_if_dirty(self):
+        if self._dirty:
+            self.save()
+
+    # ---------- queries ----------
+    def search(self, db: Session, query: str, top_k: int = 5) -> List[dict]:
+        """Place records most similar to `query`, best first, each with a cosine `score`."""
+        self.ensure_loaded(db)
+        q = _normalized(embedding_service.embed(query))
+        with span("rag_search"), self._lock:
+            if not self._hashes:
+                return []
+            scores, ids = self._index.search(q, min(top_k, len(self._hashes)))
+        hits = [(int(pk), float(s)) for pk, s in zip(ids[0], scores[0]) if pk != -1]
+        if not hits:
+            return []
+        rows = db.execute(_RECORDS_BY_ID_SQL, {"ids": [pk for pk, _ in hits]}).fetchall()
+        by_id = {r._mapping["id"]: dict(r._mapping) for r in rows}
+        records = []
+        for pk, score in hits:
+            row = by_id.get(pk)
+            if row is not None:
+                row["score"] = round(score, 4)
+                records.append(row)
+        return records
+
+
+places_vector_index = PlacesVectorIndex()
+
+
+def search_places(query: str, top_k: int = 5, db: Optional[Session] = None) -> List[dict]:
+    """Search relevant places from the FAISS index"""
+    if db is not None:
+        return places_vector_index.search(db, query, top_k)
+    db = SessionLocal()
+    try:
+        return places_vector_index.search(db, query, top_k)
+    finally:
+        db.close()
@@ -0,0 +1,94 @@
+# app/utils/result_cache.py
+"""
+In-process LRU + TTL cache and the itinerary result cache built on it.
+
+An itinerary is a pure function of the normalised request parameters and
+the candidate rows they retrieve. The key is therefore
+    (variant, city, days, suitable_for, trip_type, candidate fingerprint)
+where the fingerprint hashes every candidate's place_id and updated_at.
+Editing, adding or deactivating a place in range changes the fingerprint,
+so stale plans are never served and we never have to invalidate by hand.
+The TTL only bounds memory and staleness of things we don't fingerprint,
+such as prompt or planner tweaks across deploys.
+
+Config (env):
+    ITINERARY_CACHE_ENABLED     1/0 (default 1)
+    ITINERARY_CACHE_SIZE        max entries (default 512)
+    ITINERARY_CACHE_TTL_S       seconds (default 3600)
+"""
+import copy
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Iterable, Optional
+
+ITINERARY_CACHE_ENABLED = os.getenv("ITINERARY_CACHE_ENABLED", "1") == "1"
+ITINERARY_CACHE_SIZE = int(os.getenv("ITINERARY_CACHE_SIZE", "512"))
+ITINERARY_CACHE_TTL_S = float(os.getenv("ITINERARY_CACHE_TTL_S", "3600"))
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU with per-entry expiry. Values are deep-copied in and out."""
+
+    def __init__(self, maxsize: int = 512, ttl_s: float = 3600.0):
+        self.maxsize = maxsize
+        self.ttl_s = ttl_s
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "expired": 0}
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING:
+                self.stats["misses"] += 1
+                return default
+            expires, value = item
+            if expires < now:
+                del self._data[key]
+                self.stats["expired"] += 1
+                self.stats["misses"] += 1
+                return default
+            self._data.move_to_end(key)
+            self.stats["hits"] += 1
+        return copy.deepcopy(value)
+
+    def set(self, key: Hashable, value: Any, ttl_s: Optional[float] = None):
+        expires = time.monotonic() + (self.ttl_s if ttl_s is None else ttl_s)
+        value = copy.deepcopy(value)
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def _norm(v: Optional[str]) -> str:
+    return " ".join((v or "").strip().lower().split())
+
+
+def candidate_fingerprint(rows: Iterable[dict]) -> str:
+    """sha1 over sorted (place_id, updated_at) of the retrieved candidate rows."""
+    parts = sorted(f"{r.get('place_id')}@{r.get('updated_at') or ''}" for r in rows)
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def itinerary_cache_key(variant: str, city: str, days: int, suitable_for: Optional[str],
+                        trip_type: Optional[str], fingerprint: str) -> tuple:
+    return (variant, _norm(city), int(days), _norm(suitable_for), _norm(trip_type), fingerprint)
+
+
+itinerary_cache = TTLCache(maxsize=ITINERARY_CACHE_SIZE, ttl_s=ITINERARY_CACHE_TTL_S)
@@ -0,0 +1,172 @@
+# app/utils/route_optimizer.py
+"""
+Per-day route ordering: city centre -> stops -> city centre, minimising travel.
+
+Small days (<= EXACT_MAX_STOPS) are solved exactly with Held-Karp DP.
+Larger ones start from nearest-neighbour and improve with 2-opt and Or-opt
+until no move helps or the per-call time cap runs out.
+
+Costs come from TravelMatrix.submatrix(), i.e. the same minutes
+validate_and_repair_day charges against DAY_BUDGET_MIN.
+"""
+import time
+from typing import Dict, Hashable, List, Sequence
+
+from app.utils.travel_matrix import TravelMatrix
+
+EXACT_MAX_STOPS = 8
+DEFAULT_TIME_CAP_MS = 25.0
+
+
+def tour_minutes(dist: Sequence[Sequence[int]], order: Sequence[int]) -> int:
+    """Travel minutes for 0 -> order... -> 0 (indices into dist)."""
+    total, prev = 0, 0
+    for i in order:
+        total += dist[prev][i]
+        prev = i
+    return total + dist[prev][0]
+
+
+def route_minutes(matrix: TravelMatrix, pids: List[Hashable]) -> int:
+    """Travel minutes for city -> pids (in the given order) -> city."""
+    if not pids:
+        return 0
+    return tour_minutes(matrix.submatrix(list(pids)).tolist(), list(range(1, len(pids) + 1)))
+
+
+def _held_karp(dist, n: int) -> List[int]:
+    full = (1 << n) - 1
+    INF = float("inf")
+    # dp[mask][j]: cheapest path 0 -> ... -> j visiting exactly `mask` (bit j-1 = node j)
+    dp = [[INF] * (n + 1) for _ in range(1 << n)]
+    parent = [[0] * (n + 1) for _ in range(1 << n)]
+    for j in range(1, n + 1):
+        dp[1 << (j - 1)][j] = dist[0][j]
+    for mask in range(1, full + 1):
+        row = dp[mask]
+        for j in range(1, n + 1):
+            cost = row[j]
+            if cost == INF or not mask & (1 << (j - 1)):
+                continue
+            dj = dist[j]
+            for k in range(1, n + 1):
+                bit = 1 << (k - 1)
+                if mask & bit:
+                    continue
+                nxt = mask | bit
+                c = cost + dj[k]
+                if c < dp[nxt][k]:
+                    dp[nxt][k] = c
+                    parent[nxt][k] = j
+    last = min(range(1, n + 1), key=lambda j: dp[full][j] + dist[j][0])
+    order, mask = [], full
+    while last:
+        order.append(last)
+        prev = parent[mask][last]
+        mask &= ~(1 << (last - 1))
+        last = prev
+    return order[::-1]
+
+
+def _nearest_neighbour(dist, n: int) -> List[int]:
+    left = set(range(1, n + 1))
+    order, cur = [], 0
+    while left:
+        nxt = min(left, key=lambda k: dist[cur][k])
+        order.append(nxt)
+        left.remove(nxt)
+        cur = nxt
+    return order
+
+
+def _two_opt(dist, tour: List[int], deadline: float) -> bool:
+    """One improving pass over segment reversals; tour includes depot at both ends."""
+    improved = False
+    m = len(tour)
+    for i in range(1, m - 2):
+        if time.perf_counter() > deadline:
+            break
+        a, b = tour[i - 1], tour[i]
+        for j in range(i + 1, m - 1):
+            c, d = tour[j], tour[j + 1]
+            delta = dist[a][c] + dist[b][d] - dist[a][b] - dist[c][d]
+            if delta < 0:
+                tour[i:j + 1] = reversed(tour[i:j + 1])
+                b = tour[i]
+                improved = True
+    return improved
+
+
+def _or_opt(dist, tour: List[int], deadline: float) -> bool:
+    """Move segments of 1-3 stops to a cheaper position."""
+    improved = False
+    for seg_len in (1, 2, 3):
+        i = 1
+        while i + seg_len < len(tour):
+            if time.perf_counter() > deadline:
+                return improved
+            seg = tour[i:i + seg_len]
+            prev, nxt = tour[i - 1], tour[i + seg_len]
+            removed_gain = dist[prev][seg[0]] + dist[seg[-1]][nxt] - dist[prev][nxt]
+            rest = tour[:i] + tour[i + seg_len:]
+            best_delta, best_pos, best_rev = 0, None, False
+            for p in range(len(rest) - 1):
+                u, v = rest[p], rest[p + 1]
+                fwd = dist[u][seg[0]] + dist[seg[-1]][v] - dist[u][v]
+                rev = dist[u][seg[-1]] + dist[seg[0]][v] - dist[u][v]
+                for add, is_rev in ((fwd, False), (rev, True)):
+                    delta = add - removed_gain
+                    if delta < best_delta:
+                        best_delta, best_pos, best_rev = delta, p, is_rev
+            if best_pos is not None:
+                piece = seg[::-1] if best_rev else seg
+                tour[:] = rest[:best_pos + 1] + piece + rest[best_pos + 1:]
+                improved = True
+            else:
+                i += 1
+    return improved
+
+
+def optimize_route(matrix: TravelMatrix, pids: List[Hashable],
+                   time_cap_ms: float = DEFAULT_TIME_CAP_MS) -> Dict:
+    """
+    Reorder a day's stops to minimise total travel minutes (round trip from the
+    city centre). Returns
+        {"order": [...pids], "input_minutes", "optimized_minutes",
+         "minutes_saved", "method", "elapsed_ms"}
+    The input order is returned unchanged if nothing beats it.
+    """
+    started = time.perf_counter()
+    n = len(pids)
+    if n <= 1:
+        cost = route_minutes(matrix, pids)
+        return {"order": list(pids), "input_minutes": cost, "optimized_minutes": cost,
+                "minutes_saved": 0, "method": "trivial", "elapsed_ms": 0.0}
+
+    dist = matrix.submatrix(list(pids)).tolist()
+    identity = list(range(1, n + 1))
+    input_cost = tour_minutes(dist, identity)
+
+    if n <= EXACT_MAX_STOPS:
+        best, method = _held_karp(dist, n), "exact"
+    else:
+        deadline = started + time_cap_ms / 1000.0
+        tour = [0] + _nearest_neighbour(dist, n) + [0]
+        while time.perf_counter() < deadline:
+            changed = _two_opt(dist, tour, deadline)
+            changed = _or_opt(dist, tour, deadline) or changed
+            if not changed:
+                break
+        best, method = tour[1:-1], "2opt+oropt"
+
+    best_cost = tour_minutes(dist, best)
+    if best_cost >= input_cost:
+        best, best_cost = identity, input_cost
+    return {
+        "order": [pids[i - 1] for i in best],
+        "input_minutes": input_cost,
+        "optimized_minutes": best_cost,
+        "minutes_saved": input_cost - best_cost,
+        "method": method,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 3),
+    }
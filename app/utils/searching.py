@@ -1,26 +1,130 @@
+import os
+import re
 from sqlalchemy.orm import Query
-from sqlalchemy import or_
+from sqlalchemy import case, func, or_, select, text
+from sqlalchemy.orm import Session
 from typing import List, Optional
 
+# Keywords shorter than this fall back to ILIKE (tsquery prefixes of 1-2 letters match too much to rank)
+FTS_MIN_KEYWORD = int(os.getenv("FTS_MIN_KEYWORD", "3"))
+FTS_CONFIG = "simple"  # must match the to_tsvector(...) in the models' search_vector columns
+# pg_trgm word_similarity cut-off for mode="fuzzy" ("sabarmati asram" vs "Sabarmati Ashram" is ~0.8)
+FUZZY_THRESHOLD = float(os.getenv("FUZZY_THRESHOLD", "0.5"))
 
-def apply_searching(query: Query, model, search_fields: List[str], keyword: Optional[str]) -> Query:
+LEXICAL_SEARCH_MODES = ("auto", "ranked", "fuzzy", "ilike")
+SEARCH_MODES = LEXICAL_SEARCH_MODES + ("hybrid",)
+# for Query(..., pattern=...): "hybrid" only where the model has embeddings (places)
+SEARCH_MODE_PATTERN = "^(" + "|".join(LEXICAL_SEARCH_MODES) + ")$"
+HYBRID_SEARCH_MODE_PATTERN = "^(" + "|".join(SEARCH_MODES) + ")$"
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_has_pg_trgm: Optional[bool] = None
+
+
+def has_pg_trgm(db: Session) -> bool:
+    """Whether the pg_trgm extension is installed (checked once per process)."""
+    global _has_pg_trgm
+    if _has_pg_trgm is None:
+        _has_pg_trgm = db.execute(text("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")).first() is not None
+    return _has_pg_trgm
+
+
+def to_prefix_tsquery(keyword: str, any_word: bool = False, weights: str = "") -> Optional[str]:
+    """
+    'sabarmati ash' -> 'sabarmati & ash:*' (every word must match, the last one as a prefix).
+    With `any_word`, for free-text queries: 'quiet lakeside spots' -> 'quiet:* | lakeside:* | spots:*',
+    skipping one- and two-letter words; ts_rank_cd then favours rows matching more of them.
+    `weights` ("A", "AB") only matches lexemes with those setweight labels: 'sabarmati:A & ash:*A'.
+    """
+    words = _WORD_RE.findall(keyword.lower())
+    if any_word:
+        words = [w for w in words if len(w) > 2]
+        return " | ".join(f"{w}:*{weights}" for w in words) or None
+    if not words:
+        return None
+    return " & ".join([f"{w}:{weights}" if weights else w for w in words[:-1]] + [f"{words[-1]}:*{weights}"])
+
+
+def apply_searching(query: Query, model, search_fields: List[str], keyword: Optional[str],
+                    mode: str = "auto", rank: bool = True) -> Query:
     """
     Apply searching on specified fields.
 
+    Modes:
+        "auto"    full-text search when the model has a `search_vector` column and
+                  the keyword has at least FTS_MIN_KEYWORD characters; ILIKE otherwise
+        "ranked"  full-text search on `search_vector` (GIN-indexed tsvector)
+        "fuzzy"   typo-tolerant pg_trgm match on `search_fields`, ordered by similarity;
+                  ILIKE when pg_trgm is not installed
+        "ilike"   substring match on `search_fields`
+        "hybrid"  lexical + embedding retrieval fused by rank (app.utils.hybrid_search);
+                  models without an `embedding` column use "auto"
+
+    Full-text search matches whole words, the last word as a prefix
+    ("sabarmati ash" finds "Sabarmati Ashram"). The GIN index serves it. On
+    models whose search_vector also holds other columns (places: city, state,
+    type, description), only the name's lexemes match, the ones weighted
+    `search_name_weight`, so search=ahmedabad finds places named Ahmedabad,
+    not every place in the city. With
+    `rank`, results are ordered by ts_rank_cd, and any later order_by only
+    breaks ties. Pass rank=False when the caller sorts explicitly.
+
+    Fuzzy search keeps rows whose name has a word_similarity of at least
+    FUZZY_THRESHOLD with the keyword ("Sabarmati Asram" finds "Sabarmati
+    Ashram"), plus plain substring matches. Both are served by the
+    gin_trgm_ops index on name. With `rank`, the best match comes first.
+
+    Hybrid search keeps the top HYBRID_CANDIDATES places of the fused
+    ranking. It embeds the keyword, so it is the slowest mode.
+
     Args:
         query (Query): SQLAlchemy query.
         model: SQLAlchemy model class.
-        search_fields (list): List of field names to search in.
+        search_fields (list): List of field names to search in (ILIKE mode).
         keyword (str): Keyword to search for.
+        mode (str): One of SEARCH_MODES.
+        rank (bool): Order full-text/fuzzy matches by relevance.
 
     Returns:
         Query: Filtered query.
     """
-    if keyword:
-        search_filters = []
-        for field in search_fields:
-            if hasattr(model, field):
-                search_filters.append(getattr(model, field).ilike(f"%{keyword}%"))
-        if search_filters:
-            query = query.filter(or_(*search_filters))
+    keyword = (keyword or "").strip()
+    if not keyword:
+        return query
+
+    fields = [getattr(model, field) for field in search_fields if hasattr(model, field)]
+    if mode == "hybrid" and hasattr(model, "embedding"):
+        # imported here: hybrid_search builds on this module
+        from app.utils.hybrid_search import HYBRID_CANDIDATES, hybrid_rank
+        hits = hybrid_rank(keyword, limit=HYBRID_CANDIDATES)
+        query = query.filter(model.id.in_([h["id"] for h in hits]))
+        if rank and hits:
+            query = query.order_by(case({h["id"]: pos for pos, h in enumerate(hits)}, value=model.id))
+        return query
+    if mode == "hybrid":
+        mode = "auto"
+
+    if mode == "fuzzy" and fields and has_pg_trgm(query.session):
+        # transaction-local, like hnsw.ef_search in semantic_search; %> compares against it
+        query.session.execute(select(func.set_config("pg_trgm.word_similarity_threshold",
+                                                     str(FUZZY_THRESHOLD), True)))
+        query = query.filter(or_(*[f.op("%>")(keyword) for f in fields],
+                                 *[f.ilike(f"%{keyword}%") for f in fields]))
+        if rank:
+            scores = [func.word_similarity(keyword, f) for f in fields]
+            query = query.order_by((scores[0] if len(scores) == 1 else func.greatest(*scores)).desc())
+        return query
+
+    has_vector = hasattr(model, "search_vector")
+    if mode == "ranked" or (mode == "auto" and has_vector and len(keyword) >= FTS_MIN_KEYWORD):
+        tsquery_text = to_prefix_tsquery(keyword, weights=getattr(model, "search_name_weight", ""))
+        if has_vector and tsquery_text:
+            tsquery = func.to_tsquery(FTS_CONFIG, tsquery_text)
+            query = query.filter(model.search_vector.op("@@")(tsquery))
+            if rank:
+                query = query.order_by(func.ts_rank_cd(model.search_vector, tsquery).desc())
+            return query
+
+    if fields:
+        query = query.filter(or_(*[f.ilike(f"%{keyword}%") for f in fields]))
     return query
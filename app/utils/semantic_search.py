@@ -0,0 +1,135 @@
+# app/utils/semantic_search.py
+"""
+Top-k places by embedding similarity (pgvector).
+
+places.embedding has an HNSW index with cosine distance
+(ix_places_embedding_hnsw, migration e5a7c9d20005). A query is
+`ORDER BY embedding <=> :q LIMIT :k`, which Postgres answers from the index
+instead of computing the distance for every row. Higher hnsw.ef_search
+(set per transaction) means better recall and slower queries;
+scripts/bench_semantic_search.py measures both against exact search.
+
+Filters (city, state, type, suitable_for, tags, ids; see filter_clauses)
+are applied to the rows the index returns, so a selective filter can leave
+fewer than k. With pgvector >= 0.8 the index
+scan then keeps going (hnsw.iterative_scan). On older versions ef_search is
+raised for filtered queries, and if that still comes back short the query
+is repeated as an exact scan. That is cheap because the filter is
+selective.
+
+Config (env):
+    SEMANTIC_EF_SEARCH          hnsw.ef_search for unfiltered queries (default 40)
+    SEMANTIC_FILTER_EF_SEARCH   hnsw.ef_search when filters are present (default 200)
+"""
+import logging
+import os
+from typing import List, Optional, Sequence, Union
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from app.utils.timing import span
+
+SEMANTIC_EF_SEARCH = int(os.getenv("SEMANTIC_EF_SEARCH", "40"))
+SEMANTIC_FILTER_EF_SEARCH = int(os.getenv("SEMANTIC_FILTER_EF_SEARCH", "200"))
+
+RESULT_COLUMNS = ("id", "place_id", "name", "city", "state", "country", "type", "tags", "suitable_for",
+                  "rating", "lat", "lng", "avg_visit_mins", "description")
+
+_pgvector_version: Optional[tuple] = None
+
+
+def _vector_literal(vec: Sequence[float]) -> str:
+    return "[" + ",".join(f"{float(x):.7g}" for x in vec) + "]"
+
+
+def pgvector_version(db: Union[Session, Connection]) -> tuple:
+    global _pgvector_version
+    if _pgvector_version is None:
+        v = db.execute(text("SELECT extversion FROM pg_extension WHERE extname = 'vector'")).scalar() or "0"
+        try:
+            _pgvector_version = tuple(int(p) for p in v.split(".")[:3])
+        except ValueError:
+            _pgvector_version = (0,)
+    return _pgvector_version
+
+
+def structured_filters(city: Optional[str] = None, state: Optional[str] = None, type: Optional[str] = None,
+                       suitable_for: Optional[Sequence[str]] = None, tags: Optional[Sequence[str]] = None,
+                       ids: Optional[Sequence[int]] = None) -> dict:
+    """The set filters as bind params (array filters lower-cased, empty ones dropped)."""
+    filters = {"city": city, "state": state, "type": type,
+               "suitable_for": [v.strip().lower() for v in suitable_for or () if v.strip()],
+               "tags": [v.strip().lower() for v in tags or () if v.strip()],
+               "ids": list(ids) if ids is not None else None}
+    return {k: v for k, v in filters.items() if v or (k == "ids" and v is not None)}
+
+
+def filter_clauses(filters: dict) -> List[str]:
+    """
+    WHERE clauses for structured_filters(...): city/state/type match
+    case-insensitively, suitable_for/tags keep a place that has any of the
+    values, ids restricts to those places.
+    """
+    where = []
+    for col in ("city", "state", "type"):
+        if filters.get(col):
+            where.append(f"{col} ILIKE :{col}")
+    for col in ("suitable_for", "tags"):
+        if filters.get(col):
+            where.append(f"EXISTS (SELECT 1 FROM unnest({col}) v WHERE lower(v) = ANY(:{col}))")
+    if filters.get("ids") is not None:
+        where.append("id = ANY(:ids)")
+    return where
+
+
+def _search_sql(filters: dict) -> str:
+    where = ["is_active IS NOT FALSE", "embedding IS NOT NULL"] + filter_clauses(filters)
+    cols = ", ".join(RESULT_COLUMNS)
+    return f"""
+        SELECT {cols}, embedding <=> CAST(:q AS vector) AS distance
+        FROM places
+        WHERE {" AND ".join(where)}
+        ORDER BY embedding <=> CAST(:q AS vector)
+        LIMIT :k
+    """
+
+
+def semantic_search(db: Session, query_vec: Sequence[float], k: int = 10, city: Optional[str] = None,
+                    state: Optional[str] = None, type: Optional[str] = None, exact: bool = False,
+                    ef_search: Optional[int] = None, suitable_for: Optional[Sequence[str]] = None,
+                    tags: Optional[Sequence[str]] = None, ids: Optional[Sequence[int]] = None) -> List[dict]:
+    """
+    Rows (RESULT_COLUMNS + distance + similarity) nearest to `query_vec`, closest first.
+    `exact` skips the index (ground truth for benchmarks). Runs on its own
+    connection from `db`'s engine, whose transaction is rolled back to drop the
+    SET LOCAL settings, so the caller's session and pending work are untouched.
+    """
+    filters = structured_filters(city, state, type, suitable_for, tags, ids)
+    filtered = bool(filters)
+    params = {"q": _vector_literal(query_vec), "k": k, **filters}
+    sql = text(_search_sql(filters)).bindparams(bindparam("k"))
+
+    def run(exact_scan: bool):
+        # closing the connection rolls its transaction back: read-only, and drops the SET LOCALs
+        with db.get_bind().connect() as conn:
+            if exact_scan:
+                conn.execute(text("SET LOCAL enable_indexscan = off"))
+            else:
+                ef = ef_search or (SEMANTIC_FILTER_EF_SEARCH if filtered else SEMANTIC_EF_SEARCH)
+                conn.execute(text("SELECT set_config('hnsw.ef_search', :ef, true)"), {"ef": str(max(ef, k))})
+                if filtered and pgvector_version(conn) >= (0, 8, 0):
+                    conn.execute(text("SELECT set_config('hnsw.iterative_scan', 'relaxed_order', true)"))
+            return [dict(r._mapping) for r in conn.execute(sql, params).fetchall()]
+
+    with span("semantic_search"):
+        rows = run(exact)
+        if not exact and filtered and len(rows) < k:
+            logging.debug(f"semantic_search: index returned {len(rows)}/{k} with filters, retrying exact")
+            rows = run(True)
+    for r in rows:
+        r["distance"] = float(r["distance"])
+        r["similarity"] = round(1.0 - r["distance"], 4)
+    rows.sort(key=lambda r: r["distance"])  # iterative scans may return slightly out of order
+    return rows
@@ -0,0 +1,57 @@
+# app/utils/single_flight.py
+"""
+Single-flight request coalescing.
+
+Concurrent callers asking for the same key share one in-flight computation
+instead of each running their own. The first caller (the leader) starts it,
+and everyone who arrives before it finishes awaits the same task. The key
+is forgotten as soon as the task completes, so this only removes
+concurrent duplicates; remembering results is the caches' job.
+
+The computation runs as its own task and callers await it through
+asyncio.shield. A caller that disconnects stops waiting, but the work
+carries on for the others. Exceptions (an HTTPException 404 included) reach
+every waiter. Followers get a deep copy of the result so they can change it
+freely.
+
+Config (env):
+    ITINERARY_COALESCE_ENABLED  1/0 (default 1)
+"""
+import asyncio
+import copy
+import os
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+ITINERARY_COALESCE_ENABLED = os.getenv("ITINERARY_COALESCE_ENABLED", "1") == "1"
+
+
+class SingleFlight:
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.stats = {"leaders": 0, "followers": 0}
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Returns (result, shared); shared is True for callers that joined someone else's flight."""
+        task = self._inflight.get(key)
+        if task is None:
+            self.stats["leaders"] += 1
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+            return await asyncio.shield(task), False
+
+        self.stats["followers"] += 1
+        result = await asyncio.shield(task)
+        return copy.deepcopy(result), True
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # retrieved; no "never retrieved" warning when every waiter left
+
+    def inflight(self) -> int:
+        return len(self._inflight)
+
+
+itinerary_flights = SingleFlight()
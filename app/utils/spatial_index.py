@@ -0,0 +1,235 @@
+# app/utils/spatial_index.py
+"""
+Process-local spatial index over `places` (lat/lng).
+
+The itinerary endpoints used to run an `acos(...)` haversine over the whole
+table for every request. This keeps a uniform lat/lng grid of active places in
+memory so "all places within R km of (lat, lng), sorted by distance" only
+touches the handful of grid cells that overlap the search circle.
+
+The index loads lazily from the DB on first use and is kept fresh by the
+places router (create / update / soft-delete). Other workers pick up changes
+made elsewhere through a periodic full reload (SPATIAL_INDEX_TTL_S).
+
+`nearby_places` is the one candidate-retrieval entry point for the itinerary
+endpoints. When the in-process index is disabled or can't load, it falls back
+to a bounding-box query on the (lat, lng) B-tree plus an exact haversine.
+"""
+import logging
+import math
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, text
+from sqlalchemy.orm import Session
+
+from app.utils.timing import span
+
+EARTH_KM = 6371.0
+KM_PER_DEG_LAT = 111.32
+
+GRID_CELL_DEG = float(os.getenv("SPATIAL_INDEX_CELL_DEG", "0.25"))  # ~28 km per cell
+INDEX_TTL_S = float(os.getenv("SPATIAL_INDEX_TTL_S", "300"))
+
+
+def _haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    rlat1, rlat2 = math.radians(lat1), math.radians(lat2)
+    dlat = rlat2 - rlat1
+    dlon = math.radians(lon2 - lon1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(rlat1) * math.cos(rlat2) * math.sin(dlon / 2) ** 2
+    a = min(1.0, max(0.0, a))
+    return EARTH_KM * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+class PlacesSpatialIndex:
+    """
+    Uniform grid keyed by (floor(lat / cell), floor(lng / cell)).
+    Each cell holds (id, lat, lng) tuples of active places.
+    """
+
+    def __init__(self, cell_deg: float = GRID_CELL_DEG, ttl_s: float = INDEX_TTL_S):
+        self.cell_deg = cell_deg
+        self.ttl_s = ttl_s
+        self._cells: Dict[Tuple[int, int], List[Tuple[int, float, float]]] = {}
+        self._points: Dict[int, Tuple[float, float]] = {}
+        self._lock = threading.RLock()
+        self._loaded_at: Optional[float] = None
+
+    # ---------- maintenance ----------
+    def _cell(self, lat: float, lng: float) -> Tuple[int, int]:
+        return (math.floor(lat / self.cell_deg), math.floor(lng / self.cell_deg))
+
+    def _insert(self, pk: int, lat: float, lng: float):
+        self._points[pk] = (lat, lng)
+        self._cells.setdefault(self._cell(lat, lng), []).append((pk, lat, lng))
+
+    def _discard(self, pk: int):
+        old = self._points.pop(pk, None)
+        if old is None:
+            return
+        key = self._cell(*old)
+        bucket = [p for p in self._cells.get(key, []) if p[0] != pk]
+        if bucket:
+            self._cells[key] = bucket
+        else:
+            self._cells.pop(key, None)
+
+    def build(self, points):
+        """Replace the index contents with [(id, lat, lng), ...]."""
+        cells: Dict[Tuple[int, int], List[Tuple[int, float, float]]] = {}
+        pts: Dict[int, Tuple[float, float]] = {}
+        for pk, lat, lng in points:
+            lat, lng = float(lat), float(lng)
+            pts[pk] = (lat, lng)
+            cells.setdefault(self._cell(lat, lng), []).append((pk, lat, lng))
+        with self._lock:
+            self._cells, self._points = cells, pts
+            self._loaded_at = time.monotonic()
+
+    def load(self, db: Session):
+        """Full (re)build from the places table."""
+        rows = db.execute(text("""
+            SELECT id, lat, lng FROM places
+            WHERE lat IS NOT NULL AND lng IS NOT NULL AND is_active IS NOT FALSE
+        """)).fetchall()
+        self.build(rows)
+        logging.info(f"Spatial index loaded with {len(self._points)} places")
+
+    def ensure_loaded(self, db: Session):
+        with self._lock:
+            fresh = self._loaded_at is not None and (time.monotonic() - self._loaded_at) < self.ttl_s
+        if not fresh:
+            self.load(db)
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def upsert(self, pk: int, lat, lng, is_active: Optional[bool] = True):
+        """Refresh a single place; inactive or coordinate-less places are removed."""
+        with self._lock:
+            if self._loaded_at is None:
+                return  # next query does a full load anyway
+            self._discard(pk)
+            if is_active is not False and lat is not None and lng is not None:
+                self._insert(pk, float(lat), float(lng))
+
+    def remove(self, pk: int):
+        with self._lock:
+            self._discard(pk)
+
+    def __len__(self):
+        return len(self._points)
+
+    # ---------- queries ----------
+    def within_radius(self, lat: float, lng: float, radius_km: float) -> List[Tuple[int, float]]:
+        """
+        Return [(id, distance_km), ...] for every place within radius_km,
+        sorted by distance ascending.
+        """
+        lat_min, lat_max, lng_min, lng_max = bounding_box(lat, lng, radius_km)
+        lat_lo, lng_lo = self._cell(lat_min, lng_min)
+        lat_hi, lng_hi = self._cell(lat_max, lng_max)
+
+        hits: List[Tuple[int, float]] = []
+        with self._lock:
+            cells = self._cells
+            for ci in range(lat_lo, lat_hi + 1):
+                for cj in range(lng_lo, lng_hi + 1):
+                    bucket = cells.get((ci, cj))
+                    if not bucket:
+                        continue
+                    for pk, plat, plng in bucket:
+                        # cheap box reject before the trig
+                        if not (lat_min <= plat <= lat_max and lng_min <= plng <= lng_max):
+                            continue
+                        d = _haversine_km(lat, lng, plat, plng)
+                        if d <= radius_km:
+                            hits.append((pk, d))
+        hits.sort(key=lambda h: h[1])
+        return hits
+
+
+places_index = PlacesSpatialIndex()
+
+
+# DB path: the lat/lng bounding box is served by ix_places_lat_lng (B-tree),
+# the exact haversine only runs on the rows inside the box.
+_BBOX_HAVERSINE_SQL = text(f"""
+    SELECT * FROM (
+        SELECT *,
+            ({EARTH_KM} * 2 * asin(least(1.0, sqrt(
+                power(sin(radians(lat - :lat) / 2), 2) +
+                cos(radians(:lat)) * cos(radians(lat)) *
+                power(sin(radians(lng - :lon) / 2), 2)
+            )))) AS distance_km
+        FROM places
+        WHERE lat BETWEEN :lat_min AND :lat_max
+          AND lng BETWEEN :lng_min AND :lng_max
+          AND is_active IS NOT FALSE
+    ) AS boxed
+    WHERE distance_km <= :radius
+    ORDER BY distance_km ASC
+""")
+
+_ROWS_BY_ID_SQL = text("SELECT * FROM places WHERE id IN :ids").bindparams(
+    bindparam("ids", expanding=True)
+)
+
+SPATIAL_INDEX_ENABLED = os.getenv("SPATIAL_INDEX_ENABLED", "true").lower() in ("1", "true", "yes")
+
+
+def bounding_box(lat: float, lon: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """(lat_min, lat_max, lng_min, lng_max) enclosing the search circle."""
+    dlat = radius_km / KM_PER_DEG_LAT
+    cos_lat = max(1e-6, math.cos(math.radians(lat)))
+    dlng = min(180.0, radius_km / (KM_PER_DEG_LAT * cos_lat))
+    return lat - dlat, lat + dlat, lon - dlng, lon + dlng
+
+
+def nearby_places_sql(db: Session, lat: float, lon: float, radius_km: float) -> List[dict]:
+    """Index-backed radius search in the database (bounding box, then exact haversine)."""
+    lat_min, lat_max, lng_min, lng_max = bounding_box(lat, lon, radius_km)
+    rows = db.execute(_BBOX_HAVERSINE_SQL, {
+        "lat": lat, "lon": lon, "radius": radius_km,
+        "lat_min": lat_min, "lat_max": lat_max,
+        "lng_min": lng_min, "lng_max": lng_max,
+    }).fetchall()
+    return [dict(r._mapping) for r in rows]
+
+
+def nearby_places(db: Session, lat: float, lon: float, radius_km: float) -> List[dict]:
+    """
+    Candidate retrieval shared by the itinerary endpoints.
+    Returns place row dicts (all columns) with an added `distance_km`,
+    sorted by distance. Uses the in-memory index when enabled; otherwise (or if
+    the index can't be loaded) falls back to the bounding-box SQL query.
+    """
+    if not SPATIAL_INDEX_ENABLED:
+        with span("sql_candidates"):
+            return nearby_places_sql(db, lat, lon, radius_km)
+    try:
+        with span("spatial_index"):
+            places_index.ensure_loaded(db)
+            hits = places_index.within_radius(lat, lon, radius_km)
+    except Exception as e:
+        logging.warning(f"Spatial index unavailable, falling back to SQL: {e}")
+        db.rollback()
+        with span("sql_candidates"):
+            return nearby_places_sql(db, lat, lon, radius_km)
+
+    if not hits:
+        return []
+    with span("sql_candidates"):
+        rows = db.execute(_ROWS_BY_ID_SQL, {"ids": [pk for pk, _ in hits]}).fetchall()
+    by_id = {r._mapping["id"]: dict(r._mapping) for r in rows}
+    result = []
+    for pk, dist in hits:
+        row = by_id.get(pk)
+        if row is None:
+            continue
+        row["distance_km"] = dist
+        result.append(row)
+    return result
@@ -0,0 +1,112 @@
+# app/utils/timing.py
+"""
+Per-request stage timings for the itinerary endpoints.
+
+Handlers mark the end of each stage with lap():
+
+    rows = nearby_places(db, lat, lng, radius_km)
+    lap("retrieval")
+    ...
+    lap("candidates")
+
+Each lap adds the time since the previous lap to the current collector. The
+first lap counts from when the collector was opened. The collector is a
+context variable opened with collect_timings(), so concurrent requests don't
+mix. Tasks started inside a request (e.g. a single-flight leader's planning
+task) share their creator's collector. Without a collector lap() returns
+after one context-variable lookup.
+
+Stage names used by the endpoints (STAGES):
+    retrieval   city lookup + candidate query
+    candidates  normalising, travel matrix, ranking, prompt budget, day clusters
+    prompt      schema + prompt text
+    llm         model call(s), including fallbacks
+    repair      validation, fallback plans, route ordering
+    format      human-readable text
+    file_write  saving that text under saved_itineraries/
+    persist     DB writes + commit
+A repeated name accumulates. A follower that joined another request's
+planning run records its wait as "coalesced".
+
+Spans time named operations inside a stage and may repeat or overlap:
+
+    with span("sql_candidates"):
+        rows = db.execute(...)
+
+Spans used: sql_candidates, spatial_index (app.utils.spatial_index),
+llm_queue and llm_call (app.utils.llm_client, helper.query_llama*),
+embedding (app.utils.embeddings), semantic_search (app.utils.semantic_search),
+hybrid_search (app.utils.hybrid_search).
+
+app.utils.metrics opens a collector per HTTP request and exports both kinds
+as histograms and a Server-Timing header.
+"""
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+STAGES = ("retrieval", "candidates", "prompt", "llm", "repair", "format", "file_write", "persist")
+
+
+class StageTimings:
+    __slots__ = ("stages", "spans", "started", "_last")
+
+    def __init__(self):
+        self.started = self._last = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+        self.spans: Dict[str, float] = {}
+
+    def lap(self, stage: str):
+        now = time.perf_counter()
+        self.stages[stage] = self.stages.get(stage, 0.0) + (now - self._last) * 1000
+        self._last = now
+
+    def add_span(self, name: str, ms: float):
+        self.spans[name] = self.spans.get(name, 0.0) + ms
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+
+_current: contextvars.ContextVar = contextvars.ContextVar("stage_timings", default=None)
+
+
+@contextmanager
+def collect_timings() -> Iterator[StageTimings]:
+    timings = StageTimings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+def current_timings() -> Optional[StageTimings]:
+    return _current.get()
+
+
+def lap(stage: str):
+    timings = _current.get()
+    if timings is not None:
+        timings.lap(stage)
+
+
+def record_span(name: str, ms: float):
+    """Add a span measured by the caller (e.g. a queue wait that ends inside a context manager)."""
+    timings = _current.get()
+    if timings is not None:
+        timings.add_span(name, ms)
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add_span(name, (time.perf_counter() - t0) * 1000)
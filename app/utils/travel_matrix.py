@@ -0,0 +1,92 @@
+# app/utils/travel_matrix.py
+"""
+Per-request travel-time matrix for itinerary planning.
+
+Index 0 is the city centre; the candidates follow in the order given.
+Distances to/from the centre are computed once up front with NumPy.
+Place-to-place rows are computed vectorised on first use and cached, so
+repair/fill loops and the formatters just index into arrays instead of
+calling haversine_km three times per hop.
+
+Travel minutes follow hop_time_minutes(): urban speed when both ends are
+within URBAN_RADIUS_KM of the centre, intercity speed otherwise, plus
+HOP_BUFFER_MIN per hop.
+"""
+from typing import Dict, Hashable, Iterable, List
+
+import numpy as np
+
+from app.utils.helper import (
+    EARTH_KM, HOP_BUFFER_MIN, INTERCITY_SPEED_KMH, URBAN_RADIUS_KM, URBAN_SPEED_KMH,
+)
+
+CITY = "__city__"
+
+
+def _haversine_rows(lat1, lng1, lat2, lng2):
+    """Broadcasting haversine on radians; returns km."""
+    dlat = lat2 - lat1
+    dlng = lng2 - lng1
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlng / 2) ** 2
+    return EARTH_KM * 2 * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+class TravelMatrix:
+    def __init__(self, city_lat: float, city_lon: float, places: Iterable[dict],
+                 id_key: str = "place_id", lat_key: str = "lat", lng_key: str = "lng"):
+        places = list(places)
+        self.ids: List[Hashable] = [CITY] + [p[id_key] for p in places]
+        self.index: Dict[Hashable, int] = {pid: i for i, pid in enumerate(self.ids)}
+        self.lat = np.radians(np.array([city_lat] + [float(p[lat_key]) for p in places], dtype=float))
+        self.lng = np.radians(np.array([city_lon] + [float(p[lng_key]) for p in places], dtype=float))
+
+        self.city_km = _haversine_rows(self.lat[0], self.lng[0], self.lat, self.lng)
+        self.near_city = self.city_km < URBAN_RADIUS_KM
+        self._rows: Dict[int, np.ndarray] = {0: self._minutes(0, self.city_km)}
+
+    def __len__(self):
+        return len(self.ids) - 1
+
+    def __contains__(self, pid):
+        return pid in self.index
+
+    def _minutes(self, i: int, km: np.ndarray) -> np.ndarray:
+        speed = np.where(self.near_city[i] & self.near_city, URBAN_SPEED_KMH, INTERCITY_SPEED_KMH)
+        return np.rint(km / speed * 60.0).astype(np.int64) + HOP_BUFFER_MIN
+
+    def _row(self, i: int) -> np.ndarray:
+        row = self._rows.get(i)
+        if row is None:
+            km = _haversine_rows(self.lat[i], self.lng[i], self.lat, self.lng)
+            row = self._rows[i] = self._minutes(i, km)
+        return row
+
+    # ---------- lookups ----------
+    def hop(self, a: Hashable, b: Hashable) -> int:
+        """Travel minutes a -> b (place_ids or CITY), buffer included."""
+        return int(self._row(self.index[a])[self.index[b]])
+
+    def from_city(self, pid: Hashable) -> int:
+        return int(self._rows[0][self.index[pid]])
+
+    def to_city(self, pid: Hashable) -> int:
+        # symmetric: same distance, same speed rule
+        return self.from_city(pid)
+
+    def round_trip(self, pid: Hashable, visit_mins: int) -> int:
+        return self.from_city(pid) + int(visit_mins) + self.to_city(pid)
+
+    def km_from_city(self, pid: Hashable) -> float:
+        return float(self.city_km[self.index[pid]])
+
+    def submatrix(self, pids: List[Hashable]) -> np.ndarray:
+        """
+        Minutes between [CITY] + pids as a dense (n+1, n+1) array, computed in
+        one vectorised pass. Used by the route optimiser.
+        """
+        idx = np.array([0] + [self.index[p] for p in pids], dtype=np.int64)
+        lat, lng = self.lat[idx], self.lng[idx]
+        km = _haversine_rows(lat[:, None], lng[:, None], lat[None, :], lng[None, :])
+        near = self.near_city[idx]
+        speed = np.where(near[:, None] & near[None, :], URBAN_SPEED_KMH, INTERCITY_SPEED_KMH)
+        return np.rint(km / speed * 60.0).astype(np.int64) + HOP_BUFFER_MIN
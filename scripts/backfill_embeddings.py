@@ -0,0 +1,70 @@
+"""
+Embedding backfill for places.embedding (see app/api/places/embedding_backfill.py).
+
+Walks active places in id order. Rows without a vector, or (mode "stale")
+whose text or model changed since they were embedded, are encoded in
+batches with the shared embedding model and written back with bulk
+updates. Progress is recorded in embedding_backfill_runs after every page,
+the same table POST /places/admin/embeddings/backfill uses. An interrupted
+run continues from its cursor with --resume.
+
+Usage:
+    DATABASE_URL=postgresql://... python scripts/backfill_embeddings.py
+    python scripts/backfill_embeddings.py --mode missing --batch-size 512
+    python scripts/backfill_embeddings.py --resume
+
+Prints one progress line per page and writes the final run summary
+(rows embedded, rows/s, cursor) to --out.
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.api.places.embedding_backfill import (EMBEDDING_BACKFILL_BATCH, EMBEDDING_BACKFILL_PAGE, MODES,
+                                               create_run, run_backfill)
+from app.database.db import SessionLocal
+
+
+def print_progress(p):
+    prog = p["progress"]
+    print(f"{prog['scanned']:>8}/{prog['total']} scanned ({prog['percent']:>5}%)  "
+          f"embedded {prog['embedded']:>8}  skipped {prog['skipped']:>8}  "
+          f"{p['rows_per_s'] or 0:>8} rows/s  cursor id {prog['last_place_id']}", flush=True)
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--mode", choices=MODES, default="stale")
+    ap.add_argument("--resume", action="store_true", help="continue the latest failed or interrupted run of this mode")
+    ap.add_argument("--limit", type=int, help="stop after embedding this many rows")
+    ap.add_argument("--batch-size", type=int, default=EMBEDDING_BACKFILL_BATCH, help="texts per encode call")
+    ap.add_argument("--page-size", type=int, default=EMBEDDING_BACKFILL_PAGE, help="rows read per page")
+    ap.add_argument("--out", default="backfill_embeddings.json")
+    args = ap.parse_args()
+
+    db = SessionLocal()
+    try:
+        run = create_run(db, args.mode, args.resume)
+        run_id, cursor = run.id, run.last_place_id
+    finally:
+        db.close()
+    print(f"run {run_id} mode={args.mode}" + (f" resuming after id {cursor}" if cursor else ""))
+
+    result = run_backfill(run_id, limit=args.limit, page_size=args.page_size, batch_size=args.batch_size,
+                          on_progress=print_progress)
+    print(json.dumps(result, indent=2, default=str))
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2, default=str)
+    print(f"wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
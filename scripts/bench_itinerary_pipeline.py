@@ -0,0 +1,291 @@
+"""
+Itinerary pipeline benchmark: per-stage latency and throughput of every
+generate variant, against a deterministic fake model.
+
+For each of --sizes the places table is topped up to that many rows: the
+real places from Data/places.json (inserted if missing) plus synthetic
+copies jittered around them (place_id "bench-...", in the same cities).
+Each variant in --variants is then called in-process through the itinerary
+router, --requests times at every --concurrency level. The model is
+scripts/fake_ollama.py with a fixed --llm-latency-ms per call. The result
+cache, LLM cache and request coalescing are off, so every call does the
+full work. The LLM scheduler is sized to the highest concurrency level, so
+it doesn't queue or reject.
+
+Stage times come from app.utils.timing (lap() in the endpoints):
+    retrieval, candidates, prompt, llm, repair, format, file_write, persist
+Each (variant, size, concurrency) run reports p50/p95/p99 per stage, the
+same for end-to-end latency, requests/s and errors. Stages a variant
+doesn't have are simply absent.
+
+Variants:
+    gen1                POST /itinerary/generate_itinerary1
+    gen1_deterministic  the same with planner=deterministic
+    gen3, gen4, fresh   POST /itinerary/generate_itinerary3, 4, _fresh
+    raw                 POST /itinerary/generate_itinerary
+
+Synthetic places and the itinerary rows written by the run are deleted
+afterwards unless --keep. Text files go to a temporary directory.
+
+Usage:
+    DATABASE_URL=postgresql://... python scripts/bench_itinerary_pipeline.py --city Ahmedabad
+    python scripts/bench_itinerary_pipeline.py --sizes 165 5000 50000 --concurrency 1 4 16 --requests 40
+
+--out gets one JSON document (git revision, config, runs) to keep per
+commit and diff for regressions.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import httpx
+
+SYNTHETIC_PREFIX = "bench-"
+REQUIRED_FIELDS = ("id", "name", "city", "state", "country", "lat", "lng", "type", "avg_visit_mins", "last_verified")
+# multi-row INSERTs need every row to carry the same columns
+ROW_DEFAULTS = {
+    "tags": [], "suitable_for": [], "famous_for": [], "best_months": [], "nearby_attractions": [],
+    "entry_fee": {}, "accessibility": {}, "open_hours": {},
+    "description": None, "rating": None, "notes": None,
+}
+JITTER_DEG = 0.12  # ~13 km: synthetic places stay around their city
+VARIANTS = {
+    # name: (path, extra params)
+    "gen1": ("/itinerary/generate_itinerary1", {}),
+    "gen1_deterministic": ("/itinerary/generate_itinerary1", {"planner": "deterministic"}),
+    "gen3": ("/itinerary/generate_itinerary3", {}),
+    "gen4": ("/itinerary/generate_itinerary4", {}),
+    "fresh": ("/itinerary/generate_itinerary_fresh", {}),
+    "raw": ("/itinerary/generate_itinerary", {}),
+}
+
+
+def pct(samples, q):
+    """Nearest-rank percentile."""
+    if not samples:
+        return None
+    s = sorted(samples)
+    return round(s[min(len(s) - 1, max(0, int(round(q * len(s))) - 1))], 2)
+
+
+def summary(samples):
+    return {"p50": pct(samples, 0.50), "p95": pct(samples, 0.95), "p99": pct(samples, 0.99),
+            "mean": round(statistics.fmean(samples), 2) if samples else None}
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return None
+
+
+# ---------- seeding ----------
+
+def load_seed_places():
+    """Seed places with the fields the places table requires."""
+    with open(ROOT / "Data" / "places.json", encoding="utf-8") as f:
+        data = json.load(f)
+    return [p for p in data if all(p.get(k) is not None for k in REQUIRED_FIELDS)]
+
+
+def seed(engine, places_table, seeds, size, rng):
+    """Real places (if missing) + synthetic ones up to `size` rows in total."""
+    from sqlalchemy import delete, func, select
+    from sqlalchemy.dialects.postgresql import insert
+
+    columns = set(places_table.c.keys())
+
+    def row(p, place_id):
+        r = {**ROW_DEFAULTS, **{k: v for k, v in p.items() if k in columns and k != "id"}}
+        r.update(place_id=place_id, is_active=True)
+        return r
+
+    with engine.begin() as conn:
+        conn.execute(delete(places_table).where(places_table.c.place_id.like(f"{SYNTHETIC_PREFIX}%")))
+        conn.execute(insert(places_table).values([row(p, p["id"]) for p in seeds])
+                     .on_conflict_do_nothing(index_elements=["place_id"]))
+        existing = conn.execute(select(func.count()).select_from(places_table)).scalar()
+        synthetic = []
+        for i in range(max(0, size - existing)):
+            p = rng.choice(seeds)
+            synthetic.append(row({
+                **p, "name": f"{p['name']} #{i}",
+                "lat": p["lat"] + rng.uniform(-JITTER_DEG, JITTER_DEG),
+                "lng": p["lng"] + rng.uniform(-JITTER_DEG, JITTER_DEG),
+                "rating": round(min(5.0, max(3.0, (p.get("rating") or 4.0) + rng.uniform(-0.4, 0.4))), 2),
+            }, f"{SYNTHETIC_PREFIX}{i:07d}"))
+        for start in range(0, len(synthetic), 2000):
+            conn.execute(insert(places_table).values(synthetic[start:start + 2000]))
+        return conn.execute(select(func.count()).select_from(places_table)).scalar()
+
+
+# ---------- load generation ----------
+
+async def call(client, variant, params):
+    from app.utils.timing import collect_timings
+
+    path, extra = VARIANTS[variant]
+    with collect_timings() as timings:
+        t0 = time.perf_counter()
+        try:
+            r = await client.post(path, params={**params, **extra})
+            error = None if r.status_code == 200 else f"HTTP {r.status_code}"
+        except Exception as e:  # endpoint bugs surface here with raise_app_exceptions
+            error = type(e).__name__
+        total_ms = (time.perf_counter() - t0) * 1000
+    return {"total_ms": total_ms, "stages": dict(timings.stages), "error": error}
+
+
+async def run_level(client, variant, params, requests, concurrency):
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with sem:
+            return await call(client, variant, params)
+
+    t0 = time.perf_counter()
+    results = await asyncio.gather(*[one() for _ in range(requests)])
+    wall_s = time.perf_counter() - t0
+
+    ok = [r for r in results if r["error"] is None]
+    errors = {}
+    for r in results:
+        if r["error"]:
+            errors[r["error"]] = errors.get(r["error"], 0) + 1
+    stage_names = []
+    for r in ok:
+        stage_names += [s for s in r["stages"] if s not in stage_names]
+    return {
+        "requests": requests,
+        "ok": len(ok),
+        "errors": errors,
+        "throughput_rps": round(len(ok) / wall_s, 2) if wall_s else None,
+        "latency_ms": summary([r["total_ms"] for r in ok]),
+        "stages_ms": {s: summary([r["stages"][s] for r in ok if s in r["stages"]]) for s in stage_names},
+    }
+
+
+async def bench(args, sizes_done):
+    from fastapi import FastAPI
+    from sqlalchemy import delete, func, select
+
+    from app.api.itineraries.models import ItineraryRequest
+    from app.api.itineraries.router import router
+    from app.api.places.models import Places
+    from app.database.db import engine
+    from app.utils.spatial_index import places_index
+
+    app = FastAPI()
+    app.include_router(router)
+    params = {"city": args.city, "days": args.days, "suitable_for": args.suitable_for}
+    rng = random.Random(args.seed)
+    seeds = load_seed_places()
+
+    with engine.connect() as conn:
+        first_request_id = conn.execute(select(func.coalesce(func.max(ItineraryRequest.id), 0))).scalar()
+
+    runs = []
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+            for size in args.sizes:
+                actual = seed(engine, Places.__table__, seeds, size, rng)
+                places_index.invalidate()
+                sizes_done.append(actual)
+                for variant in args.variants:
+                    await call(client, variant, params)  # warm-up: spatial index, pools, imports
+                    for concurrency in args.concurrency:
+                        level = await run_level(client, variant, params, args.requests, concurrency)
+                        runs.append({"variant": variant, "places": actual, "concurrency": concurrency, **level})
+                        lat = level["latency_ms"]
+                        print(f"{variant:<19} places={actual:<7} c={concurrency:<3} ok={level['ok']:>3}/{args.requests} "
+                              f"p50={lat['p50']}ms p95={lat['p95']}ms p99={lat['p99']}ms "
+                              f"rps={level['throughput_rps']} errors={level['errors'] or '-'}")
+    finally:
+        if not args.keep:
+            with engine.begin() as conn:
+                conn.execute(delete(Places.__table__).where(Places.place_id.like(f"{SYNTHETIC_PREFIX}%")))
+                conn.execute(delete(ItineraryRequest.__table__).where(ItineraryRequest.id > first_request_id))
+            places_index.invalidate()
+    return runs
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--city", default="Ahmedabad")
+    ap.add_argument("--days", type=int, default=2)
+    ap.add_argument("--suitable-for", default="family")
+    ap.add_argument("--variants", nargs="+", default=list(VARIANTS), choices=list(VARIANTS))
+    ap.add_argument("--sizes", type=int, nargs="+", default=[165, 2000, 10000],
+                    help="total places in the table for each round")
+    ap.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    ap.add_argument("--requests", type=int, default=20, help="requests per variant, size and concurrency level")
+    ap.add_argument("--llm-latency-ms", type=float, default=200.0, help="fake model delay per call")
+    ap.add_argument("--llm-port", type=int, default=11438)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--keep", action="store_true", help="keep synthetic places and itinerary rows")
+    ap.add_argument("--out", default="bench_itinerary_pipeline.json")
+    args = ap.parse_args()
+    if not os.getenv("DATABASE_URL"):
+        ap.error("DATABASE_URL must point at the database to seed")
+
+    llm_url = f"http://127.0.0.1:{args.llm_port}"
+    # before any app import: these are read at import time
+    os.environ.update({
+        "OLLAMA_URL": llm_url, "ITINERARY_CACHE_ENABLED": "0", "LLM_CACHE_ENABLED": "0",
+        "ITINERARY_COALESCE_ENABLED": "0", "LLM_WARM_ON_STARTUP": "0",
+        "LLM_MAX_CONCURRENCY": str(max(args.concurrency)), "LLM_QUEUE_MAX": str(args.requests),
+    })
+    fake = subprocess.Popen([sys.executable, str(ROOT / "scripts" / "fake_ollama.py"),
+                             "--port", str(args.llm_port), "--latency-ms", str(args.llm_latency_ms)])
+    workdir = tempfile.mkdtemp(prefix="bench_itinerary_")
+    out = os.path.abspath(args.out)
+    cwd = os.getcwd()
+    sizes_done = []
+    try:
+        deadline = time.time() + 30
+        while True:
+            try:
+                httpx.get(f"{llm_url}/api/tags", timeout=1)
+                break
+            except Exception:
+                if time.time() > deadline:
+                    raise RuntimeError(f"{llm_url} not reachable")
+                time.sleep(0.2)
+        os.chdir(workdir)  # saved_itineraries/ lands here
+        runs = asyncio.run(bench(args, sizes_done))
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(workdir, ignore_errors=True)
+        fake.terminate()
+        fake.wait()
+
+    from app.utils.timing import STAGES
+    results = {
+        "benchmark": "itinerary_pipeline",
+        "git_revision": git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "config": {**{k: v for k, v in vars(args).items() if k not in ("out", "keep")}, "places": sizes_done,
+                   "stages": list(STAGES)},
+        "runs": runs,
+    }
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"wrote {out}")
+
+
+if __name__ == "__main__":
+    main()
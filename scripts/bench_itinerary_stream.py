@@ -0,0 +1,143 @@
+"""
+Itinerary latency benchmark: blocking POST /itinerary/generate_itinerary1 vs
+the SSE variant /itinerary/generate_itinerary1/stream.
+
+The number that matters is time to first useful byte (TTFB). For the
+blocking endpoint that is the whole response. For the stream it is the
+first `candidates` event, then the first model token and the first
+repaired day. Total time is reported too, so any cost of streaming shows up.
+
+By default the script starts scripts/fake_ollama.py (--per-token-ms pacing)
+and the API (uvicorn app.main:app) pointed at it, with the result and LLM
+caches off so every request does the full pipeline. The API still needs
+DATABASE_URL with places for --city. Pass --api (and run it against a real
+Ollama) to measure an existing deployment.
+
+Usage:
+    python scripts/bench_itinerary_stream.py --city Ahmedabad --days 2 [--requests 5]
+    python scripts/bench_itinerary_stream.py --api http://localhost:8000 --city Ahmedabad
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import httpx
+
+
+def mean(samples):
+    samples = [s for s in samples if s is not None]
+    return round(statistics.fmean(samples), 1) if samples else None
+
+
+def ms_since(t0):
+    return round((time.perf_counter() - t0) * 1000, 1)
+
+
+def run_blocking(api, params):
+    t0 = time.perf_counter()
+    r = httpx.post(f"{api}/itinerary/generate_itinerary1", params=params, timeout=300)
+    r.raise_for_status()
+    total = ms_since(t0)
+    return {"ttfb_ms": total, "total_ms": total}
+
+
+def run_stream(api, params):
+    marks = {"first_byte_ms": None, "candidates_ms": None, "first_token_ms": None, "first_day_ms": None}
+    event = None
+    t0 = time.perf_counter()
+    with httpx.stream("GET", f"{api}/itinerary/generate_itinerary1/stream", params=params, timeout=300) as r:
+        r.raise_for_status()
+        for line in r.iter_lines():
+            if marks["first_byte_ms"] is None:
+                marks["first_byte_ms"] = ms_since(t0)
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+                key = {"candidates": "candidates_ms", "llm_token": "first_token_ms", "day": "first_day_ms"}.get(event)
+                if key and marks[key] is None:
+                    marks[key] = ms_since(t0)
+            elif line.startswith("data: ") and event == "error":
+                raise RuntimeError(f"stream error: {line[len('data: '):]}")
+    # first useful byte: the shortlist, or whatever came first if that stage was skipped (cache hit)
+    marks["ttfb_ms"] = marks["candidates_ms"] or marks["first_day_ms"] or marks["first_byte_ms"]
+    marks["total_ms"] = ms_since(t0)
+    return marks
+
+
+def summarize(runs):
+    return {k: mean([r[k] for r in runs]) for k in runs[0]}
+
+
+def wait_ready(url, path, timeout_s=30):
+    deadline = time.time() + timeout_s
+    while time.time() < deadline:
+        try:
+            httpx.get(f"{url}{path}", timeout=1)
+            return
+        except Exception:
+            time.sleep(0.2)
+    raise RuntimeError(f"{url} not reachable")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--api", help="existing API base URL (default: spawn uvicorn + fake_ollama)")
+    ap.add_argument("--api-port", type=int, default=8765)
+    ap.add_argument("--llm-port", type=int, default=11437)
+    ap.add_argument("--latency-ms", type=float, default=300.0, help="fake server prompt-eval delay")
+    ap.add_argument("--per-token-ms", type=float, default=5.0, help="fake server delay per chunk")
+    ap.add_argument("--city", required=True)
+    ap.add_argument("--days", type=int, default=2)
+    ap.add_argument("--suitable-for")
+    ap.add_argument("--requests", type=int, default=5)
+    ap.add_argument("--out", default="bench_itinerary_stream.json")
+    args = ap.parse_args()
+
+    procs = []
+    api = args.api
+    if not api:
+        llm_url = f"http://127.0.0.1:{args.llm_port}"
+        api = f"http://127.0.0.1:{args.api_port}"
+        procs.append(subprocess.Popen([
+            sys.executable, str(ROOT / "scripts" / "fake_ollama.py"), "--port", str(args.llm_port),
+            "--latency-ms", str(args.latency_ms), "--per-token-ms", str(args.per_token_ms)]))
+        env = {**os.environ, "OLLAMA_URL": llm_url, "ITINERARY_CACHE_ENABLED": "0",
+               "LLM_CACHE_ENABLED": "0", "LLM_WARM_ON_STARTUP": "0"}
+        procs.append(subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app",
+                                       "--port", str(args.api_port), "--log-level", "warning"],
+                                      cwd=str(ROOT), env=env))
+        wait_ready(llm_url, "/api/tags")
+
+    params = {"city": args.city, "days": args.days}
+    if args.suitable_for:
+        params["suitable_for"] = args.suitable_for
+    try:
+        wait_ready(api, "/docs")
+        run_stream(api, params)  # warm-up: connections, model load, embedder
+        blocking = [run_blocking(api, params) for _ in range(args.requests)]
+        stream = [run_stream(api, params) for _ in range(args.requests)]
+    finally:
+        for p in procs:
+            p.terminate()
+            p.wait()
+
+    results = {"config": {k: v for k, v in vars(args).items() if k != "out"},
+               "blocking": summarize(blocking), "stream": summarize(stream)}
+    b, s = results["blocking"], results["stream"]
+    print(f"blocking  ttfb={b['ttfb_ms']:>8.1f}ms  total={b['total_ms']:>8.1f}ms")
+    print(f"stream    ttfb={s['ttfb_ms']:>8.1f}ms  total={s['total_ms']:>8.1f}ms  "
+          f"first_token={s['first_token_ms']}ms  first_day={s['first_day_ms']}ms")
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+"""
+LLM backend benchmark: `ollama run` subprocess per prompt (the old
+query_llama / query_llama_subprocess) vs REST with keep_alive on the pooled
+client (app.utils.llm_client).
+
+Traffic comes in --bursts of --per-burst prompts separated by --idle-s of
+silence, longer than the server's default keep-alive. This mimics real
+traffic where a quiet spell lets Ollama unload the model. For each backend
+it reports the process spawn count, cold model loads, and first-call
+(cold) vs steady-state (warm) latency.
+
+By default everything is simulated: scripts/fake_ollama.py plays the server
+(--cold-ms model load, --latency-ms per call, --server-keep-alive-s default
+keep-alive) and a tiny generated `ollama` CLI plays the client binary. Pass
+--url and --cli to point at a real install.
+
+Usage:
+    python scripts/bench_llm_backend.py [--bursts 3 --per-burst 10 --idle-s 2]
+    python scripts/bench_llm_backend.py --url http://localhost:11434 --cli ollama --idle-s 330
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import httpx
+
+from app.utils.llm_client import OllamaClient
+
+PROMPT = "Suggest one place to visit in Ahmedabad. Answer in one line."
+
+# Stand-in for the `ollama` binary: `ollama run <model>` reads the prompt from
+# stdin and asks the server, without keep_alive, like the real CLI does.
+FAKE_CLI = '''#!{python}
+import json, os, sys, urllib.request
+model = sys.argv[2]
+body = json.dumps({{"model": model, "prompt": sys.stdin.read(), "stream": False}}).encode()
+req = urllib.request.Request(os.environ["OLLAMA_HOST"] + "/api/generate", body,
+                             {{"Content-Type": "application/json"}})
+print(json.load(urllib.request.urlopen(req))["response"])
+'''
+
+
+def pct(samples, q):
+    s = sorted(samples)
+    return round(s[min(len(s) - 1, int(q * len(s)))], 1) if s else None
+
+
+def report(first, warm, spawns, cold_loads):
+    return {
+        "spawns": spawns,
+        "cold_loads": cold_loads,
+        "first_call_mean_ms": round(statistics.fmean(first), 1),
+        "warm_p50_ms": pct(warm, 0.5),
+        "warm_p95_ms": pct(warm, 0.95),
+    }
+
+
+def server_cold_loads(url):
+    try:
+        return httpx.get(f"{url}/_fake/stats", timeout=2).json()["cold_loads"]
+    except Exception:
+        return None  # real Ollama doesn't expose this
+
+
+def run_cli(cli, url, model, bursts, per_burst, idle_s):
+    env = {**os.environ, "OLLAMA_HOST": url}
+    first, warm, spawns = [], [], 0
+    before = server_cold_loads(url)
+    for b in range(bursts):
+        if b:
+            time.sleep(idle_s)
+        for i in range(per_burst):
+            t0 = time.perf_counter()
+            subprocess.run([cli, "run", model], input=PROMPT.encode(), capture_output=True, env=env, check=True)
+            spawns += 1
+            (first if i == 0 else warm).append((time.perf_counter() - t0) * 1000)
+    after = server_cold_loads(url)
+    return report(first, warm, spawns, None if before is None else after - before)
+
+
+async def run_rest(url, model, bursts, per_burst, idle_s):
+    client = OllamaClient(base_url=url)
+    first, warm = [], []
+    for b in range(bursts):
+        if b:
+            await asyncio.sleep(idle_s)
+        for i in range(per_burst):
+            t0 = time.perf_counter()
+            await client.generate(PROMPT, model=model)
+            (first if i == 0 else warm).append((time.perf_counter() - t0) * 1000)
+    await client.aclose()
+    return report(first, warm, 0, client.stats["cold_loads"])
+
+
+def wait_ready(url, timeout_s=15):
+    deadline = time.time() + timeout_s
+    while time.time() < deadline:
+        try:
+            httpx.get(f"{url}/api/tags", timeout=1).raise_for_status()
+            return
+        except Exception:
+            time.sleep(0.2)
+    raise RuntimeError(f"LLM server at {url} not reachable")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--url", help="existing Ollama server (default: spawn fake_ollama)")
+    ap.add_argument("--cli", help="ollama binary (default: generated fake CLI)")
+    ap.add_argument("--port", type=int, default=11436)
+    ap.add_argument("--model", default="llama3.1:8b")
+    ap.add_argument("--latency-ms", type=float, default=40.0)
+    ap.add_argument("--cold-ms", type=float, default=1500.0)
+    ap.add_argument("--server-keep-alive-s", type=float, default=1.0,
+                    help="fake server default keep-alive (stands in for Ollama's 5m)")
+    ap.add_argument("--bursts", type=int, default=3)
+    ap.add_argument("--per-burst", type=int, default=10)
+    ap.add_argument("--idle-s", type=float, default=2.0)
+    ap.add_argument("--out", default="bench_llm_backend.json")
+    args = ap.parse_args()
+
+    server = None
+    url = args.url
+    tmp = tempfile.TemporaryDirectory()
+    cli = args.cli
+    if not cli:
+        cli = os.path.join(tmp.name, "ollama")
+        with open(cli, "w") as f:
+            f.write(FAKE_CLI.format(python=sys.executable))
+        os.chmod(cli, 0o755)
+    if not url:
+        url = f"http://127.0.0.1:{args.port}"
+        server = subprocess.Popen([
+            sys.executable, str(ROOT / "scripts" / "fake_ollama.py"), "--port", str(args.port),
+            "--latency-ms", str(args.latency_ms), "--cold-ms", str(args.cold_ms),
+            "--keep-alive-s", str(args.server_keep_alive_s)])
+    try:
+        wait_ready(url)
+        shape = (args.model, args.bursts, args.per_burst, args.idle_s)
+        cli_res = run_cli(cli, url, *shape)
+        time.sleep(args.idle_s)  # let the model unload so REST starts cold too
+        rest_res = asyncio.run(run_rest(url, *shape))
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+        tmp.cleanup()
+
+    results = {"config": {k: v for k, v in vars(args).items() if k != "out"},
+               "cli_subprocess": cli_res, "rest_keep_alive": rest_res}
+    for name in ("cli_subprocess", "rest_keep_alive"):
+        r = results[name]
+        print(f"{name:<16} spawns={r['spawns']:>3}  cold_loads={r['cold_loads']}  "
+              f"first={r['first_call_mean_ms']:>8.1f}ms  warm p50={r['warm_p50_ms']:>7.1f}ms  "
+              f"p95={r['warm_p95_ms']:>7.1f}ms")
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+LLM client benchmark: a new httpx.Client per call (old query_llama_structured)
+vs the shared pooled async client (app.utils.llm_client).
+
+Starts scripts/fake_ollama.py on a local port unless --url is given, then
+fires --requests chat calls at --concurrency and reports latency
+percentiles and throughput per mode.
+
+Usage:
+    python scripts/bench_llm_client.py [--latency-ms 50] [--requests 200] [--concurrency 16]
+    python scripts/bench_llm_client.py --url http://localhost:11434   # real Ollama
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import httpx
+
+from app.utils.llm_client import OllamaClient
+
+PROMPT = 'Plan a 2-day trip. Candidates: [{"place_id": "p1"}, {"place_id": "p2"}, {"place_id": "p3"}]'
+
+
+def summarize(samples, wall_s):
+    s = sorted(samples)
+    return {
+        "p50_ms": round(statistics.median(s), 2),
+        "p95_ms": round(s[min(len(s) - 1, int(0.95 * len(s)))], 2),
+        "p99_ms": round(s[min(len(s) - 1, int(0.99 * len(s)))], 2),
+        "throughput_rps": round(len(s) / wall_s, 1),
+    }
+
+
+def run_per_call_client(url, model, n, concurrency):
+    def one(_):
+        t0 = time.perf_counter()
+        with httpx.Client(timeout=120) as client:
+            r = client.post(f"{url}/api/chat", json={
+                "model": model, "messages": [{"role": "user", "content": PROMPT}],
+                "stream": False, "format": {"type": "object"}})
+            r.raise_for_status()
+        return (time.perf_counter() - t0) * 1000
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(one, range(n)))
+    return summarize(samples, time.perf_counter() - t0)
+
+
+async def run_pooled(url, model, n, concurrency):
+    client = OllamaClient(base_url=url, max_concurrency=concurrency, max_connections=concurrency)
+    samples = []
+
+    async def worker(count):
+        for _ in range(count):
+            t0 = time.perf_counter()
+            await client.chat(PROMPT, schema={"type": "object"}, model=model)
+            samples.append((time.perf_counter() - t0) * 1000)
+
+    # closed loop, same shape as the thread pool: `concurrency` callers back to back
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker(n // concurrency + (i < n % concurrency)) for i in range(concurrency)))
+    wall = time.perf_counter() - t0
+    await client.aclose()
+    return summarize(samples, wall)
+
+
+def wait_ready(url, timeout_s=15):
+    deadline = time.time() + timeout_s
+    while time.time() < deadline:
+        try:
+            httpx.get(f"{url}/api/tags", timeout=1).raise_for_status()
+            return
+        except Exception:
+            time.sleep(0.2)
+    raise RuntimeError(f"LLM server at {url} not reachable")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--url", help="existing Ollama-compatible server (default: spawn fake_ollama)")
+    ap.add_argument("--port", type=int, default=11435)
+    ap.add_argument("--model", default="llama3.1:8b")
+    ap.add_argument("--latency-ms", type=float, default=50.0, help="fake server delay per call")
+    ap.add_argument("--requests", type=int, default=200)
+    ap.add_argument("--concurrency", type=int, default=16)
+    ap.add_argument("--out", default="bench_llm_client.json")
+    args = ap.parse_args()
+
+    server = None
+    url = args.url
+    if not url:
+        url = f"http://127.0.0.1:{args.port}"
+        server = subprocess.Popen([sys.executable, str(ROOT / "scripts" / "fake_ollama.py"),
+                                   "--port", str(args.port), "--latency-ms", str(args.latency_ms)])
+    try:
+        wait_ready(url)
+        results = {
+            "config": {k: v for k, v in vars(args).items() if k != "out"},
+            "per_call_client": run_per_call_client(url, args.model, args.requests, args.concurrency),
+            "pooled_async": asyncio.run(run_pooled(url, args.model, args.requests, args.concurrency)),
+        }
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+
+    for mode in ("per_call_client", "pooled_async"):
+        r = results[mode]
+        print(f"{mode:<16} p50={r['p50_ms']:>8.2f}ms  p95={r['p95_ms']:>8.2f}ms  "
+              f"p99={r['p99_ms']:>8.2f}ms  {r['throughput_rps']:>7.1f} req/s")
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
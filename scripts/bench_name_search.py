@@ -0,0 +1,209 @@
+"""
+Name-search benchmark: ILIKE, pg_trgm and full-text search latency on a large places table.
+
+Seeds a scratch table `places_search_bench` in DATABASE_URL with synthetic
+place names ("Sabarmati Ashram", "Old Kankaria Lake 1234", ...). It has the
+same search indexes as places: a GIN tsvector (search_vector, see
+app/utils/searching.py) and a gin_trgm_ops index on name. Each query runs the
+SQL apply_searching generates, for:
+  ilike seq        ILIKE '%kw%' with index scans disabled (the old behaviour)
+  ilike trgm       ILIKE '%kw%' through the trigram index
+  dup seq / trgm   the create_place duplicate check, name ILIKE 'Full Name', for
+                   a new (absent) name: the usual case, and a seq scan's worst
+  fuzzy            mode="fuzzy": name %> kw, ordered by word_similarity, with typo'd keywords
+  fts              mode="ranked": search_vector @@ prefix tsquery, ordered by ts_rank_cd
+Every search query has LIMIT --limit, like a paged get_all_* call.
+
+If pg_trgm is not available on the server, the trigram rows are skipped.
+
+Usage:
+    DATABASE_URL=postgresql://... python scripts/bench_name_search.py [--rows 1000000] [--queries 50]
+
+Prints a table and writes one JSON line per measurement to --out.
+"""
+import argparse
+import io
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+
+from app.utils.searching import FTS_CONFIG, FUZZY_THRESHOLD, to_prefix_tsquery
+
+load_dotenv()
+
+TABLE = "places_search_bench"
+PREFIXES = ["Old", "New", "Royal", "Grand", "Lower", "Upper", "Shri", "Jain", "Hanuman", "Adalaj",
+            "Sabarmati", "Kankaria", "Bhadra", "Sidi", "Rani", "Jama", "Swaminarayan", "Laxmi", "Vijay",
+            "Aina", "Hawa", "Amber", "Kutch", "Gir", "Dwarka", "Somnath", "Modhera", "Patan", "Champaner"]
+KINDS = ["Ashram", "Lake", "Fort", "Palace", "Temple", "Museum", "Stepwell", "Mosque", "Garden", "Market",
+         "Mahal", "Gate", "Tomb", "Bazaar", "Beach", "Sanctuary", "Haveli", "Darwaja", "Talav", "Vav"]
+CITIES = ["Ahmedabad", "Vadodara", "Surat", "Rajkot", "Bhuj", "Jaipur", "Udaipur", "Jodhpur", "Dwarka", "Junagadh"]
+
+
+def make_name(rng: random.Random, i: int) -> str:
+    words = [rng.choice(PREFIXES), rng.choice(KINDS)]
+    if rng.random() < 0.5:
+        words.insert(1, rng.choice(PREFIXES))
+    return " ".join(words) + f" {i}"
+
+
+def typo(rng: random.Random, word: str) -> str:
+    """Drop, double or swap one inner letter ("Ashram" -> "Asram")."""
+    if len(word) < 4:
+        return word
+    i = rng.randrange(1, len(word) - 1)
+    op = rng.choice(("drop", "double", "swap"))
+    if op == "drop":
+        return word[:i] + word[i + 1:]
+    if op == "double":
+        return word[:i] + word[i] + word[i:]
+    return word[:i - 1] + word[i] + word[i - 1] + word[i + 1:]
+
+
+def seed_table(engine, n: int, rng: random.Random, trgm: bool):
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+        conn.execute(text(f"""
+            CREATE TABLE {TABLE} (
+                id SERIAL PRIMARY KEY,
+                name VARCHAR(255), city VARCHAR(255), state VARCHAR(255), country VARCHAR(255),
+                search_vector tsvector GENERATED ALWAYS AS (to_tsvector('{FTS_CONFIG}', coalesce(name, ''))) STORED
+            )
+        """))
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        for start in range(0, n, 50_000):
+            buf = io.StringIO()
+            for i in range(start, min(n, start + 50_000)):
+                buf.write(f"{make_name(rng, i)}\t{rng.choice(CITIES)}\tGujarat\tIndia\n")
+            buf.seek(0)
+            cur.copy_expert(f"COPY {TABLE} (name, city, state, country) FROM STDIN", buf)
+        raw.commit()
+    finally:
+        raw.close()
+    build = {}
+    with engine.begin() as conn:
+        t0 = time.perf_counter()
+        conn.execute(text(f"CREATE INDEX ix_{TABLE}_search_vector ON {TABLE} USING gin (search_vector)"))
+        build["fts_gin_s"] = round(time.perf_counter() - t0, 2)
+        if trgm:
+            t0 = time.perf_counter()
+            conn.execute(text(f"CREATE INDEX ix_{TABLE}_name_trgm ON {TABLE} USING gin (name gin_trgm_ops)"))
+            build["trgm_gin_s"] = round(time.perf_counter() - t0, 2)
+        conn.execute(text(f"ANALYZE {TABLE}"))
+    return build
+
+
+def timed(conn, sql, params, seq: bool = False, fuzzy: bool = False):
+    with conn.begin():
+        if seq:
+            conn.execute(text("SET LOCAL enable_indexscan = off"))
+            conn.execute(text("SET LOCAL enable_bitmapscan = off"))
+            conn.execute(text("SET LOCAL synchronize_seqscans = off"))  # every scan starts at block 0
+        if fuzzy:
+            conn.execute(text("SELECT set_config('pg_trgm.word_similarity_threshold', :t, true)"),
+                         {"t": str(FUZZY_THRESHOLD)})
+        t0 = time.perf_counter()
+        rows = conn.execute(text(sql), params).fetchall()
+        return len(rows), (time.perf_counter() - t0) * 1000
+
+
+def summarize(samples):
+    s = sorted(samples)
+    return {
+        "p50_ms": round(statistics.median(s), 3),
+        "p95_ms": round(s[min(len(s) - 1, int(0.95 * len(s)))], 3),
+        "mean_ms": round(statistics.fmean(s), 3),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rows", type=int, default=1_000_000)
+    ap.add_argument("--queries", type=int, default=50, help="queries per method")
+    ap.add_argument("--limit", type=int, default=20, help="page size of the search queries")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--out", default="bench_name_search.jsonl")
+    ap.add_argument("--keep", action="store_true", help="keep the scratch table")
+    args = ap.parse_args()
+
+    engine = create_engine(os.environ["DATABASE_URL"], future=True)
+    rng = random.Random(args.seed)
+    with engine.begin() as conn:
+        trgm = conn.execute(text("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")).first() is not None
+        if trgm:
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    if not trgm:
+        print("pg_trgm is not available on this server: skipping the trigram rows")
+
+    t0 = time.perf_counter()
+    build = seed_table(engine, args.rows, rng, trgm)
+    print(f"seeded {args.rows} rows in {time.perf_counter() - t0:.1f}s (index builds: {build})")
+
+    with engine.connect() as conn:
+        ids = rng.sample(range(1, args.rows + 1), args.queries)  # spread over the whole table
+        names = [r.name for r in conn.execute(text(f"SELECT name FROM {TABLE} WHERE id = ANY(:ids)"), {"ids": ids})]
+    # "Sabarmati Ash" style keywords: a name without its number, last word cut short
+    keywords = [" ".join(n.split()[:-2] + [n.split()[-2][:4]]) for n in names]
+    typos = [" ".join(typo(rng, w) for w in n.split()[:-1]) for n in names]
+    tsqueries = [to_prefix_tsquery(k) for k in keywords]
+    new_names = [" ".join(n.split()[:-1] + [str(args.rows + i)]) for i, n in enumerate(names)]
+
+    lim = args.limit
+    methods = [
+        ("ilike seq", f"SELECT id FROM {TABLE} WHERE name ILIKE :p LIMIT {lim}",
+         [{"p": f"%{k}%"} for k in keywords], dict(seq=True), False),
+        ("ilike trgm", f"SELECT id FROM {TABLE} WHERE name ILIKE :p LIMIT {lim}",
+         [{"p": f"%{k}%"} for k in keywords], {}, True),
+        ("dup seq", f"SELECT id FROM {TABLE} WHERE name ILIKE :p LIMIT 1",
+         [{"p": n} for n in new_names], dict(seq=True), False),
+        ("dup trgm", f"SELECT id FROM {TABLE} WHERE name ILIKE :p LIMIT 1",
+         [{"p": n} for n in new_names], {}, True),
+        ("fuzzy", f"SELECT id FROM {TABLE} WHERE name %> :k OR name ILIKE :p "
+                  f"ORDER BY word_similarity(:k, name) DESC LIMIT {lim}",
+         [{"k": t, "p": f"%{t}%"} for t in typos], dict(fuzzy=True), True),
+        ("fts", f"SELECT id FROM {TABLE} WHERE search_vector @@ to_tsquery('{FTS_CONFIG}', :q) "
+                f"ORDER BY ts_rank_cd(search_vector, to_tsquery('{FTS_CONFIG}', :q)) DESC LIMIT {lim}",
+         [{"q": q} for q in tsqueries], {}, False),
+    ]
+
+    results = []
+    try:
+        with engine.connect() as conn:
+            for label, sql, params, opts, needs_trgm in methods:
+                if needs_trgm and not trgm:
+                    continue
+                samples, hits = [], []
+                for p in params:
+                    n, ms = timed(conn, sql, p, **opts)
+                    samples.append(ms)
+                    hits.append(n)
+                row = {"rows": args.rows, "method": label, "limit": lim,
+                       "mean_hits": round(statistics.fmean(hits), 1), **summarize(samples), **build}
+                results.append(row)
+                print(f"{args.rows:>9} rows  {label:<11} hits={row['mean_hits']:<6} "
+                      f"p50={row['p50_ms']:>9.3f}ms  p95={row['p95_ms']:>9.3f}ms")
+    finally:
+        if not args.keep:
+            with engine.begin() as conn:
+                conn.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        for r in results:
+            f.write(json.dumps(r) + "\n")
+    print(f"\nwrote {len(results)} rows to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Prompt encoding benchmark: the JSON candidate lists the planners used to
+send vs the compact table from app.utils.prompt_encoding.
+
+Two prompt shapes are measured:
+  * gen1   generate_itinerary1: candidates without descriptions, schema inline
+  * gen3   generate_itinerary3/4/fresh: descriptions included, both
+           candidates and schema pretty-printed
+
+For each shape and encoding it reports prompt characters, estimated tokens
+(estimate_tokens), the server's prompt_eval_count, and end-to-end /api/chat
+latency. It also checks that every place_id in
+the reply maps back to a real candidate.
+
+Candidates come from the places table for --city (needs DATABASE_URL) or
+are synthesised (--synthetic N). The default model server is an in-process
+scripts/fake_ollama.py that charges --prefill-ms-per-token per prompt token;
+pass --url to measure a real Ollama.
+
+Usage:
+    python scripts/bench_prompt_encoding.py --city Ahmedabad --days 2
+    python scripts/bench_prompt_encoding.py --synthetic 40 --prefill-ms-per-token 5
+    python scripts/bench_prompt_encoding.py --city Ahmedabad --url http://localhost:11434
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import httpx
+
+from app.utils.day_clustering import cluster_into_days, day_group_map
+from app.utils.prompt_encoding import (
+    PROMPT_DESCRIPTION_CHARS, candidates_note, decode_place_ids, encode_candidates, encode_schema, estimate_tokens,
+)
+
+SCHEMA = {
+    "type": "object",
+    "properties": {"itinerary": {"type": "object", "patternProperties": {"^Day [1-9][0-9]*$": {
+        "type": "array", "items": {"type": "object", "properties": {
+            "place_id": {"type": "string"}, "reason": {"type": "string"}, "start_time": {"type": "string"}},
+            "required": ["place_id"]}}}, "additionalProperties": False}},
+    "required": ["itinerary"],
+}
+SHAPES = {
+    # name: (columns, legacy indent)
+    "gen1": (("name", "lat", "lng", "visit_minutes", "rating", "distance_from_city_km", "hop_from_city_min",
+              "city", "day_group"), None),
+    "gen3": (("name", "lat", "lng", "visit_minutes", "rating", "distance_from_city_km", "hop_from_city_min",
+              "city", "day_group", "description"), 2),
+}
+WORDS = ("historic temple garden lake museum fort step-well heritage market river view architecture carved "
+         "stone sunset festival built century dynasty popular families photography walk quiet local food").split()
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    a = math.sin((p2 - p1) / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    return 6371.0 * 2 * math.asin(math.sqrt(a))
+
+
+def synthetic_rows(n, seed=7):
+    rng = random.Random(seed)
+    return [{
+        "place_id": f"ChIJ{rng.getrandbits(96):024x}", "name": f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()}",
+        "lat": 23.02 + rng.uniform(-0.4, 0.4), "lng": 72.57 + rng.uniform(-0.4, 0.4),
+        "visit_minutes": rng.choice((45, 60, 90, 120)), "rating": round(rng.uniform(3.5, 4.9), 2),
+        "city": "Ahmedabad", "description": " ".join(rng.choice(WORDS) for _ in range(40)).capitalize() + ".",
+    } for _ in range(n)]
+
+
+def db_rows(city, limit):
+    from sqlalchemy import text
+    from app.database.db import SessionLocal
+    db = SessionLocal()
+    try:
+        rows = db.execute(text("""
+            SELECT place_id, name, lat, lng, avg_visit_mins AS visit_minutes, rating, city, description
+            FROM places WHERE city ILIKE :city ORDER BY rating DESC NULLS LAST LIMIT :limit
+        """), {"city": f"%{city}%", "limit": limit}).mappings().all()
+    finally:
+        db.close()
+    return [{**r, "lat": float(r["lat"]), "lng": float(r["lng"]), "rating": float(r["rating"] or 0)} for r in rows]
+
+
+def prepare(rows, days):
+    lat0 = statistics.fmean(r["lat"] for r in rows)
+    lng0 = statistics.fmean(r["lng"] for r in rows)
+    for r in rows:
+        r["distance_from_city_km"] = round(haversine_km(lat0, lng0, r["lat"], r["lng"]), 2)
+        r["hop_from_city_min"] = int(r["distance_from_city_km"] / 25 * 60) + 10
+    group_of = day_group_map(cluster_into_days(rows, days, lat0, lng0, visit_key="visit_minutes"))
+    for r in rows:
+        r["day_group"] = group_of[r["place_id"]]
+    return rows
+
+
+def build_prompt(rows, days, shape, compact):
+    columns, indent = SHAPES[shape]
+    block, aliases = encode_candidates(rows, columns, compact=compact, indent=indent)
+    prompt = (f"Return STRICT JSON ONLY conforming to this schema: {encode_schema(SCHEMA, compact=compact, indent=indent)}\n"
+              f"Task: Generate a {days}-day itinerary. Use ONLY the places in Candidates; "
+              f"build Day N mainly from day_group N.\nCandidates: {candidates_note(aliases)}\n{block}")
+    return prompt, aliases
+
+
+async def measure(client, model, prompt, aliases, valid_ids, repeats):
+    samples, prompt_tokens, ok = [], None, True
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        r = await client.post("/api/chat", json={
+            "model": model, "messages": [{"role": "user", "content": prompt}],
+            "stream": False, "format": SCHEMA, "options": {"temperature": 0}})
+        r.raise_for_status()
+        samples.append((time.perf_counter() - t0) * 1000)
+        data = r.json()
+        prompt_tokens = data.get("prompt_eval_count", prompt_tokens)
+        itinerary = decode_place_ids(json.loads(data["message"]["content"]).get("itinerary", {}), aliases)
+        ok = ok and all(it.get("place_id") in valid_ids for items in itinerary.values() for it in items)
+    return {"latency_p50_ms": round(statistics.median(samples), 1), "server_prompt_tokens": prompt_tokens,
+            "ids_round_trip_ok": ok}
+
+
+async def run(args, rows):
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, timeout=300)
+    else:
+        from scripts.fake_ollama import make_app
+        app = make_app(latency_ms=args.latency_ms, prefill_ms_per_token=args.prefill_ms_per_token)
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://fake", timeout=300)
+    valid_ids = {r["place_id"] for r in rows}
+    results = {}
+    async with client:
+        for shape in SHAPES:
+            for compact in (False, True):
+                prompt, aliases = build_prompt(rows, args.days, shape, compact)
+                entry = {"chars": len(prompt), "est_tokens": estimate_tokens(prompt)}
+                entry.update(await measure(client, args.model, prompt, aliases, valid_ids, args.repeats))
+                results[f"{shape}_{'compact' if compact else 'json'}"] = entry
+    return results
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--city", help="take candidates from the places table (needs DATABASE_URL)")
+    ap.add_argument("--synthetic", type=int, default=40, help="synthetic candidates when --city is not given")
+    ap.add_argument("--days", type=int, default=2)
+    ap.add_argument("--url", help="real Ollama server (default: in-process fake)")
+    ap.add_argument("--model", default="llama3.1:8b")
+    ap.add_argument("--latency-ms", type=float, default=50.0)
+    ap.add_argument("--prefill-ms-per-token", type=float, default=0.5,
+                    help="fake prefill cost; ~0.5 ms/token is an 8B model on a consumer GPU, CPU is 10x+")
+    ap.add_argument("--repeats", type=int, default=3)
+    ap.add_argument("--out", default="bench_prompt_encoding.json")
+    args = ap.parse_args()
+
+    rows = prepare(db_rows(args.city, 40) if args.city else synthetic_rows(args.synthetic), args.days)
+    results = asyncio.run(run(args, rows))
+    for shape in SHAPES:
+        before, after = results[f"{shape}_json"], results[f"{shape}_compact"]
+        results[f"{shape}_savings"] = {
+            "token_reduction_pct": round(100 * (1 - after["est_tokens"] / before["est_tokens"]), 1),
+            "latency_reduction_pct": round(100 * (1 - after["latency_p50_ms"] / before["latency_p50_ms"]), 1),
+        }
+    results["config"] = {**{k: v for k, v in vars(args).items() if k != "out"},
+                         "candidates": len(rows), "description_chars": PROMPT_DESCRIPTION_CHARS}
+
+    for name, r in results.items():
+        if name.endswith(("_json", "_compact")):
+            print(f"{name:<14} chars={r['chars']:>6}  est_tokens={r['est_tokens']:>5}  "
+                  f"p50={r['latency_p50_ms']:>8.1f}ms  ids_ok={r['ids_round_trip_ok']}")
+    for shape in SHAPES:
+        s = results[f"{shape}_savings"]
+        print(f"{shape}: {s['token_reduction_pct']}% fewer tokens, {s['latency_reduction_pct']}% lower latency")
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, default=str)
+    print(f"wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
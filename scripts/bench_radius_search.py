@@ -0,0 +1,185 @@
+"""
+Radius-search benchmark: legacy acos() scan vs bounding-box + B-tree vs in-memory grid.
+
+Seeds a scratch table `places_bench` in DATABASE_URL with synthetic places
+jittered around the coordinates in Data/places.json, then times
+"all places within R km of a city centre, sorted by distance". Every
+method returns full rows: memory_grid looks the ids up in the grid, then
+fetches the rows by primary key, the way nearby_places does.
+
+Usage:
+    DATABASE_URL=postgresql://... python scripts/bench_radius_search.py [--sizes 10000 100000 1000000]
+
+Prints a table and writes one JSON line per measurement to --out.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from dotenv import load_dotenv
+from sqlalchemy import bindparam, create_engine, text
+
+from app.utils.spatial_index import (
+    EARTH_KM, PlacesSpatialIndex, _BBOX_HAVERSINE_SQL, _ROWS_BY_ID_SQL, bounding_box,
+)
+
+load_dotenv()
+
+TABLE = "places_bench"
+
+LEGACY_SQL = text(f"""
+    SELECT *,
+        ({EARTH_KM} * acos(
+                cos(radians(:lat)) * cos(radians(lat)) *
+                cos(radians(lng) - radians(:lon)) +
+                sin(radians(:lat)) * sin(radians(lat))
+        )) AS distance_km
+    FROM {TABLE}
+    WHERE lat IS NOT NULL AND lng IS NOT NULL
+    AND ({EARTH_KM} * acos(
+                cos(radians(:lat)) * cos(radians(lat)) *
+                cos(radians(lng) - radians(:lon)) +
+                sin(radians(:lat)) * sin(radians(lat))
+        )) <= :radius
+    ORDER BY distance_km ASC
+""")
+BBOX_SQL = text(_BBOX_HAVERSINE_SQL.text.replace("FROM places", f"FROM {TABLE}"))
+ROWS_BY_ID_SQL = text(_ROWS_BY_ID_SQL.text.replace("FROM places", f"FROM {TABLE}")).bindparams(
+    bindparam("ids", expanding=True)
+)
+
+
+def load_seeds():
+    with open(ROOT / "Data" / "places.json", encoding="utf-8") as f:
+        data = json.load(f)
+    return [(float(p["lat"]), float(p["lng"])) for p in data if p.get("lat") and p.get("lng")]
+
+
+def seed_table(conn, n: int, seeds):
+    conn.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+    conn.execute(text(f"""
+        CREATE TABLE {TABLE} (
+            id SERIAL PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            lat DOUBLE PRECISION NOT NULL,
+            lng DOUBLE PRECISION NOT NULL,
+            is_active BOOLEAN DEFAULT TRUE,
+            description TEXT
+        )
+    """))
+    seed_lat = "ARRAY[" + ",".join(str(s[0]) for s in seeds) + "]::float8[]"
+    seed_lng = "ARRAY[" + ",".join(str(s[1]) for s in seeds) + "]::float8[]"
+    # each synthetic place sits within ~1.5 degrees of a real one
+    conn.execute(text(f"""
+        INSERT INTO {TABLE} (name, lat, lng, description)
+        SELECT 'place ' || g,
+               ({seed_lat})[1 + (g % {len(seeds)})] + (random() - 0.5) * 3,
+               ({seed_lng})[1 + (g % {len(seeds)})] + (random() - 0.5) * 3,
+               repeat('lorem ipsum ', 20)
+        FROM generate_series(1, :n) AS g
+    """), {"n": n})
+    conn.execute(text(f"CREATE INDEX ix_{TABLE}_lat_lng ON {TABLE} (lat, lng)"))
+    conn.execute(text(f"ANALYZE {TABLE}"))
+
+
+def grid_rows(conn, grid: PlacesSpatialIndex, lat: float, lon: float, radius_km: float):
+    """nearby_places' in-memory path: grid lookup, then the rows by id, in distance order."""
+    hits = grid.within_radius(lat, lon, radius_km)
+    if not hits:
+        return []
+    by_id = {r._mapping["id"]: dict(r._mapping)
+             for r in conn.execute(ROWS_BY_ID_SQL, {"ids": [pk for pk, _ in hits]}).fetchall()}
+    return [{**by_id[pk], "distance_km": dist} for pk, dist in hits if pk in by_id]
+
+
+def time_it(fn, repeat: int):
+    samples = []
+    result = None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return samples, result
+
+
+def summarize(samples):
+    s = sorted(samples)
+    return {
+        "p50_ms": round(statistics.median(s), 3),
+        "p95_ms": round(s[min(len(s) - 1, int(0.95 * len(s)))], 3),
+        "mean_ms": round(statistics.fmean(s), 3),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    ap.add_argument("--radii", type=float, nargs="+", default=[25, 120])
+    ap.add_argument("--queries", type=int, default=10, help="query centres per size")
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--out", default="bench_radius_search.jsonl")
+    ap.add_argument("--keep", action="store_true", help="keep the scratch table")
+    args = ap.parse_args()
+
+    engine = create_engine(os.environ["DATABASE_URL"], future=True)
+    seeds = load_seeds()
+    rnd = random.Random(7)
+    results = []
+
+    for n in args.sizes:
+        with engine.begin() as conn:
+            t0 = time.perf_counter()
+            seed_table(conn, n, seeds)
+            print(f"\nseeded {n} rows in {time.perf_counter() - t0:.1f}s")
+
+        with engine.connect() as conn:
+            pts = conn.execute(text(f"SELECT id, lat, lng FROM {TABLE}")).fetchall()
+            grid = PlacesSpatialIndex()
+            t0 = time.perf_counter()
+            grid.build(pts)
+            build_ms = (time.perf_counter() - t0) * 1000
+
+            centres = rnd.sample(seeds, min(args.queries, len(seeds)))
+            for radius in args.radii:
+                methods = {
+                    "legacy_acos_scan": lambda la, lo: conn.execute(
+                        LEGACY_SQL, {"lat": la, "lon": lo, "radius": radius}).fetchall(),
+                    "bbox_btree": lambda la, lo: conn.execute(BBOX_SQL, dict(
+                        zip(("lat_min", "lat_max", "lng_min", "lng_max"), bounding_box(la, lo, radius)),
+                        lat=la, lon=lo, radius=radius)).fetchall(),
+                    "memory_grid": lambda la, lo: grid_rows(conn, grid, la, lo, radius),
+                }
+                for name, fn in methods.items():
+                    samples, hits = [], 0
+                    for la, lo in centres:
+                        s, res = time_it(lambda: fn(la, lo), args.repeat)
+                        samples.extend(s)
+                        hits += len(res)
+                    row = {"rows": n, "radius_km": radius, "method": name,
+                           "avg_hits": round(hits / len(centres), 1), **summarize(samples)}
+                    if name == "memory_grid":
+                        row["build_ms"] = round(build_ms, 1)
+                    results.append(row)
+                    print(f"{n:>9} rows  r={radius:>5.0f}km  {name:<17} "
+                          f"p50={row['p50_ms']:>9.3f}ms  p95={row['p95_ms']:>9.3f}ms  hits~{row['avg_hits']}")
+
+    if not args.keep:
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        for r in results:
+            f.write(json.dumps(r) + "\n")
+    print(f"\nwrote {len(results)} rows to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+"""
+Semantic-search benchmark: HNSW (pgvector) recall and latency vs exact search.
+
+Seeds a scratch table `places_ann_bench` in DATABASE_URL with synthetic
+384-dim embeddings. The vectors are clustered around random centroids, as
+real place embeddings are, and spread over --cities cities. The table
+gets the same HNSW index as places (vector_cosine_ops, m=16,
+ef_construction=64). Queries are perturbed centroids, and each runs the
+SQL from app.utils.semantic_search:
+  exact        sequential scan (enable_indexscan = off): ground truth
+  hnsw ef=N    index scan at each --ef-search
+both unfiltered and with a city filter. recall@k is the fraction of the
+exact top-k that the index returned.
+
+Usage:
+    DATABASE_URL=postgresql://... python scripts/bench_semantic_search.py [--sizes 20000 100000] [--k 10]
+
+Prints a table and writes one JSON line per measurement to --out.
+"""
+import argparse
+import io
+import json
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import numpy as np
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, text
+
+from app.utils.semantic_search import _search_sql, _vector_literal
+
+load_dotenv()
+
+TABLE = "places_ann_bench"
+DIM = 384
+
+
+def seed_table(engine, n: int, centroids: np.ndarray, cities: int, rng: np.random.Generator):
+    with engine.begin() as conn:
+        conn.execute(text("CREATE EXTENSION IF NOT EXISTS vector"))
+        conn.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+        conn.execute(text(f"""
+            CREATE TABLE {TABLE} (
+                id SERIAL PRIMARY KEY,
+                place_id VARCHAR(64), name VARCHAR(255), city VARCHAR(255), state VARCHAR(255),
+                country VARCHAR(255), type VARCHAR(100), tags VARCHAR[], suitable_for VARCHAR[],
+                rating NUMERIC(3, 2), lat DOUBLE PRECISION, lng DOUBLE PRECISION, avg_visit_mins INTEGER,
+                description TEXT, is_active BOOLEAN DEFAULT TRUE,
+                embedding vector({DIM})
+            )
+        """))
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        for start in range(0, n, 10_000):
+            m = min(10_000, n - start)
+            vecs = centroids[rng.integers(0, len(centroids), m)] + rng.normal(0, 0.35, (m, DIM))
+            city_ids = rng.integers(0, cities, m)
+            buf = io.StringIO()
+            for i in range(m):
+                buf.write(f"bench-{start + i}\tplace {start + i}\tcity{city_ids[i]}\tstate\tIndia\tsight\t"
+                          f"{_vector_literal(vecs[i])}\n")
+            buf.seek(0)
+            cur.copy_expert(f"COPY {TABLE} (place_id, name, city, state, country, type, embedding) FROM STDIN", buf)
+        raw.commit()
+    finally:
+        raw.close()
+    with engine.begin() as conn:
+        t0 = time.perf_counter()
+        conn.execute(text(f"CREATE INDEX ix_{TABLE}_embedding_hnsw ON {TABLE} "
+                          "USING hnsw (embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64)"))
+        build_s = time.perf_counter() - t0
+        conn.execute(text(f"ANALYZE {TABLE}"))
+    return build_s
+
+
+def search(conn, sql, params, exact: bool, ef: int = 40):
+    with conn.begin():
+        if exact:
+            conn.execute(text("SET LOCAL enable_indexscan = off"))
+        else:
+            conn.execute(text("SELECT set_config('hnsw.ef_search', :ef, true)"), {"ef": str(ef)})
+        t0 = time.perf_counter()
+        ids = [r.id for r in conn.execute(sql, params)]
+        return ids, (time.perf_counter() - t0) * 1000
+
+
+def summarize(samples):
+    s = sorted(samples)
+    return {
+        "p50_ms": round(statistics.median(s), 3),
+        "p95_ms": round(s[min(len(s) - 1, int(0.95 * len(s)))], 3),
+        "mean_ms": round(statistics.fmean(s), 3),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--sizes", type=int, nargs="+", default=[20_000, 100_000])
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--ef-search", type=int, nargs="+", default=[10, 20, 40, 80, 160, 320])
+    ap.add_argument("--queries", type=int, default=50, help="queries per size")
+    ap.add_argument("--centroids", type=int, default=200)
+    ap.add_argument("--cities", type=int, default=20, help="a city filter keeps ~1/cities of the rows")
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--out", default="bench_semantic_search.jsonl")
+    ap.add_argument("--keep", action="store_true", help="keep the scratch table")
+    args = ap.parse_args()
+
+    engine = create_engine(os.environ["DATABASE_URL"], future=True)
+    rng = np.random.default_rng(args.seed)
+    centroids = rng.normal(0, 1, (args.centroids, DIM))
+    results = []
+
+    try:
+        for n in args.sizes:
+            t0 = time.perf_counter()
+            build_s = seed_table(engine, n, centroids, args.cities, rng)
+            print(f"\nseeded {n} rows in {time.perf_counter() - t0:.1f}s (HNSW build {build_s:.1f}s)")
+
+            queries = centroids[rng.integers(0, len(centroids), args.queries)] + rng.normal(0, 0.35, (args.queries, DIM))
+            for label, filters in (("unfiltered", {}), ("city filter", {"city": "city0"})):
+                sql = text(_search_sql(filters).replace("FROM places", f"FROM {TABLE}"))
+                with engine.connect() as conn:
+                    truth, exact_ms = [], []
+                    for q in queries:
+                        ids, ms = search(conn, sql, {"q": _vector_literal(q), "k": args.k, **filters}, exact=True)
+                        truth.append(set(ids))
+                        exact_ms.append(ms)
+                    rows = [{"rows": n, "filter": label, "method": "exact", "recall": 1.0, **summarize(exact_ms)}]
+                    for ef in args.ef_search:
+                        recall, samples = [], []
+                        for q, want in zip(queries, truth):
+                            ids, ms = search(conn, sql, {"q": _vector_literal(q), "k": args.k, **filters},
+                                             exact=False, ef=max(ef, args.k))
+                            recall.append(len(want & set(ids)) / len(want) if want else 1.0)
+                            samples.append(ms)
+                        rows.append({"rows": n, "filter": label, "method": f"hnsw ef={ef}",
+                                     "recall": round(statistics.fmean(recall), 4), **summarize(samples)})
+                for row in rows:
+                    row.update(k=args.k, hnsw_build_s=round(build_s, 2))
+                    results.append(row)
+                    print(f"{n:>9} rows  {label:<12} {row['method']:<13} recall@{args.k}={row['recall']:<7} "
+                          f"p50={row['p50_ms']:>8.3f}ms  p95={row['p95_ms']:>8.3f}ms")
+    finally:
+        if not args.keep:
+            with engine.begin() as conn:
+                conn.execute(text(f"DROP TABLE IF EXISTS {TABLE}"))
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        for r in results:
+            f.write(json.dumps(r) + "\n")
+    print(f"\nwrote {len(results)} rows to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
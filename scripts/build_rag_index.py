@@ -0,0 +1,60 @@
+"""
+Build (or refresh) the persisted FAISS index used by app.utils.rag_service.
+
+Reads the stored vectors in places.embedding. Run scripts/backfill_embeddings.py
+first so every place has one. Writes places.index, places.idmap.npy and
+places.meta.json under RAG_INDEX_PATH. API workers memory-map these at
+startup.
+
+Usage:
+    DATABASE_URL=postgresql://... python scripts/build_rag_index.py            # full rebuild
+    python scripts/build_rag_index.py --reconcile                              # apply table changes to the saved index
+    python scripts/build_rag_index.py --query "lakeside temple" --top-k 5      # then try a search
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.database.db import SessionLocal
+from app.utils.rag_service import places_vector_index
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--reconcile", action="store_true",
+                    help="load the saved index and apply added/changed/removed places instead of rebuilding")
+    ap.add_argument("--query", help="search the index afterwards")
+    ap.add_argument("--top-k", type=int, default=5)
+    args = ap.parse_args()
+
+    db = SessionLocal()
+    try:
+        t0 = time.perf_counter()
+        if args.reconcile:
+            places_vector_index.load(db)
+            changes = places_vector_index.reconcile(db)
+            places_vector_index.save_if_dirty()
+            print(f"reconciled {changes} in {time.perf_counter() - t0:.2f}s")
+        else:
+            n = places_vector_index.build(db)
+            print(f"indexed {n} places in {time.perf_counter() - t0:.2f}s")
+        print(f"{len(places_vector_index)} places in {places_vector_index.path}")
+
+        if args.query:
+            for r in places_vector_index.search(db, args.query, args.top_k):
+                print(json.dumps({k: r[k] for k in ("score", "place_id", "name", "city", "type")}, default=str))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
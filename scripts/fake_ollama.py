@@ -0,0 +1,206 @@
+"""
+Fake Ollama server for offline runs and benchmarks.
+
+Speaks enough of the Ollama REST API for the itinerary endpoints:
+/api/chat, /api/generate, /api/tags. Replies are deterministic. When the
+prompt contains candidate place_ids (JSON objects, or the `id|...` table of
+app.utils.prompt_encoding), it returns {"itinerary": {"Day N": [...]}}
+that spreads them over the requested number of days, honouring `day_group`
+when present. Otherwise it echoes a short text.
+
+Latency is simulated as a fixed delay per call, plus a prefill cost per
+prompt token (--prefill-ms-per-token, counted with estimate_tokens), plus a
+per-output-token cost. With "stream": true the reply is sent as NDJSON chunks
+of ~4 characters, one every --per-token-ms, like Ollama's streaming mode.
+--cold-ms adds a one-off model load on the first call per model, and again
+after --keep-alive-s of idleness (or whatever keep_alive the request sends).
+
+Usage:
+    python scripts/fake_ollama.py --port 11435 --latency-ms 800
+    OLLAMA_URL=http://127.0.0.1:11435 uvicorn app.main:app
+
+In-process (no sockets):
+    from scripts.fake_ollama import make_app
+    transport = httpx.ASGITransport(app=make_app(latency_ms=0))
+    OllamaClient(base_url="http://fake", transport=transport)
+"""
+import argparse
+import asyncio
+import json
+import re
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.utils.prompt_encoding import estimate_tokens
+
+PLACE_ID_RE = re.compile(r'"place_id"\s*:\s*"([^"]+)"')
+GROUP_RE = re.compile(r'"day_group"\s*:\s*(\d+)')
+DAYS_RE = re.compile(r"(\d+)-day")
+
+
+def _table_candidates(prompt: str):
+    """(ids, groups) from an `id|col|...` candidate table, or None if there is none."""
+    lines = prompt.splitlines()
+    for i, line in enumerate(lines):
+        header = line.strip().split("|")
+        if header[0] != "id" or len(header) < 2:
+            continue
+        ids, groups = [], {}
+        for row in lines[i + 1:]:
+            cells = row.strip().split("|")
+            if len(cells) != len(header):
+                break
+            ids.append(cells[0])
+            if "day_group" in header and cells[header.index("day_group")].isdigit():
+                groups[cells[0]] = int(cells[header.index("day_group")])
+        return ids, groups
+    return None
+
+
+def fake_itinerary(prompt: str) -> dict:
+    m = DAYS_RE.search(prompt)
+    days = max(1, int(m.group(1))) if m else 1
+    table = _table_candidates(prompt)
+    if table:
+        ids, groups = table
+    else:
+        matches = list(PLACE_ID_RE.finditer(prompt))
+        ids = list(dict.fromkeys(m.group(1) for m in matches))
+        # day_group belongs to the place_id that precedes it
+        groups = {}
+        for i, pm in enumerate(matches):
+            end = matches[i + 1].start() if i + 1 < len(matches) else len(prompt)
+            g = GROUP_RE.search(prompt, pm.end(), end)
+            if g:
+                groups.setdefault(pm.group(1), int(g.group(1)))
+    plan = {f"Day {d}": [] for d in range(1, days + 1)}
+    for i, pid in enumerate(ids):
+        day = groups.get(pid) or (i % days) + 1
+        items = plan.setdefault(f"Day {day}", [])
+        if len(items) >= 4:
+            continue
+        items.append({
+            "place_id": pid,
+            "reason": "fake",
+            "activities": "Visit",
+            "description": "",
+            "start_time": f"{10 + 2 * len(items)}:00",
+        })
+    return {"itinerary": plan}
+
+
+def make_app(latency_ms: float = 0.0, per_token_ms: float = 0.0, cold_ms: float = 0.0,
+             keep_alive_s: float = 300.0, prefill_ms_per_token: float = 0.0) -> FastAPI:
+    app = FastAPI(title="fake-ollama")
+    app.state.stats = {"requests": 0, "cold_loads": 0}
+    loaded = {}  # model -> expiry (monotonic)
+
+    def _keep_alive(body) -> float:
+        ka = body.get("keep_alive", keep_alive_s)
+        if isinstance(ka, str):
+            m = re.fullmatch(r"(-?\d+)([smh]?)", ka.strip())
+            if not m:
+                return keep_alive_s
+            return int(m.group(1)) * {"": 1, "s": 1, "m": 60, "h": 3600}[m.group(2)]
+        return float(ka)
+
+    async def _simulate(body, prompt: str, text: str, stream: bool = False) -> dict:
+        app.state.stats["requests"] += 1
+        model = body.get("model", "fake")
+        now = time.monotonic()
+        load_ns = 0
+        if loaded.get(model, 0) < now:
+            app.state.stats["cold_loads"] += 1
+            load_ns = int(cold_ms * 1e6)
+            await asyncio.sleep(cold_ms / 1000)
+        tokens = max(1, len(text) // 4)
+        prompt_tokens = estimate_tokens(prompt)
+        # streaming callers pay the per-token cost chunk by chunk instead
+        await asyncio.sleep((latency_ms + prefill_ms_per_token * prompt_tokens
+                             + (0 if stream else per_token_ms * tokens)) / 1000)
+        ka = _keep_alive(body)
+        loaded[model] = float("inf") if ka < 0 else time.monotonic() + ka
+        return {
+            "model": model,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "done": True,
+            "load_duration": load_ns,
+            "prompt_eval_count": prompt_tokens,
+            "eval_count": tokens,
+            "total_duration": int((time.monotonic() - now) * 1e9),
+        }
+
+    def _reply(prompt: str, structured: bool) -> str:
+        if structured or PLACE_ID_RE.search(prompt) or _table_candidates(prompt):
+            return json.dumps(fake_itinerary(prompt))
+        return f"fake reply to {len(prompt)} chars"
+
+    def _stream(body, prompt: str, text: str, wrap):
+        async def gen():
+            meta = await _simulate(body, prompt, text, stream=True)
+            for i in range(0, len(text), 4):
+                await asyncio.sleep(per_token_ms / 1000)
+                yield json.dumps({"model": meta["model"], "created_at": meta["created_at"],
+                                  "done": False, **wrap(text[i:i + 4])}) + "\n"
+            yield json.dumps({**meta, "done": True, **wrap("")}) + "\n"
+        return StreamingResponse(gen(), media_type="application/x-ndjson")
+
+    @app.post("/api/chat")
+    async def chat(request: Request):
+        body = await request.json()
+        prompt = "\n".join(m.get("content", "") for m in body.get("messages", []))
+        text = _reply(prompt, body.get("format") is not None)
+        wrap = lambda t: {"message": {"role": "assistant", "content": t}}
+        if body.get("stream"):
+            return _stream(body, prompt, text, wrap)
+        meta = await _simulate(body, prompt, text)
+        return {**meta, **wrap(text)}
+
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        body = await request.json()
+        prompt = body.get("prompt", "")
+        text = _reply(prompt, body.get("format") is not None)
+        wrap = lambda t: {"response": t}
+        if body.get("stream"):
+            return _stream(body, prompt, text, wrap)
+        meta = await _simulate(body, prompt, text)
+        return {**meta, **wrap(text)}
+
+    @app.get("/api/tags")
+    async def tags():
+        return {"models": [{"name": m} for m in loaded] or [{"name": "llama3.1:8b"}]}
+
+    @app.get("/_fake/stats")
+    async def stats():
+        return app.state.stats
+
+    return app
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=11435)
+    ap.add_argument("--latency-ms", type=float, default=500.0)
+    ap.add_argument("--per-token-ms", type=float, default=0.0)
+    ap.add_argument("--cold-ms", type=float, default=0.0)
+    ap.add_argument("--keep-alive-s", type=float, default=300.0)
+    ap.add_argument("--prefill-ms-per-token", type=float, default=0.0)
+    args = ap.parse_args()
+
+    import uvicorn
+    uvicorn.run(make_app(args.latency_ms, args.per_token_ms, args.cold_ms, args.keep_alive_s,
+                         args.prefill_ms_per_token),
+                host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
-from sentence_transformers import SentenceTransformer
+import sys
+from pathlib import Path
 
-# Load model once
-embedder = SentenceTransformer("all-MiniLM-L6-v2")  # 384-dim
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
 
-def get_embedding(text: str) -> list[float]:
-    return embedder.encode(text).tolist()
+# the shared, lazily loaded model (384-dim all-MiniLM-L6-v2 by default)
+from app.utils.embeddings import get_embedding  # noqa: E402,F401
@@ -0,0 +1,153 @@
+"""
+Offline planner comparison: stored LLM itineraries vs planner=deterministic.
+
+Reads itineraries from itinerary_results, newest first, and skips those not
+produced by the model: planner=deterministic, or an llm_status other than
+"ok" (the cluster fallback). For each one it plans the same
+city/days/audience with the deterministic planner (no model call, nothing
+persisted) and scores both with app.utils.itinerary_quality:
+travel minutes, items per day, rating sum and days over the time budget.
+
+Both are scored against today's places table, so a place that has since
+been deleted counts as unknown in the stored itinerary.
+
+Usage:
+    DATABASE_URL=postgresql://... python scripts/score_itineraries.py [--city Ahmedabad] [--limit 50]
+
+Prints one line per itinerary and a summary, and writes everything to --out.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+
+from app.api.itineraries.models import ItineraryRequest, ItineraryResult
+from app.api.itineraries.pipeline import PLANNER_DETERMINISTIC, _plan_itinerary
+from app.api.places.models import Places
+from app.database.db import SessionLocal
+from app.utils.helper import parse_mins
+from app.utils.itinerary_quality import score_itinerary
+from app.utils.travel_matrix import TravelMatrix
+
+load_dotenv()
+
+METRICS = ("travel_minutes", "items_per_day", "min_items_per_day", "rating_sum", "days_over_budget")
+
+
+def is_model_output(auto_params: dict) -> bool:
+    auto_params = auto_params or {}
+    return auto_params.get("planner", "llm") != PLANNER_DETERMINISTIC and auto_params.get("llm_status", "ok") == "ok"
+
+
+def score_stored(db, city, itinerary):
+    """Score a stored itinerary with the pipeline's city centre and travel model."""
+    city_row = db.query(Places).filter(Places.city.ilike(city)).first()
+    if not city_row or not city_row.lat or not city_row.lng:
+        return None
+    pids = {it.get("place_id") for items in itinerary.values() if isinstance(items, list)
+            for it in items if isinstance(it, dict)}
+    rows = db.query(Places).filter(Places.place_id.in_([p for p in pids if p])).all()
+    places = {p.place_id: {"place_id": p.place_id, "lat": float(p.lat), "lng": float(p.lng),
+                           "rating": float(p.rating or 0.0), "avg_visit_mins": parse_mins(p.avg_visit_mins, default=90)}
+              for p in rows}
+    matrix = TravelMatrix(float(city_row.lat), float(city_row.lng), places.values())
+    return score_itinerary(itinerary, places, matrix)
+
+
+async def score_one(db, req, res):
+    stored = score_stored(db, req.city, res.itinerary_json or {})
+    if stored is None:
+        return None
+    t0 = time.perf_counter()
+    try:
+        plan = await _plan_itinerary(db, req.city, req.days, req.suitable_for, lambda stage: None,
+                                     lambda event, data: None, planner=PLANNER_DETERMINISTIC)
+    except HTTPException:
+        return None
+    elapsed_ms = (time.perf_counter() - t0) * 1000
+    deterministic = plan["auto_parameters"]["quality"]
+    return {
+        "request_id": req.id, "city": req.city, "days": req.days, "suitable_for": req.suitable_for,
+        "version": req.version,
+        "llm": {k: stored[k] for k in METRICS + ("unknown_places",)},
+        "deterministic": {k: deterministic[k] for k in METRICS},
+        "deterministic_ms": round(elapsed_ms, 1),
+    }
+
+
+def summarise(rows):
+    summary = {"itineraries": len(rows)}
+    if not rows:
+        return summary
+    for m in METRICS:
+        llm = statistics.fmean(r["llm"][m] for r in rows)
+        det = statistics.fmean(r["deterministic"][m] for r in rows)
+        summary[m] = {"llm_mean": round(llm, 2), "deterministic_mean": round(det, 2), "delta": round(det - llm, 2)}
+    # "at least as good": less or equal travel, at least as many stops and rating
+    summary["deterministic_travel_le_pct"] = round(
+        100 * sum(r["deterministic"]["travel_minutes"] <= r["llm"]["travel_minutes"] for r in rows) / len(rows), 1)
+    summary["deterministic_items_ge_pct"] = round(
+        100 * sum(r["deterministic"]["items_per_day"] >= r["llm"]["items_per_day"] for r in rows) / len(rows), 1)
+    summary["deterministic_rating_ge_pct"] = round(
+        100 * sum(r["deterministic"]["rating_sum"] >= r["llm"]["rating_sum"] for r in rows) / len(rows), 1)
+    summary["deterministic_ms_p50"] = round(statistics.median(r["deterministic_ms"] for r in rows), 1)
+    return summary
+
+
+async def run(args):
+    db = SessionLocal()
+    try:
+        q = (db.query(ItineraryRequest, ItineraryResult)
+             .join(ItineraryResult, ItineraryResult.itinerary_request_id == ItineraryRequest.id)
+             .order_by(ItineraryResult.created_at.desc(), ItineraryResult.id.desc()))
+        if args.city:
+            q = q.filter(ItineraryRequest.city.ilike(args.city))
+        rows, skipped = [], 0
+        for req, res in q:
+            if len(rows) >= args.limit:
+                break
+            if not is_model_output(res.auto_params_json):
+                skipped += 1
+                continue
+            scored = await score_one(db, req, res)
+            if scored is None:
+                skipped += 1
+                continue
+            rows.append(scored)
+        return rows, skipped
+    finally:
+        db.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--city", help="only itineraries for this city")
+    ap.add_argument("--limit", type=int, default=50, help="stored LLM itineraries to score")
+    ap.add_argument("--out", default="score_itineraries.json")
+    args = ap.parse_args()
+
+    rows, skipped = asyncio.run(run(args))
+    for r in rows:
+        llm, det = r["llm"], r["deterministic"]
+        print(f"#{r['request_id']:<5} {r['city'][:14]:<14} {r['days']}d  "
+              f"travel {llm['travel_minutes']:>4} -> {det['travel_minutes']:>4} min  "
+              f"items/day {llm['items_per_day']:>4} -> {det['items_per_day']:>4}  "
+              f"rating {llm['rating_sum']:>5} -> {det['rating_sum']:>5}  ({r['deterministic_ms']} ms)")
+    summary = {**summarise(rows), "skipped": skipped}
+    print(json.dumps(summary, indent=2))
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump({"summary": summary, "itineraries": rows}, f, indent=2, default=str)
+    print(f"wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()